@@ -0,0 +1,97 @@
+"""
+Helpers for the async (ASGI) read path under /api/v1/async/.
+
+These views are plain Django async views, not DRF views, so they do their
+own JWT authentication, pagination and JSON rendering while producing the
+same response shapes as the DRF endpoints they mirror. Querysets must
+`select_related` everything the serializer touches: lazy loads would be
+synchronous queries inside the event loop.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from api.metrics import serialization_timer
+from tuition.paginations import DefaultPagination
+from users.authentication import CachedJWTAuthentication
+
+_authentication = CachedJWTAuthentication()
+
+
+def json_response(data, status=200, headers=None):
+    with serialization_timer():
+        return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False, headers=headers)
+
+
+def api_view(require_auth=True, throttle_classes=(), query_token=False):
+    """
+    Authenticate with the JWT header, apply throttles and turn DRF API
+    exceptions into JSON responses. `query_token` also accepts the access
+    token as `?token=`, for clients such as EventSource that cannot set headers.
+    """
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if query_token and "HTTP_AUTHORIZATION" not in request.META and request.GET.get("token"):
+                    request.META["HTTP_AUTHORIZATION"] = f"{jwt_settings.AUTH_HEADER_TYPES[0]} {request.GET['token']}"
+                # cache misses and the revocation sync query the database
+                result = await sync_to_async(_authentication.authenticate)(request)
+                if result is not None:
+                    request.user, request.auth = result
+                elif require_auth:
+                    raise exceptions.NotAuthenticated()
+                if throttle_classes:
+                    await sync_to_async(check_throttles)(request, throttle_classes)
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as e:
+                status = e.status_code
+                if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    status = 401
+                headers = {"Retry-After": str(int(e.wait))} if getattr(e, "wait", None) else None
+                return json_response({"detail": e.detail}, status=status, headers=headers)
+
+        return wrapper
+
+    return decorator
+
+
+def check_throttles(request, throttle_classes):
+    """What DRF's `APIView.check_throttles` does, for these plain views."""
+    waits = [throttle.wait() for throttle in (cls() for cls in throttle_classes)
+             if not throttle.allow_request(request, None)]
+    if waits:
+        raise exceptions.Throttled(max(waits))
+
+
+async def paginate(request, queryset, serialize, page_size=DefaultPagination.page_size):
+    """Page a queryset the way `DefaultPagination` does, with async queries."""
+    try:
+        page = int(request.GET.get("page", 1))
+        if page < 1:
+            raise ValueError
+    except ValueError:
+        raise exceptions.NotFound("Invalid page.")
+    count = await queryset.acount()
+    start = (page - 1) * page_size
+    if start and start >= count:
+        raise exceptions.NotFound("Invalid page.")
+    items = [item async for item in queryset[start:start + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, "page", page + 1) if start + page_size < count else None
+    if page == 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, "page")
+    else:
+        previous_url = replace_query_param(url, "page", page - 1)
+    return {"count": count, "next": next_url, "previous": previous_url, "results": serialize(items)}
@@ -0,0 +1,184 @@
+"""
+`/api/v1/batch/`: several API calls in one round trip.
+
+Each sub-request is resolved against the URLconf and handed straight to
+its view, carrying the caller's headers (so the same JWT authentication,
+permissions and throttles apply). Middleware does not run for
+sub-requests; the batch request itself goes through it once.
+
+Without `atomic`, runs of consecutive GET/HEAD requests execute
+concurrently on a small thread pool, and every other request is a
+barrier executed in order. Every thread holds its own database
+connection, so the pool stays below DB_POOL_MAX_SIZE, and the reads run
+in order when that leaves fewer than two threads. Pooled sub-requests run
+in a copy of the batch request's context, so the request trace follows
+them. Each sub-request is routed like a request of its own, on the
+primary once an earlier one wrote. With `atomic`, everything runs in
+order inside one transaction. The first sub-request that returns 4xx/5xx
+rolls it back, and the rest are not run (424).
+"""
+import contextvars
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import serializers
+
+from tuition_media import db_router
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUESTS = getattr(settings, "BATCH_MAX_REQUESTS", 20)
+PREFIX = "/api/v1/"
+READ_METHODS = ("GET", "HEAD")
+# request headers not copied to sub-requests: they describe the batch body
+SKIPPED_META = ("CONTENT_TYPE", "CONTENT_LENGTH", "HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH", "HTTP_IF_NONE_MATCH",
+                "HTTP_IF_MATCH", "HTTP_IF_MODIFIED_SINCE", "HTTP_ACCEPT_ENCODING")
+RESPONSE_HEADERS = ("Location", "Retry-After", "ETag")
+
+
+def _worker_count():
+    workers = getattr(settings, "BATCH_WORKERS", 4)
+    pool_size = getattr(settings, "DB_POOL_MAX_SIZE", 0)
+    if pool_size:
+        # the batch request keeps one connection for itself
+        workers = min(workers, pool_size - 1)
+    return max(workers, 1)
+
+
+WORKERS = _worker_count()
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="batch") if WORKERS > 1 else None
+
+
+class BatchItemSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=64)
+    method = serializers.ChoiceField(choices=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE"], default="GET")
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        parts = urlsplit(value)
+        if parts.scheme or parts.netloc or not parts.path.startswith(PREFIX):
+            raise serializers.ValidationError(f"Must be a path under {PREFIX}.")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > MAX_REQUESTS:
+            raise serializers.ValidationError(f"At most {MAX_REQUESTS} requests per batch.")
+        return value
+
+
+def _error(status, detail):
+    return {"status": status, "body": {"detail": detail}}
+
+
+def _sub_request(request, item):
+    parts = urlsplit(item["path"])
+    body = json.dumps(item["body"]).encode() if "body" in item else b""
+    environ = {key: value for key, value in request.META.items()
+               if isinstance(value, str) and key not in SKIPPED_META}
+    environ.update({
+        "REQUEST_METHOD": item["method"],
+        "PATH_INFO": parts.path,
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": parts.query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.url_scheme": request.scheme,
+    })
+    return WSGIRequest(environ)
+
+
+def run_one(request, item):
+    """Run one sub-request and return its result entry (without the id)."""
+    path = urlsplit(item["path"]).path
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _error(404, "Not found.")
+    if match.url_name == "batch" or iscoroutinefunction(match.func):
+        return _error(400, "This endpoint cannot be called from a batch.")
+
+    sub_request = _sub_request(request, item)
+    sub_request.resolver_match = match
+    # routed as a request of its own (a GET may use a replica), but on the primary once the batch wrote
+    batch_state = db_router.current_state()
+    token = db_router.begin_request(sub_request)
+    db_router.current_state().wrote = bool(batch_state and batch_state.wrote)
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+    except Exception:
+        logger.exception(f"Batched {item['method']} {item['path']} failed")
+        return _error(500, "Server error.")
+    finally:
+        state = db_router.end_request(token)
+        if batch_state is not None and state.wrote:
+            batch_state.wrote = True
+
+    result = {"status": response.status_code}
+    headers = {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)}
+    if headers:
+        result["headers"] = headers
+    content = b"" if response.streaming else response.content
+    if content:
+        if response.get("Content-Type", "").startswith("application/json"):
+            result["body"] = json.loads(content)
+        else:
+            result["body"] = content.decode(response.charset or "utf-8", errors="replace")
+    return result
+
+
+def _run_in_thread(request, item):
+    # like a request of its own: a fresh or reusable connection, released at the end
+    close_old_connections()
+    try:
+        return run_one(request, item)
+    finally:
+        close_old_connections()
+
+
+def run(request, items, atomic=False):
+    """Results in request order, each with `id`, `status` and optionally `headers` and `body`."""
+    results = []
+    if atomic:
+        with transaction.atomic():
+            for index, item in enumerate(items):
+                result = run_one(request, item)
+                results.append(result)
+                if result["status"] >= 400:
+                    transaction.set_rollback(True)
+                    results += [_error(424, "Not run: an earlier request in the atomic batch failed.")
+                                for _ in items[index + 1:]]
+                    break
+    else:
+        index = 0
+        while index < len(items):
+            reads = []
+            while index + len(reads) < len(items) and items[index + len(reads)]["method"] in READ_METHODS:
+                reads.append(items[index + len(reads)])
+            if len(reads) > 1 and _executor is not None:
+                # one context copy per task: a context cannot be entered by two threads at once
+                futures = [_executor.submit(contextvars.copy_context().run, _run_in_thread, request, item)
+                           for item in reads]
+                results += [future.result() for future in futures]
+                index += len(reads)
+            else:
+                results.append(run_one(request, items[index]))
+                index += 1
+
+    return [{"id": item.get("id", str(index)), **result} for index, (item, result) in enumerate(zip(items, results))]
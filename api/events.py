@@ -0,0 +1,119 @@
+"""
+Per-user event fan-out for the server-sent events stream.
+
+Writers call `publish(user_id, event)` (after commit); each open stream
+holds a subscription and receives the events for its user. The broker is
+EVENT_BROKER, a dotted path to a class with `publish(user_id, event)`,
+`subscribe(user_id)` and `stats()`. The default `LocalBroker` only
+reaches streams served by the same process. With several processes or
+instances, plug in a broker over a shared channel (e.g. Redis pub/sub)
+that delivers into the same kind of subscription.
+"""
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from api.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One open stream. `overflowed` means events were dropped and the client must resync."""
+
+    def __init__(self, broker, user_id, loop):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # called from any thread; the queue belongs to the stream's event loop
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if not self.overflowed:
+                self.broker.count("dropped")
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process broker: a dict of user id -> open subscriptions."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.counters = {"published": 0, "delivered": 0, "dropped": 0}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, asyncio.get_running_loop())
+        with self._lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+            self.counters["published"] += 1
+            self.counters["delivered"] += len(subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # the stream's loop has shut down
+                self.unsubscribe(subscription)
+
+    def count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": sum(len(s) for s in self.subscriptions.values()), **self.counters}
+
+
+@lru_cache(maxsize=1)
+def get_broker():
+    return import_string(getattr(settings, "EVENT_BROKER", "api.events.LocalBroker"))()
+
+
+def publish(user_id, event):
+    try:
+        get_broker().publish(user_id, event)
+    except Exception:
+        # a push is best effort; clients catch up from /changes/
+        logger.exception(f"Could not publish {event.get('type')} event to user {user_id}")
+
+
+def prometheus_lines():
+    stats = get_broker().stats()
+    lines = ["# TYPE events_subscribers gauge", f"events_subscribers {stats['subscribers']}"]
+    for counter in ("published", "delivered", "dropped"):
+        lines += [f"# TYPE events_{counter}_total counter", f"events_{counter}_total {stats[counter]}"]
+    return lines
+
+
+metrics.add_collector(prometheus_lines)
@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter per mode, since the database settings are
+# read at boot. Each thread sends its share of requests through the WSGI
+# handler; prints one JSON line with latencies in ms and the pool stats.
+PROBE = """
+import json, statistics, sys, threading, time
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+from wsgiref.util import setup_testing_defaults
+from tuition_media.pooled_postgresql.pool import all_stats
+
+application = get_wsgi_application()
+path, requests, threads = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+latencies, statuses, lock = [], {}, threading.Lock()
+
+def request():
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "SERVER_NAME": "127.0.0.1"}
+    setup_testing_defaults(environ)
+    status = []
+    began = time.perf_counter()
+    body = application(environ, lambda line, headers, exc_info=None: status.append(line))
+    b"".join(body)
+    if hasattr(body, "close"):
+        body.close()
+    took = time.perf_counter() - began
+    with lock:
+        latencies.append(took * 1000)
+        statuses[status[0]] = statuses.get(status[0], 0) + 1
+
+def worker(count):
+    for _ in range(count):
+        request()
+
+request()  # warm up imports and the URLconf
+latencies.clear(); statuses.clear()
+started = time.perf_counter()
+workers = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+for thread in workers:
+    thread.start()
+for thread in workers:
+    thread.join()
+elapsed = time.perf_counter() - started
+latencies.sort()
+print(json.dumps({
+    "requests": len(latencies),
+    "p50_ms": statistics.median(latencies),
+    "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    "max_ms": latencies[-1],
+    "throughput": len(latencies) / elapsed,
+    "statuses": statuses,
+    "pool": all_stats(),
+}))
+"""
+
+MODES = {
+    # connect and disconnect on every request
+    "none": {"DB_POOL_MAX_SIZE": "0", "DB_CONN_MAX_AGE": "0"},
+    # one persistent connection per thread (CONN_MAX_AGE)
+    "persistent": {"DB_POOL_MAX_SIZE": "0", "DB_CONN_MAX_AGE": "60"},
+    "pool": {},
+}
+
+
+class Command(BaseCommand):
+    help = "Compare request latency with no connection reuse, CONN_MAX_AGE and the connection pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/v1/tuitions/", help="Path to GET")
+        parser.add_argument("--requests", type=int, default=300, help="Requests per mode")
+        parser.add_argument("--threads", type=int, default=4, help="Concurrent request threads in the process")
+        parser.add_argument("--pool-size", type=int, help="DB_POOL_MAX_SIZE for the pool mode (default: settings)")
+        parser.add_argument("--modes", default=",".join(MODES), help="Comma separated: " + ", ".join(MODES))
+
+    def probe(self, mode, options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE))
+        env.update(MODES[mode])
+        if mode == "pool":
+            env["DB_POOL_MAX_SIZE"] = str(options["pool_size"] or settings.DB_POOL_MAX_SIZE or 4)
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE, options["path"], str(options["requests"]), str(options["threads"])],
+            env=env, capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Benchmark for mode '{mode}' failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options["modes"].split(",") if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        if options["threads"] < 1 or options["requests"] < options["threads"]:
+            raise CommandError("--threads must be at least 1 and at most --requests")
+
+        self.stdout.write(
+            f"GET {options['path']}: {options['requests']} requests from {options['threads']} threads per mode"
+        )
+        for mode in modes:
+            report = self.probe(mode, options)
+            statuses = ", ".join(f"{status}: {count}" for status, count in sorted(report["statuses"].items()))
+            self.stdout.write(
+                f"  {mode:<11} p50 {report['p50_ms']:7.2f}ms  p95 {report['p95_ms']:7.2f}ms  "
+                f"max {report['max_ms']:7.2f}ms  {report['throughput']:7.1f} req/s  ({statuses})"
+            )
+            for pool in report["pool"]:
+                self.stdout.write(
+                    f"  {'':<11} pool '{pool['alias']}': {pool['opened']} opened for {pool['checkouts']} checkouts, "
+                    f"{pool['waits']} waits ({pool['wait_seconds'] * 1000:.1f}ms total), "
+                    f"{pool['timeouts']} timeouts, max size {pool['max_size']}"
+                )
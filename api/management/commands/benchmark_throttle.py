@@ -0,0 +1,72 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from api.throttling import TokenBucketThrottle
+
+
+class BenchmarkTokenBucket(TokenBucketThrottle):
+    scope = "benchmark"
+    prefix = ""
+
+    def get_cache_key(self, request, view, scope):
+        return self.prefix + super().get_cache_key(request, view, scope)
+
+
+class BenchmarkSimpleRate(SimpleRateThrottle):
+    """DRF's history-list throttle, for comparison."""
+    scope = "benchmark"
+    prefix = ""
+
+    def get_cache_key(self, request, view):
+        return self.prefix + self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request cost of the token-bucket throttle against DRF's SimpleRateThrottle"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=20000, help="allow_request calls per case")
+        parser.add_argument("--clients", type=int, default=1000, help="Distinct client IPs in the spread case")
+        parser.add_argument("--rate", default="1000/min", help="Throttle rate; the single client runs into it")
+        parser.add_argument("--cache", default="default", help="Cache alias to run against (keys get a unique prefix)")
+
+    def run(self, throttle_class, requests):
+        throttle_class.prefix = f"bench-{uuid.uuid4().hex[:8]}:"
+        allowed = 0
+        started = time.perf_counter()
+        for request in requests:
+            allowed += throttle_class().allow_request(request, None)
+        elapsed = time.perf_counter() - started
+        return elapsed / len(requests) * 1_000_000, allowed
+
+    def handle(self, *args, **options):
+        calls, clients, rate = options["calls"], options["clients"], options["rate"]
+        if calls < 1 or clients < 1:
+            raise CommandError("--calls and --clients must be at least 1")
+        cache = caches[options["cache"]]
+        BenchmarkTokenBucket.cache = BenchmarkSimpleRate.cache = cache
+
+        factory = RequestFactory()
+        one = factory.get("/api/v1/tuitions/?search=x", REMOTE_ADDR="10.0.0.1")
+        many = [factory.get("/api/v1/tuitions/?search=x", REMOTE_ADDR=f"10.1.{i // 256 % 256}.{i % 256}")
+                for i in range(clients)]
+        cases = (("one client", [one] * calls), (f"{clients} clients", [many[i % clients] for i in range(calls)]))
+
+        rest_framework = dict(settings.REST_FRAMEWORK)
+        rest_framework["DEFAULT_THROTTLE_RATES"] = {
+            **rest_framework.get("DEFAULT_THROTTLE_RATES", {}), "benchmark": rate,
+        }
+        self.stdout.write(f"{calls:,} calls per case at {rate}, cache '{options['cache']}' ({type(cache).__name__})")
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            # SimpleRateThrottle copies the rates when it is defined, and has no burst
+            BenchmarkSimpleRate.THROTTLE_RATES = {"benchmark": rate.split(":")[0]}
+            for name, throttle_class in (("token bucket", BenchmarkTokenBucket), ("SimpleRateThrottle", BenchmarkSimpleRate)):
+                for case, requests in cases:
+                    per_call, allowed = self.run(throttle_class, requests)
+                    self.stdout.write(f"  {name:<19} {case:<12} {per_call:8.1f}us/request  {allowed:>7,} allowed")
@@ -0,0 +1,58 @@
+import difflib
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import openapi
+
+
+def _changed_keys(old, new):
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    changed = sorted(key for key in set(old) & set(new) if old[key] != new[key])
+    return added, removed, changed
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI document served at /openapi.json and show what changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help=f"Defaults to API_SCHEMA_FILE ({settings.API_SCHEMA_FILE})")
+        parser.add_argument("--diff", action="store_true", help="Print a unified diff against the current file")
+        parser.add_argument("--check", action="store_true",
+                            help="Do not write; exit with status 1 if the file is missing or out of date (for CI)")
+
+    def handle(self, *args, **options):
+        path = options["output"] or settings.API_SCHEMA_FILE
+        old = openapi.read_file(path)
+        new = openapi.generate()
+        old_text = openapi.dumps(old) if old is not None else ""
+        new_text = openapi.dumps(new)
+
+        if old_text == new_text:
+            self.stdout.write(f"{path} is up to date ({new['info'][openapi.HASH_KEY][:12]})")
+            return
+
+        if old is None:
+            self.stdout.write(f"{path} does not exist")
+        else:
+            for section in ("paths", "definitions"):
+                added, removed, changed = _changed_keys(old.get(section, {}), new.get(section, {}))
+                for label, keys in (("added", added), ("removed", removed), ("changed", changed)):
+                    if keys:
+                        self.stdout.write(f"{section} {label}: {', '.join(keys)}")
+        if options["diff"]:
+            self.stdout.writelines(
+                difflib.unified_diff(old_text.splitlines(True), new_text.splitlines(True), f"{path} (current)",
+                                     f"{path} (generated)")
+            )
+
+        if options["check"]:
+            self.stderr.write(self.style.ERROR(f"{path} is out of date; run manage.py generate_openapi"))
+            sys.exit(1)
+        with open(path, "w", encoding="utf-8") as schema_file:
+            schema_file.write(new_text)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {path}: {len(new.get('paths', {}))} paths ({new['info'][openapi.HASH_KEY][:12]})"
+        ))
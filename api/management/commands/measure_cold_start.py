@@ -0,0 +1,95 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is imported yet, like a new
+# serverless instance. Prints one JSON line of phase timings in ms.
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+application = get_wsgi_application()
+get_resolver().url_patterns
+urlconf = time.perf_counter()
+
+from django.db import connection
+connection.ensure_connection()
+connected = time.perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+
+def request(path):
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "SERVER_NAME": "127.0.0.1"}
+    setup_testing_defaults(environ)
+    statuses = []
+    began = time.perf_counter()
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b"".join(body)
+    if hasattr(body, "close"):
+        body.close()
+    return statuses[0], time.perf_counter() - began
+
+status, first = request(sys.argv[1])
+_, second = request(sys.argv[1])
+modules = sorted({name.split(".")[0] for name in sys.modules})
+print(json.dumps({
+    "setup_ms": (setup - started) * 1000,
+    "urlconf_ms": (urlconf - setup) * 1000,
+    "db_connect_ms": (connected - urlconf) * 1000,
+    "first_request_ms": first * 1000,
+    "warm_request_ms": second * 1000,
+    "total_ms": (time.perf_counter() - started - second) * 1000,
+    "status": status,
+    "modules": modules,
+}))
+"""
+
+PHASES = ("setup_ms", "urlconf_ms", "db_connect_ms", "first_request_ms", "total_ms", "warm_request_ms")
+
+
+class Command(BaseCommand):
+    help = "Measure cold start: import/setup time, URLconf load, DB connect and first-request latency in a fresh process"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/v1/tuitions/", help="Path for the first request")
+        parser.add_argument("--runs", type=int, default=3, help="Fresh processes to start; medians are reported")
+        parser.add_argument("--json", action="store_true", help="Print one JSON object, e.g. for a metrics pipeline")
+        parser.add_argument("--modules", action="store_true", help="List the top-level packages imported at boot")
+
+    def probe(self, path):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE))
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE, path], env=env, capture_output=True, text=True, cwd=settings.BASE_DIR
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Cold start probe failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1")
+        runs = [self.probe(options["path"]) for _ in range(options["runs"])]
+        report = {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in PHASES}
+        report.update(path=options["path"], status=runs[-1]["status"], runs=len(runs), debug=settings.DEBUG)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report))
+        else:
+            self.stdout.write(
+                f"Cold start for GET {report['path']} ({report['status']}), median of {report['runs']} runs, "
+                f"DEBUG={report['debug']}"
+            )
+            for phase in PHASES:
+                self.stdout.write(f"  {phase[:-3]:<16} {report[phase]:>9,.1f}ms")
+        if options["modules"]:
+            self.stdout.write(" ".join(runs[-1]["modules"]))
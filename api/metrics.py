@@ -0,0 +1,238 @@
+"""
+Per-route request metrics for this process, exported in Prometheus text format.
+
+`RequestMetricsMiddleware` opens a `RequestTrace` for every request and
+keeps it in a context variable, so database queries (including those run
+from async views through `sync_to_async`) and response rendering are
+attributed to the request that caused them. Queries are seen through an
+execute wrapper installed on every new database connection.
+
+Slow requests (over METRICS_SLOW_REQUEST_MS) are sampled at
+METRICS_TRACE_SAMPLE_RATE into a small ring buffer together with their SQL.
+"""
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000)
+MAX_TRACED_QUERIES = 50
+
+_current = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.statements = []
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        if len(self.statements) < MAX_TRACED_QUERIES:
+            self.statements.append((sql, duration))
+
+
+def current_trace():
+    return _current.get()
+
+
+def start_trace():
+    trace = RequestTrace()
+    return trace, _current.set(trace)
+
+
+def end_trace(token):
+    _current.reset(token)
+
+
+class serialization_timer:
+    """Context manager that books the enclosed time as serialization for the current request."""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        trace = _current.get()
+        if trace is not None:
+            trace.serialization_time += time.perf_counter() - self.started
+
+
+def _record_query(execute, sql, params, many, context):
+    trace = _current.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid="api.metrics.install_query_recorder")
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+class RouteStats:
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.statuses = defaultdict(int)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetrics:
+    """In-process registry of per-route, per-method request stats and sampled slow traces."""
+
+    def __init__(self, slow_request_ms=None, trace_sample_rate=None, trace_window=50):
+        self.slow_request = (
+            slow_request_ms if slow_request_ms is not None else getattr(settings, "METRICS_SLOW_REQUEST_MS", 500)
+        ) / 1000
+        self.trace_sample_rate = (
+            trace_sample_rate if trace_sample_rate is not None
+            else getattr(settings, "METRICS_TRACE_SAMPLE_RATE", 0.1)
+        )
+        self.routes = defaultdict(RouteStats)
+        self.traces = deque(maxlen=trace_window)
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def add_collector(self, collector):
+        """Register a callable returning extra exposition lines, e.g. connection pool gauges."""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def observe(self, route, method, status, duration, trace, response_size=None):
+        with self._lock:
+            stats = self.routes[(route, method)]
+            stats.latency.observe(duration)
+            stats.queries.observe(trace.queries)
+            stats.db_time += trace.db_time
+            stats.serialization_time += trace.serialization_time
+            stats.statuses[status] += 1
+            if response_size is not None:
+                stats.response_size.observe(response_size)
+
+        if duration >= self.slow_request and random.random() < self.trace_sample_rate:
+            self.traces.append({
+                "at": timezone.now().isoformat(),
+                "route": route,
+                "method": method,
+                "status": status,
+                "duration_ms": round(duration * 1000, 1),
+                "db_ms": round(trace.db_time * 1000, 1),
+                "serialization_ms": round(trace.serialization_time * 1000, 1),
+                "queries": trace.queries,
+                "sql": [{"sql": sql, "ms": round(query_time * 1000, 2)} for sql, query_time in trace.statements],
+            })
+            logger.warning(
+                f"Slow request {method} {route}: {duration * 1000:.0f}ms, "
+                f"{trace.queries} queries in {trace.db_time * 1000:.0f}ms"
+            )
+
+    def slow_traces(self):
+        return list(reversed(self.traces))
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+            self.traces.clear()
+
+    def render(self):
+        """The registry in Prometheus text exposition format."""
+        with self._lock:
+            routes = sorted(self.routes.items())
+            lines = [
+                "# HELP http_request_duration_seconds Request latency.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (route, method), stats in routes:
+                lines.extend(stats.latency.lines("http_request_duration_seconds", self._labels(route, method)))
+
+            lines += ["# HELP http_requests_total Requests by response status.", "# TYPE http_requests_total counter"]
+            for (route, method), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'http_requests_total{{{self._labels(route, method)},status="{status}"}} {count}')
+
+            lines += ["# HELP http_request_db_queries SQL queries per request.",
+                      "# TYPE http_request_db_queries histogram"]
+            for (route, method), stats in routes:
+                lines.extend(stats.queries.lines("http_request_db_queries", self._labels(route, method)))
+
+            lines += ["# HELP http_request_db_seconds_total Time spent in SQL.",
+                      "# TYPE http_request_db_seconds_total counter"]
+            for (route, method), stats in routes:
+                lines.append(f"http_request_db_seconds_total{{{self._labels(route, method)}}} {stats.db_time}")
+
+            lines += ["# HELP http_request_serialization_seconds_total Time spent rendering response bodies.",
+                      "# TYPE http_request_serialization_seconds_total counter"]
+            for (route, method), stats in routes:
+                lines.append(
+                    f"http_request_serialization_seconds_total{{{self._labels(route, method)}}} "
+                    f"{stats.serialization_time}"
+                )
+
+            lines += ["# HELP http_response_size_bytes Response body size.",
+                      "# TYPE http_response_size_bytes histogram"]
+            for (route, method), stats in routes:
+                lines.extend(stats.response_size.lines("http_response_size_bytes", self._labels(route, method)))
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(route, method):
+        return f'route="{_escape(route)}",method="{_escape(method)}"'
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,141 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from api.metrics import current_trace, end_trace, install_query_recorder, metrics, start_trace
+from tuition_media import db_router
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can run in an async middleware chain. The stock one is
+    sync-only, which makes Django run every ASGI request through a single
+    sync thread and defeats the async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # Django streams the file body from a thread; fine for the static files we serve
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, SQL query count/time, serialization time and response
+    size per route and method into `api.metrics.metrics`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # connections opened before this module was imported (e.g. by startup checks)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(sender=None, connection=connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        trace, token = start_trace()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_trace(token)
+        self.record(request, response, trace)
+        return response
+
+    async def __acall__(self, request):
+        trace, token = start_trace()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_trace(token)
+        self.record(request, response, trace)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time the renderer
+        trace = current_trace()
+        if trace is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                trace.serialization_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, trace):
+        duration = time.perf_counter() - trace.started
+        match = getattr(request, "resolver_match", None)
+        route = (match.view_name or match.route) if match else "<unmatched>"
+        if response.streaming:
+            size = int(response["Content-Length"]) if response.has_header("Content-Length") else None
+        else:
+            size = len(response.content)
+        metrics.observe(route, request.method, response.status_code, duration, trace, size)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks the request for `tuition_media.db_router.ReplicaRouter` and makes
+    the client sticky to the primary after a request that wrote.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = db_router.begin_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        token = db_router.begin_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        return self.finish(request, response, state)
+
+    def finish(self, request, response, state):
+        if state.wrote or request.method not in db_router.SAFE_METHODS:
+            db_router.mark_sticky(request, response)
+        return response
@@ -0,0 +1,140 @@
+"""
+Precomputed OpenAPI document for /swagger/ and /redoc/.
+
+Generating the schema introspects every view and serializer, so it is done
+once: `manage.py generate_openapi` writes API_SCHEMA_FILE at build time, and
+a process that finds no file (or one built for a different URLconf)
+generates the document on first request and keeps it in memory. The
+document carries a fingerprint of the URLconf in `info.x-urlconf-hash`,
+and is served with an ETag so clients revalidate with a 304.
+
+drf_yasg is only imported when a document actually has to be generated.
+"""
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+HASH_KEY = "x-urlconf-hash"
+
+
+def api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="TuitionHub API",
+        default_version='v1',
+        description=(
+            "Backend for tutor-student tuition workflows: tuition posts, applications, enrollments, "
+            "progress tracking, reviews, payments, tutor wallets and payouts."
+        ),
+        license=openapi.License(name="MIT License"),
+    )
+
+
+def _describe(view, callback):
+    parts = [f"{view.__module__}.{view.__qualname__}", repr(sorted(getattr(callback, "actions", None) or {}))]
+    serializer = getattr(view, "serializer_class", None)
+    if serializer is not None:
+        meta = getattr(serializer, "Meta", None)
+        parts += [
+            f"{serializer.__module__}.{serializer.__qualname__}",
+            repr(getattr(meta, "fields", None)),
+            repr(sorted(getattr(serializer, "_declared_fields", {}))),
+        ]
+    return " ".join(parts)
+
+
+def _walk(patterns, prefix=""):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns, prefix + str(pattern.pattern))
+            continue
+        # only DRF views end up in the schema
+        view = getattr(pattern.callback, "cls", None)
+        if view is not None:
+            yield f"{prefix}{pattern.pattern} {pattern.name} {_describe(view, pattern.callback)}"
+
+
+def urlconf_fingerprint():
+    """
+    Hash of every DRF route with its view, actions and serializer fields. It
+    does not see changes inside a serializer field or a model, so CI should
+    still run `generate_openapi --check`.
+    """
+    lines = sorted(_walk(get_resolver().url_patterns))
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def generate(fingerprint=None):
+    """Build the document. Returns it as a dict."""
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    # no request and no url: the document carries no host, so it is the
+    # same wherever it is built and the UI uses the host serving it
+    schema = OpenAPISchemaGenerator(api_info()).get_schema(request=None, public=True)
+    document = json.loads(OpenAPICodecJson(validators=[]).encode(schema))
+    document["info"][HASH_KEY] = fingerprint or urlconf_fingerprint()
+    return document
+
+
+def dumps(document):
+    return json.dumps(document, indent=2, ensure_ascii=False) + "\n"
+
+
+def read_file(path=None):
+    path = path or settings.API_SCHEMA_FILE
+    try:
+        with open(path, encoding="utf-8") as schema_file:
+            return json.load(schema_file)
+    except FileNotFoundError:
+        return None
+
+
+@dataclass(frozen=True)
+class Document:
+    content: bytes
+    etag: str
+    fingerprint: str
+    source: str
+
+
+_document = None
+_lock = threading.Lock()
+
+
+def get_document():
+    """The document for this process, from API_SCHEMA_FILE if it matches the URLconf, else generated."""
+    global _document
+    if _document is None:
+        with _lock:
+            if _document is None:
+                _document = _load()
+    return _document
+
+
+def _load():
+    fingerprint = urlconf_fingerprint()
+    document = read_file()
+    source = "file"
+    if document is None or document.get("info", {}).get(HASH_KEY) != fingerprint:
+        if document is not None:
+            logger.warning(f"{settings.API_SCHEMA_FILE} is out of date for this URLconf; generating the schema")
+        document = generate(fingerprint)
+        source = "generated"
+    content = json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode()
+    etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+    return Document(content, etag, fingerprint, source)
+
+
+def reset():
+    global _document
+    with _lock:
+        _document = None
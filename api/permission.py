@@ -0,0 +1,13 @@
+import hmac
+
+from django.conf import settings
+from rest_framework import permissions
+
+
+class HasMetricsToken(permissions.BasePermission):
+    """`Authorization: Bearer <METRICS_TOKEN>`, for Prometheus scrapers."""
+
+    def has_permission(self, request, view):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        header = request.META.get("HTTP_AUTHORIZATION", "")
+        return bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
@@ -1,3 +1,145 @@
-from django.test import TestCase
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import batch
+from tuition.models import Tuition
+from tuition_media import db_router
+from users.models import User
+
+REPLICA = "replica_test"
+
+
+@skipUnless(REPLICA in connections.settings, f"needs the {REPLICA} alias that settings add under `manage.py test`")
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Routing through the middleware, with a replica alias that mirrors the
+    test database, so rows are visible on both and only the alias differs.
+    """
+    databases = {"default", REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.tutor = User.objects.create_user("tutor@example.com", "pw", role=User.ROLE_TUTOR)
+        Tuition.objects.create(tutor=self.tutor, title="Math", description="d", subject="m", class_level="9")
+        self.auth = f"JWT {AccessToken.for_user(self.tutor)}"
+
+    def request(self, method, path, **kwargs):
+        """Make a request; returns the response and the number of queries on (default, replica)."""
+        kwargs.setdefault("HTTP_AUTHORIZATION", self.auth)
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(self.client, method)(path, **kwargs)
+        return response, len(primary.captured_queries), len(replica.captured_queries)
+
+    def test_reads_use_the_replica(self):
+        response, primary, replica = self.request("get", "/api/v1/tuitions/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        self.assertNotIn(db_router.STICKY_HEADER, response)
+
+    def test_writes_use_the_primary_and_make_the_client_sticky(self):
+        data = {"title": "Physics", "description": "d", "subject": "p", "class_level": "10"}
+        response, primary, replica = self.request("post", "/api/v1/tuitions/", data=data,
+                                                  content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        until = float(response[db_router.STICKY_HEADER])
+        self.assertAlmostEqual(until, time.time() + settings.DB_STICKY_SECONDS, delta=2)
+        self.assertEqual(response.cookies[db_router.STICKY_COOKIE].value, response[db_router.STICKY_HEADER])
+
+        # the cookie sent back keeps reads on the primary
+        response, primary, replica = self.request("get", "/api/v1/tuitions/")
+        self.assertEqual(response.json()["count"], 2)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_echoed_header_keeps_reads_on_the_primary(self):
+        until = str(int(time.time() + 5))
+
+        _, primary, replica = self.request("get", "/api/v1/tuitions/", HTTP_X_DB_PRIMARY_UNTIL=until)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        # expired, or further ahead than one sticky window: ignored
+        for value in (str(int(time.time() - 1)), str(int(time.time() + 3600))):
+            _, primary, replica = self.request("get", "/api/v1/tuitions/", HTTP_X_DB_PRIMARY_UNTIL=value)
+            self.assertEqual(primary, 0)
+            self.assertGreater(replica, 0)
+
+    def test_sticky_window_ends(self):
+        self.request("post", "/api/v1/tuitions/", data={"title": "Physics", "description": "d", "subject": "p",
+                                                        "class_level": "10"}, content_type="application/json")
+        self.client.cookies.clear()
+
+        # a client that drops the cookie and header is still caught by the cache fallback
+        _, primary, replica = self.request("get", "/api/v1/tuitions/")
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        cache.clear()
+        _, primary, replica = self.request("get", "/api/v1/tuitions/")
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_use_the_primary(self):
+        response, primary, replica = self.request("get", "/api/v1/tuitions/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_outside_a_request_reads_use_the_primary(self):
+        self.assertEqual(db_router.ReplicaRouter().db_for_read(Tuition), "default")
+
+    def batch_reads(self, requests):
+        """Run a batch; returns the response and the alias of every Tuition read, from whichever thread."""
+        reads = []
+        db_for_read = db_router.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            if model is Tuition:
+                reads.append(alias)
+            return alias
+
+        # batch threads close their connections when done, so none outlive the test database
+        with mock.patch.object(db_router.ReplicaRouter, "db_for_read", record), \
+                mock.patch.object(batch, "close_old_connections", connections.close_all):
+            response = self.client.post("/api/v1/batch/", {"requests": requests}, content_type="application/json",
+                                        HTTP_AUTHORIZATION=self.auth)
+        return response, reads
+
+    def test_batched_reads_use_the_replica(self):
+        tuition = Tuition.objects.get()
+        response, reads = self.batch_reads([{"path": "/api/v1/tuitions/"}, {"path": f"/api/v1/tuitions/{tuition.pk}/"}])
+
+        self.assertEqual([result["status"] for result in response.json()["results"]], [200, 200])
+        self.assertTrue(reads)
+        self.assertEqual(set(reads), {REPLICA})
+
+    def test_batched_reads_after_a_write_use_the_primary(self):
+        response, reads = self.batch_reads([
+            {"method": "POST", "path": "/api/v1/tuitions/",
+             "body": {"title": "Physics", "description": "d", "subject": "p", "class_level": "10"}},
+            {"path": "/api/v1/tuitions/"},
+            {"path": "/api/v1/tuitions/"},
+        ])
+
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [201, 200, 200])
+        self.assertEqual(results[1]["body"]["count"], 2)
+        self.assertEqual(set(reads), {"default"})
@@ -0,0 +1,119 @@
+"""
+Token-bucket throttles kept in the cache with atomic increments.
+
+A rate of "N/period" refills one token every period/N and holds up to N
+tokens; "N/period:B" holds B instead, for a smaller burst. The bucket is
+a single integer per client and scope: its "theoretical arrival time" in
+milliseconds (GCRA). Each request adds one refill interval with
+`cache.incr`, and is allowed if that puts the time no more than a full
+bucket ahead of now. A refused request gives its interval back. So one
+request is one or two cache round trips and no read-modify-write race,
+unlike DRF's SimpleRateThrottle which rewrites a list of timestamps.
+
+`incr` is atomic on Redis, Memcached and the local-memory cache, not on
+the database cache. Rates come from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"];
+a scope without a rate is not throttled.
+"""
+import math
+import re
+import time
+from functools import lru_cache
+
+from django.core.cache import cache as default_cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600,
+           "d": 86400, "day": 86400}
+RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*([a-z]+)\s*(?::\s*(\d+))?\s*$")
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rate):
+    """"N/period[:burst]" -> (refill interval in ms, bucket size in ms)."""
+    match = RATE_RE.match(rate)
+    if match is None or match[2] not in PERIODS or int(match[1]) < 1:
+        raise ValueError(f"Invalid throttle rate {rate!r}; expected e.g. '60/min' or '60/min:10'")
+    requests = int(match[1])
+    burst = int(match[3]) if match[3] else requests
+    interval = max(1, PERIODS[match[2]] * 1000 // requests)
+    return interval, max(1, burst) * interval
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle per `scope`, keyed by user id when authenticated and by client IP otherwise."""
+    scope = None
+    cache = default_cache
+    # an unused bucket is full again long before this; keeps idle keys from piling up
+    key_ttl = 24 * 60 * 60
+
+    def __init__(self):
+        self.wait_ms = 0
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_cache_key(self, request, view, scope):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            ident = f"user:{user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return f"throttle:{scope}:{ident}"
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+        interval, bucket = parse_rate(rate)
+        key = self.get_cache_key(request, view, scope)
+        now = int(time.time() * 1000)
+
+        try:
+            arrival = self.cache.incr(key, interval)
+        except ValueError:
+            if self.cache.add(key, now + interval, self.key_ttl):
+                return True
+            arrival = self.cache.incr(key, interval)
+        if arrival < now + interval:
+            # the bucket was already full: idle time does not bank extra tokens
+            arrival = self.cache.incr(key, now + interval - arrival)
+
+        if arrival - now <= bucket:
+            return True
+        try:
+            self.cache.decr(key, interval)
+        except ValueError:
+            pass
+        self.wait_ms = arrival - now - bucket
+        return False
+
+    def wait(self):
+        return math.ceil(self.wait_ms / 1000) or 1
+
+
+class SearchThrottle(TokenBucketThrottle):
+    """`?search=` on a list, per IP for anonymous clients (`search_anon`) and per user (`search_user`)."""
+
+    def get_scope(self, request, view):
+        params = getattr(request, "query_params", request.GET)
+        if request.method != "GET" or not params.get(api_settings.SEARCH_PARAM):
+            return None
+        user = getattr(request, "user", None)
+        return "search_user" if user is not None and user.is_authenticated else "search_anon"
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Creates, updates and deletes by a signed-in user (`write`)."""
+    scope = "write"
+
+    def get_scope(self, request, view):
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return None
+        return self.scope
+
+
+class PaymentThrottle(TokenBucketThrottle):
+    """Payment session initiation (`payment`); each one calls the gateway."""
+    scope = "payment"
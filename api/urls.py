@@ -1,7 +1,12 @@
 from django.urls import path,include
 from rest_framework_nested import routers
-from tuition.views import TuitionViewSet, initiate_payment, payment_success, payment_fail, payment_cancel
-from applications.views import ApplicationViewSet, EnrollmentViewSet, TopicViewSet, AssignmentViewSet, ReviewViewSet, PaymentViewSet, TutorWalletViewSet, InvoiceViewSet
+from tuition.views import TuitionViewSet, initiate_payment, payment_success, payment_fail, payment_cancel, payment_callback_metrics
+from users.login import LoginView
+from api.views import batch
+from tuition import async_views as tuition_async
+from applications import async_views as applications_async
+from users.views import revoke_token, revoke_all_tokens, UserImportViewSet
+from applications.views import ApplicationViewSet, EnrollmentViewSet, TopicViewSet, AssignmentViewSet, ReviewViewSet, PaymentViewSet, TutorWalletViewSet, InvoiceViewSet, changes, tutor_dashboard, student_dashboard
 
 router = routers.DefaultRouter()
 router.register('tuitions',TuitionViewSet, basename='tuitions')
@@ -10,6 +15,7 @@ router.register("enrollments", EnrollmentViewSet, basename="enrollments")
 router.register("payments", PaymentViewSet, basename="payments")
 router.register("wallet", TutorWalletViewSet, basename="wallet")
 router.register("invoices", InvoiceViewSet, basename="invoices")
+router.register("user-imports", UserImportViewSet, basename="user-imports")
 
 enrollment_router = routers.NestedDefaultRouter(router, "enrollments", lookup="enrollment")
 enrollment_router.register('topics', TopicViewSet, basename='enrollment-topics')
@@ -21,9 +27,24 @@ urlpatterns = [
     path('',include(router.urls)),
     path('',include(enrollment_router.urls)),
     path('auth/', include('djoser.urls')),
+    path('auth/jwt/create/', LoginView.as_view(), name='jwt-create'),
+    path('auth/jwt/revoke/', revoke_token, name='jwt-revoke'),
+    path('auth/jwt/revoke_all/', revoke_all_tokens, name='jwt-revoke-all'),
     path('auth/', include('djoser.urls.jwt')),
     path('payment/initiate/', initiate_payment, name='initiate-payment'),
     path('payment/success/', payment_success, name='payment-success'),
     path('payment/fail/', payment_fail, name='payment-fail'),
     path('payment/cancel/', payment_cancel, name='payment-cancel'),
+    path('payment/callbacks/metrics/', payment_callback_metrics, name='payment-callback-metrics'),
+    path('batch/', batch, name='batch'),
+    path('changes/', changes, name='changes'),
+    path('dashboard/tutor/', tutor_dashboard, name='tutor-dashboard'),
+    path('dashboard/student/', student_dashboard, name='student-dashboard'),
+    path('async/tuitions/', tuition_async.tuition_list, name='async-tuition-list'),
+    path('async/tuitions/<int:pk>/', tuition_async.tuition_detail, name='async-tuition-detail'),
+    path('async/enrollments/', applications_async.enrollment_list, name='async-enrollment-list'),
+    path('async/enrollments/<int:pk>/', applications_async.enrollment_detail, name='async-enrollment-detail'),
+    path('async/payments/', applications_async.payment_list, name='async-payment-list'),
+    path('async/payment/initiate/', tuition_async.initiate_payment, name='async-initiate-payment'),
+    path('events/', applications_async.event_stream, name='event-stream'),
 ]
@@ -1,3 +1,45 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from django.views.decorators.http import condition, require_GET
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
 
-# Create your views here.
+from api import batch as batch_requests
+from api import openapi
+from api.metrics import metrics
+from api.permission import HasMetricsToken
+
+
+@api_view(['GET'])
+@permission_classes([HasMetricsToken | permissions.IsAdminUser])
+def metrics_view(request):
+    """Request metrics for this process in Prometheus text format (metrics token or staff)."""
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_view(['GET'])
+@permission_classes([HasMetricsToken | permissions.IsAdminUser])
+def slow_traces_view(request):
+    """Recently sampled slow requests with their SQL (metrics token or staff)."""
+    return Response(metrics.slow_traces())
+
+
+@require_GET
+@condition(etag_func=lambda request: openapi.get_document().etag)
+def openapi_document(request):
+    """The precomputed OpenAPI document; clients revalidate with If-None-Match."""
+    response = HttpResponse(openapi.get_document().content, content_type="application/json")
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@api_view(['POST'])
+def batch(request):
+    """Run up to BATCH_MAX_REQUESTS API calls with the caller's credentials; per-item status and body."""
+    serializer = batch_requests.BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    atomic = serializer.validated_data["atomic"]
+    results = batch_requests.run(request._request, serializer.validated_data["requests"], atomic=atomic)
+    if atomic:
+        return Response({"atomic": True, "committed": all(r["status"] < 400 for r in results), "results": results})
+    return Response({"atomic": False, "results": results})
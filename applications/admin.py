@@ -1,5 +1,5 @@
 from django.contrib import admin
-from applications.models import Application, Enrollment, Payment, TutorWallet, Invoice
+from applications.models import Application, Enrollment, Payment, TutorWallet, Invoice, LedgerEntry, WalletSnapshot, PaymentCallback, InvoiceSequence, InvoiceNumberBlock, VoidedInvoiceNumber, TutorEarningsDaily, TutorEarningsMonthly, PayoutBatch, WithdrawalRequest
 # Register your models here.
 
 admin.site.register(Application)
@@ -8,3 +8,14 @@ admin.site.register(Payment)
 admin.site.register(TutorWallet)
 admin.site.register(Invoice)
 
+
+admin.site.register(LedgerEntry)
+admin.site.register(WalletSnapshot)
+admin.site.register(PaymentCallback)
+admin.site.register(InvoiceSequence)
+admin.site.register(InvoiceNumberBlock)
+admin.site.register(VoidedInvoiceNumber)
+admin.site.register(TutorEarningsDaily)
+admin.site.register(TutorEarningsMonthly)
+admin.site.register(PayoutBatch)
+admin.site.register(WithdrawalRequest)
@@ -0,0 +1,146 @@
+"""
+Tutor earnings rollups.
+
+Completed payments and refunds are added to per-tutor, per-tuition, per-day
+rows inside the payment transition. Old days are compacted into monthly rows,
+so a chart over years of history reads a few hundred rows instead of `Payment`.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Enrollment, Payment, TutorEarningsDaily, TutorEarningsMonthly
+
+BUCKET_DAY = "day"
+BUCKET_WEEK = "week"
+BUCKET_MONTH = "month"
+BUCKETS = [BUCKET_DAY, BUCKET_WEEK, BUCKET_MONTH]
+
+
+def _add(model, period_field, tutor_id, tuition_id, period, amount, count):
+    """Atomically add to a rollup row, creating it on first use."""
+    keys = {"tutor_id": tutor_id, "tuition_id": tuition_id, period_field: period}
+    deltas = {"amount": F("amount") + amount, "payments_count": F("payments_count") + count}
+    if model.objects.filter(**keys).update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(amount=amount, payments_count=count, **keys)
+    except IntegrityError:
+        # another transaction created the row first
+        model.objects.filter(**keys).update(**deltas)
+
+
+def record(payments, refund=False):
+    """
+    Add completed payments (or subtract refunds, on the refund day) to the daily rollups.
+    A refund is a payment's last transition, so its `updated_at` is the refund time.
+    """
+    tuition_ids = dict(
+        Enrollment.objects.filter(pk__in=[p.enrollment_id for p in payments]).values_list("id", "tuition_id")
+    )
+    today = timezone.localdate()
+    groups = defaultdict(lambda: [Decimal("0.00"), 0])
+    for payment in payments:
+        if refund:
+            day = timezone.localdate(payment.updated_at) if payment.updated_at else today
+        else:
+            day = timezone.localdate(payment.payment_date) if payment.payment_date else today
+        group = groups[(payment.tutor_id, tuition_ids[payment.enrollment_id], day)]
+        group[0] += -payment.amount if refund else payment.amount
+        group[1] += 0 if refund else 1
+    for (tutor_id, tuition_id, day), (amount, count) in sorted(groups.items()):
+        _add(TutorEarningsDaily, "day", tutor_id, tuition_id, day, amount, count)
+
+
+def compact(before):
+    """
+    Fold daily rows of whole months before `before` into monthly rows.
+    Returns the number of daily rows compacted.
+    """
+    cutoff = before.replace(day=1)
+    compacted = 0
+    while True:
+        oldest = TutorEarningsDaily.objects.filter(day__lt=cutoff).aggregate(m=Min("day"))["m"]
+        if oldest is None:
+            return compacted
+        month = oldest.replace(day=1)
+        next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        with transaction.atomic():
+            rows = TutorEarningsDaily.objects.filter(day__gte=month, day__lt=next_month)
+            list(rows.select_for_update().values_list("id", flat=True))
+            totals = rows.values("tutor_id", "tuition_id").annotate(amount=Sum("amount"), count=Sum("payments_count"))
+            for total in totals:
+                _add(TutorEarningsMonthly, "month", total["tutor_id"], total["tuition_id"], month,
+                     total["amount"], total["count"])
+            compacted += rows.delete()[0]
+
+
+def rebuild():
+    """Recompute every rollup from `Payment` (initial backfill or repair)."""
+    with transaction.atomic():
+        TutorEarningsMonthly.objects.all().delete()
+        TutorEarningsDaily.objects.all().delete()
+        completed = Payment.objects.filter(
+            status__in=[Payment.PAYMENT_STATUS_COMPLETED, Payment.PAYMENT_STATUS_REFUNDED],
+            payment_date__isnull=False,
+        ).only("id", "tutor_id", "enrollment_id", "amount", "status", "payment_date", "updated_at")
+        # the same two steps the transitions took: credit on payment, debit again on refund
+        batch = []
+        for payment in completed.iterator(chunk_size=2000):
+            batch.append(payment)
+            if len(batch) == 2000:
+                _record_rebuilt(batch)
+                batch = []
+        if batch:
+            _record_rebuilt(batch)
+
+
+def _record_rebuilt(payments):
+    record(payments)
+    refunded = [p for p in payments if p.status == Payment.PAYMENT_STATUS_REFUNDED]
+    if refunded:
+        record(refunded, refund=True)
+
+
+def earnings_series(tutor_id, start, end, bucket=BUCKET_DAY, tuition_id=None):
+    """
+    Earnings for [start, end] grouped by bucket and tuition. Ranges that have
+    been compacted only exist at month granularity and are returned as such.
+    """
+    daily = TutorEarningsDaily.objects.filter(tutor_id=tutor_id, day__gte=start, day__lte=end)
+    monthly = TutorEarningsMonthly.objects.filter(tutor_id=tutor_id, month__gte=start.replace(day=1), month__lte=end)
+    if tuition_id is not None:
+        daily = daily.filter(tuition_id=tuition_id)
+        monthly = monthly.filter(tuition_id=tuition_id)
+
+    if bucket == BUCKET_MONTH:
+        daily = daily.annotate(period=TruncMonth("day"))
+    elif bucket == BUCKET_WEEK:
+        daily = daily.annotate(period=TruncWeek("day"))
+    else:
+        daily = daily.annotate(period=F("day"))
+
+    fields = ("period", "tuition_id", "tuition__title")
+    series = []
+    for granularity, rows in (
+        (bucket, daily.values(*fields)),
+        (BUCKET_MONTH, monthly.annotate(period=F("month")).values(*fields)),
+    ):
+        for row in rows.annotate(total=Sum("amount"), payments=Sum("payments_count")).order_by("period", "tuition_id"):
+            period = row["period"]
+            series.append({
+                "period": period.date() if hasattr(period, "date") else period,
+                "granularity": granularity,
+                "tuition": row["tuition_id"],
+                "tuition_title": row["tuition__title"],
+                "amount": row["total"],
+                "payments": row["payments"],
+            })
+    series.sort(key=lambda item: (item["period"], item["tuition"]))
+    return series
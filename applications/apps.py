@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class ApplicationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'applications'
+
+    def ready(self):
+        from django.apps import apps
+        from django.db.models.signals import pre_delete
+
+        from applications import signals
+        from applications.models import ChangeLogged, changes_committed
+
+        changes_committed.connect(signals.push_changes, dispatch_uid="changelog_push")
+
+        for model in apps.get_models():
+            if issubclass(model, ChangeLogged):
+                pre_delete.connect(signals.log_delete, sender=model, dispatch_uid=f"changelog_delete_{model._meta.label_lower}")
@@ -0,0 +1,117 @@
+"""
+Archival of cold rows: rejected applications and failed payments.
+
+Nothing reads these after a while, but they stay in the tables and indexes
+every list scans. `archive_cold_rows` moves them, by status and age, in
+batches into ArchivedApplication / ArchivedPayment, which keep the same
+ids and columns. Each batch copies, logs a delete to the change log (so
+synced clients drop the rows) and deletes in one transaction.
+
+Lists read archived history only when asked: `?include_archived=true`
+merges both tables into one newest-first page, see `merged` and `load`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from .models import Application, ArchivedApplication, ArchivedPayment, ChangeLogEntry, Payment
+
+BATCH_SIZE = 1000
+
+
+class Policy:
+    def __init__(self, model, archive_model, date_field, filters, days, related):
+        self.model = model
+        self.archive_model = archive_model
+        self.date_field = date_field
+        self.filters = filters
+        self.days = days
+        self.related = related
+
+    def cold(self, days):
+        cutoff = timezone.now() - timedelta(days=self.days if days is None else days)
+        return self.model._base_manager.filter(**self.filters, **{f"{self.date_field}__lt": cutoff})
+
+
+POLICIES = {
+    "application": Policy(
+        Application, ArchivedApplication, "applied_at", {"status": Application.STATUS_REJECTED},
+        getattr(settings, "ARCHIVE_APPLICATIONS_AFTER_DAYS", 180), ("applicant", "tuition"),
+    ),
+    "payment": Policy(
+        # completed payments are accounting records and stay; failed ones never get an invoice
+        Payment, ArchivedPayment, "created_at", {"status": Payment.PAYMENT_STATUS_FAILED, "invoice__isnull": True},
+        getattr(settings, "ARCHIVE_PAYMENTS_AFTER_DAYS", 90), ("student", "tutor", "enrollment__tuition"),
+    ),
+}
+
+POLICY_BY_MODEL = {policy.model: policy for policy in POLICIES.values()}
+
+
+def count_cold(name, days=None):
+    return POLICIES[name].cold(days).count()
+
+
+def archive_batch(name, days=None, batch_size=BATCH_SIZE):
+    """Move up to `batch_size` cold rows into the archive table; returns how many moved."""
+    policy = POLICIES[name]
+    fields = [field.attname for field in policy.model._meta.concrete_fields]
+    now = timezone.now()
+    with transaction.atomic():
+        # the lock makes a row that warms up concurrently (e.g. a failed payment being retried) drop out
+        ids = list(
+            policy.cold(days).select_for_update(of=("self",))
+            .order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        rows = policy.model._base_manager.filter(pk__in=ids).values(*fields)
+        policy.archive_model.objects.bulk_create([policy.archive_model(**row, archived_at=now) for row in rows])
+        ChangeLogEntry.record(policy.model, ids, ChangeLogEntry.OP_DELETE)
+        # a plain DELETE: the delete is logged above, and the per-row pre_delete handler would log it again
+        policy.model._base_manager.filter(pk__in=ids)._raw_delete(policy.model._base_manager.db)
+    return len(ids)
+
+
+def archive(name, days=None, batch_size=BATCH_SIZE):
+    """Archive every cold row of `name`, one transaction per batch; returns how many moved."""
+    moved = 0
+    while True:
+        count = archive_batch(name, days=days, batch_size=batch_size)
+        moved += count
+        if count < batch_size:
+            return moved
+
+
+def wants_archived(request):
+    return request.query_params.get("include_archived", "").lower() in ("1", "true", "yes")
+
+
+def merged(live, archived):
+    """
+    (pk, date, archived) rows of both querysets, newest first, as one
+    queryset the paginator can count and slice.
+    """
+    date_field = POLICY_BY_MODEL[live.model].date_field
+    columns = ("id", date_field, "archived")
+    return (
+        live.order_by().annotate(archived=Value(False)).values_list(*columns)
+        .union(archived.order_by().annotate(archived=Value(True)).values_list(*columns), all=True)
+        .order_by(f"-{date_field}", "-id")
+    )
+
+
+def load(rows, live, archived):
+    """The objects for a page of `merged` rows, in order, as (object, is_archived)."""
+    related = POLICY_BY_MODEL[live.model].related
+    objects = {}
+    for is_archived, queryset in ((False, live), (True, archived)):
+        ids = [pk for pk, _, row_archived in rows if bool(row_archived) == is_archived]
+        if ids:
+            for obj in queryset.filter(pk__in=ids).select_related(*related):
+                objects[(is_archived, obj.pk)] = obj
+    return [(objects[(bool(is_archived), pk)], bool(is_archived)) for pk, _, is_archived in rows
+            if (bool(is_archived), pk) in objects]
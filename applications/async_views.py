@@ -0,0 +1,132 @@
+"""Async (ASGI) versions of the enrollment and payment read endpoints, and the event stream."""
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+
+from api import events
+from api.async_support import api_view, json_response, paginate
+from applications.changelog import PAGE_SIZE
+from applications.models import ChangeLogEntry, Enrollment, Payment
+from applications.serializers import EnrollmentSerializer, PaymentSerializer
+
+HEARTBEAT_SECONDS = getattr(settings, "EVENTS_HEARTBEAT_SECONDS", 15)
+STREAM_SECONDS = getattr(settings, "EVENTS_STREAM_SECONDS", 300)
+
+
+def _enrollments(user):
+    queryset = Enrollment.objects.select_related("student", "tuition").order_by("id")
+    if user.role == "User":
+        return queryset.filter(student=user)
+    elif user.role == "Tutor":
+        return queryset.filter(tuition__tutor=user)
+    return queryset.none()
+
+
+def _payments(user):
+    queryset = Payment.objects.select_related("student", "tutor", "enrollment__tuition").order_by("id")
+    if user.role == "User":
+        return queryset.filter(student=user)
+    elif user.role == "Tutor":
+        return queryset.filter(tutor=user)
+    return queryset.none()
+
+
+@require_GET
+@api_view()
+async def enrollment_list(request):
+    # unpaginated, like EnrollmentViewSet
+    enrollments = [enrollment async for enrollment in _enrollments(request.user)]
+    return json_response(EnrollmentSerializer(enrollments, many=True).data)
+
+
+@require_GET
+@api_view()
+async def enrollment_detail(request, pk):
+    try:
+        enrollment = await _enrollments(request.user).aget(pk=pk)
+    except Enrollment.DoesNotExist:
+        raise exceptions.NotFound("No Enrollment matches the given query.")
+    return json_response(EnrollmentSerializer(enrollment).data)
+
+
+@require_GET
+@api_view()
+async def payment_list(request):
+    data = await paginate(request, _payments(request.user), lambda items: PaymentSerializer(items, many=True).data)
+    return json_response(data)
+
+
+def _sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def _missed(user, after):
+    entries = ChangeLogEntry.objects.filter(user=user, id__gt=after).order_by("id")[:PAGE_SIZE + 1]
+    return [entry async for entry in entries]
+
+
+async def _stream(user, last_id):
+    # subscribed here, not in the view, so a client gone before the first chunk leaves nothing
+    # behind; and before replaying, so nothing committed in between is lost
+    subscription = events.get_broker().subscribe(user.pk)
+    # live events come in commit order, not id order: skip exactly the replayed ones
+    replayed = set()
+    try:
+        # clients reconnect after this many ms, sending Last-Event-ID
+        yield "retry: 3000\n\n"
+        if last_id is not None:
+            missed = await _missed(user, last_id)
+            if len(missed) > PAGE_SIZE:
+                yield _sse("resync", {"reason": "too many missed events"})
+                return
+            for entry in missed:
+                yield _sse(entry.model, entry.as_event(), entry.id)
+                replayed.add(entry.id)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_SECONDS
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await subscription.get(min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if subscription.overflowed:
+                yield _sse("resync", {"reason": "client too slow"})
+                return
+            if event["cursor"] in replayed:
+                replayed.discard(event["cursor"])
+                continue
+            yield _sse(event["type"], event, event["cursor"])
+    finally:
+        subscription.close()
+
+
+@require_GET
+@api_view(query_token=True)
+async def event_stream(request):
+    """
+    Server-sent events for the caller: one event per change log entry, named by
+    type (application, enrollment, payment, topic, assignment). Fetch the data
+    from /changes/. The stream ends after EVENTS_STREAM_SECONDS and the client
+    reconnects with Last-Event-ID, getting what it missed in between.
+    """
+    if not isinstance(request, ASGIRequest):
+        # a WSGI worker would buffer the whole stream
+        return json_response({"detail": "The event stream is only served under ASGI."}, status=501)
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        raise exceptions.ValidationError({"last_event_id": "Must be an event id."})
+
+    response = StreamingHttpResponse(_stream(request.user, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
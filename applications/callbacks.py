@@ -0,0 +1,226 @@
+"""
+Durable queue for gateway callbacks.
+
+The callback views only store the callback and redirect. Processing happens
+in `process_pending` (the `process_payment_callbacks` worker) or, when
+PAYMENT_CALLBACKS_ASYNC is off, right after the insert in the same request.
+
+The callback URLs are public, so a success callback is never trusted on its
+own: the payment completes only after the gateway's validation API confirms
+the transaction for this tran_id and the stored amount. Anything else fails
+the payment.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import payment_state
+from .gateway import get_gateway
+from .models import Payment, PaymentCallback
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "PAYMENT_CALLBACK_MAX_ATTEMPTS", 5)
+VALID_STATUSES = ("VALID", "VALIDATED")
+# not applied yet: a redelivery of one of these is processed again
+UNFINISHED = (PaymentCallback.STATUS_RECEIVED, PaymentCallback.STATUS_ERROR)
+
+TARGETS = {
+    PaymentCallback.KIND_SUCCESS: Payment.PAYMENT_STATUS_COMPLETED,
+    PaymentCallback.KIND_FAIL: Payment.PAYMENT_STATUS_FAILED,
+    PaymentCallback.KIND_CANCEL: Payment.PAYMENT_STATUS_FAILED,
+}
+
+
+class CallbackMetrics:
+    """In-process counters and recent latencies for this worker/web process."""
+
+    def __init__(self, window=1000):
+        self.counters = {"received": 0, "duplicates": 0, "processed": 0, "ignored": 0, "errors": 0}
+        self.queue_lag = deque(maxlen=window)
+        self.processing_time = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def incr(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def observe(self, lag, duration):
+        with self._lock:
+            self.queue_lag.append(lag)
+            self.processing_time.append(duration)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "queue_lag_p50": percentile(self.queue_lag, 50),
+                "queue_lag_p95": percentile(self.queue_lag, 95),
+                "processing_time_p50": percentile(self.processing_time, 50),
+                "processing_time_p95": percentile(self.processing_time, 95),
+            }
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+
+metrics = CallbackMetrics()
+
+
+class CallbackNotApplied(Exception):
+    """The callback is stored but could not be applied yet; the gateway should retry it."""
+
+
+def receive(kind, data):
+    """
+    Store a callback. Returns the stored row, or None for a duplicate of one
+    already applied. Processes it inline unless PAYMENT_CALLBACKS_ASYNC is set,
+    and raises `CallbackNotApplied` when that fails, so the view answers 5xx
+    and the gateway redelivers. A redelivery of a stored callback that was
+    never applied is processed again instead of being dropped.
+    """
+    tran_id = data.get("tran_id")
+    dedupe_key = f"{kind}:{tran_id}"
+    try:
+        with transaction.atomic():
+            callback = PaymentCallback.objects.create(
+                kind=kind,
+                tran_id=tran_id,
+                dedupe_key=dedupe_key,
+                payload=dict(data.items()),
+            )
+    except IntegrityError:
+        metrics.incr("duplicates")
+        callback = PaymentCallback.objects.filter(dedupe_key=dedupe_key).first()
+        if callback is None or callback.status not in UNFINISHED or getattr(settings, "PAYMENT_CALLBACKS_ASYNC", False):
+            logger.info(f"Duplicate {kind} callback for {tran_id} ignored")
+            return None
+        logger.info(f"Duplicate {kind} callback for {tran_id}: retrying the unapplied one")
+    else:
+        metrics.incr("received")
+        if getattr(settings, "PAYMENT_CALLBACKS_ASYNC", False):
+            return callback
+
+    processed = process_one(callback.pk, statuses=UNFINISHED)
+    if processed is None or processed.status in UNFINISHED:
+        raise CallbackNotApplied(f"{kind} callback for {tran_id} not applied yet")
+    return processed
+
+
+def verified_target(callback):
+    """
+    The state a callback moves its payment to, with the reason when a success
+    callback is downgraded. A success counts only when the gateway validates
+    `val_id` for this tran_id and the stored amount. Gateway errors propagate,
+    leaving the callback to be retried.
+    """
+    target = TARGETS[callback.kind]
+    if target != Payment.PAYMENT_STATUS_COMPLETED:
+        return target, ""
+    failed = Payment.PAYMENT_STATUS_FAILED
+
+    val_id = callback.payload.get("val_id")
+    if not val_id:
+        return failed, "Success callback without val_id"
+    result = get_gateway().validate_transaction(val_id)
+    if result.get("status") not in VALID_STATUSES:
+        return failed, f"Gateway validation status {result.get('status')}"
+    if result.get("tran_id") != callback.tran_id:
+        return failed, f"Gateway validated {result.get('tran_id')}, not {callback.tran_id}"
+
+    amount = Payment.objects.filter(transaction_id=callback.tran_id).values_list("amount", flat=True).first()
+    if amount is None:
+        raise Payment.DoesNotExist()
+    try:
+        validated_amount = Decimal(str(result.get("amount")))
+    except InvalidOperation:
+        return failed, f"Gateway returned amount {result.get('amount')!r}"
+    if validated_amount != amount:
+        return failed, f"Gateway validated {validated_amount}, payment is {amount}"
+    return target, ""
+
+
+def process(callback):
+    """Validate one callback and apply it through the payment state machine."""
+    started = time.monotonic()
+    callback.attempts += 1
+    try:
+        target, rejected = verified_target(callback)
+        if rejected:
+            logger.warning(f"Payment callback {callback.pk} for {callback.tran_id} rejected: {rejected}")
+        payment, changed = payment_state.transition(target, transaction_id=callback.tran_id)
+        callback.status = PaymentCallback.STATUS_PROCESSED if changed else PaymentCallback.STATUS_IGNORED
+        callback.error = rejected or ("" if changed else f"Payment already {payment.status}")
+    except (Payment.DoesNotExist, payment_state.InvalidTransition) as e:
+        callback.status = PaymentCallback.STATUS_IGNORED
+        callback.error = str(e) or "Payment not found"
+    except Exception as e:
+        logger.error(f"Payment callback {callback.pk} failed: {e}")
+        metrics.incr("errors")
+        callback.error = str(e)
+        if callback.attempts >= MAX_ATTEMPTS:
+            callback.status = PaymentCallback.STATUS_ERROR
+        callback.save(update_fields=["attempts", "status", "error"])
+        return callback
+
+    callback.processed_at = timezone.now()
+    callback.save(update_fields=["attempts", "status", "error", "processed_at"])
+    metrics.incr("processed" if callback.status == PaymentCallback.STATUS_PROCESSED else "ignored")
+    metrics.observe((callback.processed_at - callback.received_at).total_seconds(), time.monotonic() - started)
+    return callback
+
+
+def process_one(pk, statuses=(PaymentCallback.STATUS_RECEIVED,)):
+    """
+    Claim one callback in its own transaction and process it. Returns None
+    when another worker holds it or it is no longer in `statuses`.
+    """
+    with transaction.atomic():
+        callback = (
+            PaymentCallback.objects.select_for_update(skip_locked=True)
+            .filter(pk=pk, status__in=statuses)
+            .first()
+        )
+        if callback is None:
+            return None
+        return process(callback)
+
+
+def process_pending(batch_size=100):
+    """Process up to `batch_size` received callbacks, each in its own transaction. Returns how many were handled."""
+    ids = list(
+        PaymentCallback.objects.filter(status=PaymentCallback.STATUS_RECEIVED)
+        .order_by("id").values_list("id", flat=True)[:batch_size]
+    )
+    return sum(1 for pk in ids if process_one(pk) is not None)
+
+
+def queue_stats(window_minutes=5):
+    """Backlog and throughput from the callback table, valid across processes."""
+    since = timezone.now() - timedelta(minutes=window_minutes)
+    by_status = dict(
+        PaymentCallback.objects.values_list("status").annotate(n=Count("id")).values_list("status", "n")
+    )
+    recent = PaymentCallback.objects.filter(processed_at__gte=since)
+    sample = recent.order_by("-processed_at").values_list("received_at", "processed_at")[:5000]
+    lags = [(processed - received).total_seconds() for received, processed in sample]
+    return {
+        "backlog": by_status.get(PaymentCallback.STATUS_RECEIVED, 0),
+        "by_status": by_status,
+        "processed_per_minute": round(recent.count() / window_minutes, 2),
+        "lag_p50": percentile(lags, 50),
+        "lag_p95": percentile(lags, 95),
+    }
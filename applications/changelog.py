@@ -0,0 +1,133 @@
+"""
+Delta-sync feed over the change log (`/changes/?since=<cursor>`).
+
+Every change or delete of an application, enrollment, payment, topic or
+assignment writes a ChangeLogEntry per user who can see the row, in the
+same transaction (see `ChangeLogged`). A client loads its lists once,
+keeps the cursor, and then asks only for what changed since.
+
+Entries are collapsed per object, and inserts and updates are returned
+with the object's current data, so a row changed ten times is sent once.
+A row the user can no longer see is reported as deleted.
+
+Entry ids are allocated when a transaction writes, not when it commits,
+so a slow transaction (a callback batch, an archive batch, payout
+settlement) can commit an id below one a client has already read. Every
+read therefore also re-scans the caller's entries from the last
+CHANGELOG_LOOKBACK_SECONDS below the cursor and re-sends those objects
+with their current data. Changes are upserts and deletes, so the client
+dedupes simply by applying them again. The lookback must be longer than
+any transaction that writes change-logged rows. Entries are pruned after
+CHANGELOG_RETENTION_DAYS (`prune_changelog`); an older cursor gets 410
+and the client starts over.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Application, Assignment, ChangeLogEntry, Enrollment, Payment, Topic
+from .serializers import (
+    ApplicationSerializer, AssignmentSerializer, EnrollmentSerializer, PaymentSerializer, TopicSerializer,
+)
+
+LOOKBACK_SECONDS = getattr(settings, "CHANGELOG_LOOKBACK_SECONDS", 300)
+RETENTION_DAYS = getattr(settings, "CHANGELOG_RETENTION_DAYS", 7)
+PAGE_SIZE = 500
+
+OP_NAMES = {ChangeLogEntry.OP_INSERT: "insert", ChangeLogEntry.OP_UPDATE: "update", ChangeLogEntry.OP_DELETE: "delete"}
+
+# model name -> (model, serializer, select_related for the serializer)
+FEEDS = {
+    model._meta.model_name: (model, serializer, related)
+    for model, serializer, related in (
+        (Application, ApplicationSerializer, ("applicant", "tuition")),
+        (Enrollment, EnrollmentSerializer, ("student", "tuition")),
+        (Payment, PaymentSerializer, ("student", "tutor", "enrollment__tuition")),
+        (Topic, TopicSerializer, ()),
+        (Assignment, AssignmentSerializer, ()),
+    )
+}
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def latest_cursor():
+    return ChangeLogEntry.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def _visible_to(model, user):
+    condition = Q()
+    for lookup in model.changelog_audience:
+        condition |= Q(**{lookup: user.pk})
+    return condition
+
+
+def changes_since(user, since, context=None, limit=PAGE_SIZE):
+    """
+    Changes visible to `user` after cursor `since`. Returns (changes, cursor, more).
+    Raises CursorExpired if entries after `since` may have been pruned.
+    """
+    oldest = ChangeLogEntry.objects.order_by("id").values_list("id", flat=True).first()
+    if oldest is not None and since < oldest - 1:
+        raise CursorExpired()
+
+    entries = list(
+        ChangeLogEntry.objects.filter(user=user, id__gt=since)
+        .order_by("id")
+        .values_list("id", "model", "object_id", "op")[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    # objects of entries that may have committed below `since` after the client read past them
+    recent = ChangeLogEntry.objects.filter(
+        user=user, id__lte=since, created_at__gte=timezone.now() - timedelta(seconds=LOOKBACK_SECONDS)
+    )
+    rescanned = list(recent.order_by().values_list("model", "object_id").distinct()[:limit])
+    if not entries and not rescanned:
+        return [], since, False
+
+    # one change per object: re-scanned objects are sent with their current state,
+    # otherwise the last op wins, but an insert stays an insert
+    latest = {key: ChangeLogEntry.OP_UPDATE for key in rescanned}
+    for _, model, object_id, op in entries:
+        previous = latest.get((model, object_id))
+        if previous == ChangeLogEntry.OP_INSERT and op == ChangeLogEntry.OP_UPDATE:
+            op = ChangeLogEntry.OP_INSERT
+        latest[(model, object_id)] = op
+
+    current = {}
+    for name, (model, serializer, related) in FEEDS.items():
+        ids = [object_id for (model_name, object_id), op in latest.items()
+               if model_name == name and op != ChangeLogEntry.OP_DELETE]
+        if ids:
+            objects = model.objects.filter(_visible_to(model, user), pk__in=ids).select_related(*related)
+            for obj in objects:
+                current[(name, obj.pk)] = serializer(obj, context=context or {}).data
+
+    changes = []
+    for (name, object_id), op in latest.items():
+        data = current.get((name, object_id))
+        if op == ChangeLogEntry.OP_DELETE or data is None:
+            changes.append({"type": name, "op": "delete", "id": object_id})
+        else:
+            changes.append({"type": name, "op": OP_NAMES[op], "id": object_id, "data": data})
+    return changes, entries[-1][0] if entries else since, more
+
+
+def prune(days=RETENTION_DAYS, batch_size=10_000):
+    """Delete entries older than `days`, keeping the newest one so expired cursors are still detected."""
+    cutoff = timezone.now() - timedelta(days=days)
+    newest = latest_cursor()
+    deleted = 0
+    while True:
+        ids = list(
+            ChangeLogEntry.objects.filter(created_at__lt=cutoff, id__lt=newest)
+            .order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += ChangeLogEntry.objects.filter(id__in=ids).delete()[0]
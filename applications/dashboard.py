@@ -0,0 +1,115 @@
+"""
+Backend-for-frontend dashboards: everything a tutor's or a student's
+dashboard shows, in one response.
+
+Each section is built with a fixed number of queries (counts come from
+annotations and aggregates, related rows from select_related) and is
+cached on its own, see `dashboard_cache`. A warm dashboard costs two cache
+round trips and no queries.
+"""
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from tuition.models import Tuition
+from tuition.serializers import TuitionSerializer
+
+from . import ledger
+from .dashboard_cache import get_sections
+from .models import Application, Assignment, Enrollment, Payment
+from .serializers import ApplicationSerializer, AssignmentSerializer, EnrollmentSerializer, PaymentSerializer
+
+RECENT = 10
+
+
+def _tuitions(user):
+    tuitions = (
+        Tuition.objects.filter(tutor=user).select_related("tutor")
+        .annotate(
+            applications_count=Count("applications", distinct=True),
+            pending_applications=Count("applications", filter=Q(applications__status=Application.STATUS_PENDING),
+                                       distinct=True),
+            enrollments_count=Count("enrollments", distinct=True),
+        )
+        .order_by("-created_at")
+    )
+    return [
+        {**TuitionSerializer(tuition).data, "applications_count": tuition.applications_count,
+         "pending_applications": tuition.pending_applications, "enrollments_count": tuition.enrollments_count}
+        for tuition in tuitions
+    ]
+
+
+def _applications(queryset):
+    counts = queryset.aggregate(
+        total=Count("id"),
+        **{status.lower(): Count("id", filter=Q(status=status)) for status, _ in Application.STATUS_CHOICES},
+    )
+    recent = queryset.select_related("applicant", "tuition").order_by("-applied_at")[:RECENT]
+    return {"counts": counts, "recent": ApplicationSerializer(recent, many=True).data}
+
+
+def _enrollments(queryset):
+    recent = (
+        queryset.select_related("student", "tuition")
+        .annotate(
+            topics_count=Count("topics", distinct=True),
+            completed_topics=Count("topics", filter=Q(topics__completed=True), distinct=True),
+            assignments_count=Count("assignments", distinct=True),
+        )
+        .order_by("-enrolled_at")[:RECENT]
+    )
+    return {
+        "count": queryset.count(),
+        "recent": [
+            {**EnrollmentSerializer(enrollment).data, "topics_count": enrollment.topics_count,
+             "completed_topics": enrollment.completed_topics, "assignments_count": enrollment.assignments_count}
+            for enrollment in recent
+        ],
+    }
+
+
+def _payments(queryset):
+    recent = queryset.select_related("student", "tutor", "enrollment__tuition").order_by("-created_at")[:RECENT]
+    return {"count": queryset.count(), "recent": PaymentSerializer(recent, many=True).data}
+
+
+def _wallet(user):
+    balance = ledger.get_balance(user.pk)
+    return {
+        "total_earned": balance.total_earned,
+        "available_balance": balance.available_balance,
+        "pending_balance": balance.pending_balance,
+        "total_withdrawn": balance.total_withdrawn,
+    }
+
+
+def _upcoming_assignments(user):
+    assignments = (
+        Assignment.objects.filter(enrollment__student=user, due_date__gte=timezone.localdate())
+        .annotate(tuition_title=F("enrollment__tuition__title"))
+        .order_by("due_date", "id")[:RECENT]
+    )
+    return [{**AssignmentSerializer(assignment).data, "tuition_title": assignment.tuition_title}
+            for assignment in assignments]
+
+
+def tutor(user):
+    """Own tuitions, applications to them, enrollments, wallet, earnings and payments (11 queries cold)."""
+    return get_sections(user.pk, {
+        "tuitions": lambda: _tuitions(user),
+        "applications": lambda: _applications(Application.objects.filter(tuition__tutor=user)),
+        "enrollments": lambda: _enrollments(Enrollment.objects.filter(tuition__tutor=user)),
+        "wallet": lambda: _wallet(user),
+        "earnings": lambda: _payments(Payment.objects.filter(tutor=user, status=Payment.PAYMENT_STATUS_COMPLETED)),
+        "payments": lambda: _payments(Payment.objects.filter(tutor=user)),
+    })
+
+
+def student(user):
+    """Own applications, enrollments, payments and upcoming assignments (7 queries cold)."""
+    return get_sections(user.pk, {
+        "applications": lambda: _applications(Application.objects.filter(applicant=user)),
+        "enrollments": lambda: _enrollments(Enrollment.objects.filter(student=user)),
+        "payments": lambda: _payments(Payment.objects.filter(student=user)),
+        "assignments": lambda: _upcoming_assignments(user),
+    })
@@ -0,0 +1,99 @@
+"""
+Per-user, per-section cache for the dashboard endpoints.
+
+Each (section, user) has a version number in the cache, and the section is
+stored under a key that includes it. Invalidating bumps the version, so
+every process sharing the cache misses from then on without deleting
+anything. Sections also expire after DASHBOARD_CACHE_SECONDS, which bounds
+staleness for changes nothing invalidates (e.g. a tuition retitled under a
+student's enrollments).
+
+That only holds when the default cache is shared by every process (Redis
+via REDIS_URL, or Memcached). A per-process cache would leave other
+processes serving a dashboard invalidated elsewhere, so with one, or with
+DASHBOARD_CACHE_SECONDS=0, sections are built on every request.
+
+Writers invalidate after commit: the change log for application,
+enrollment, payment, topic and assignment rows, the ledger for wallet
+balances, and a signal for the tutor's own tuitions.
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+TTL = getattr(settings, "DASHBOARD_CACHE_SECONDS", 300)
+
+# change log model name -> sections that show it
+SECTIONS_BY_MODEL = {
+    "application": ("applications", "tuitions"),
+    "enrollment": ("enrollments", "tuitions"),
+    "payment": ("payments", "earnings"),
+    "topic": ("enrollments",),
+    "assignment": ("enrollments", "assignments"),
+}
+
+
+def enabled():
+    return TTL > 0 and not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _version_key(section, user_id):
+    return f"dashboard:v:{section}:{user_id}"
+
+
+def get_sections(user_id, builders):
+    """`builders` maps section -> zero-argument function; returns section -> data, building only misses."""
+    if not enabled():
+        return {section: build() for section, build in builders.items()}
+    version_keys = {section: _version_key(section, user_id) for section in builders}
+    versions = cache.get_many(list(version_keys.values()))
+    data_keys = {
+        section: f"dashboard:{section}:{user_id}:{versions.get(key, 0)}" for section, key in version_keys.items()
+    }
+    cached = cache.get_many(list(data_keys.values()))
+
+    sections, missing = {}, {}
+    for section, build in builders.items():
+        key = data_keys[section]
+        if key in cached:
+            sections[section] = cached[key]
+        else:
+            sections[section] = missing[key] = build()
+    if missing:
+        cache.set_many(missing, TTL)
+    return sections
+
+
+def _bump(section, user_id):
+    key = _version_key(section, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # no version yet: anything cached was stored under version 0
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def invalidate(user_ids, *sections):
+    """Drop these sections for these users once the current transaction commits."""
+    if not enabled():
+        return
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+
+    def bump():
+        for user_id in user_ids:
+            for section in sections:
+                _bump(section, user_id)
+
+    if user_ids:
+        transaction.on_commit(bump)
+
+
+def invalidate_for_change(user_id, model):
+    """Called for each change log entry, already after commit."""
+    if not enabled():
+        return
+    for section in SECTIONS_BY_MODEL.get(model, ()):
+        _bump(section, user_id)
@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """The payment gateway could not be reached or returned garbage."""
+
+
+class CircuitOpenError(GatewayError):
+    """The gateway has failed too often recently; calls are short-circuited."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds, then lets one trial call through.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Payment gateway circuit is open")
+                self.state = self.HALF_OPEN
+            elif self.state == self.HALF_OPEN:
+                # a trial call is already in flight
+                raise CircuitOpenError("Payment gateway circuit is half-open")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Payment gateway circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class PaymentGateway:
+    """Interface every gateway implementation provides."""
+    name = None
+
+    def create_session(self, post_body):
+        raise NotImplementedError
+
+    def validate_transaction(self, val_id):
+        raise NotImplementedError
+
+
+class SSLCommerzGateway(PaymentGateway):
+    """
+    Wraps `sslcommerz_lib.SSLCOMMERZ` for its URLs and payload conventions but
+    sends requests through one pooled `requests.Session` with strict timeouts,
+    retries with exponential backoff and a circuit breaker.
+
+    Session creation is safe to retry because SSLCommerz keys sessions on
+    `tran_id`, and every call made here is keyed on it.
+    """
+    name = "sslcommerz"
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, credentials, connect_timeout=3.05, read_timeout=10.0, max_retries=2,
+                 backoff_factor=0.5, pool_maxsize=10, failure_threshold=5, reset_timeout=30.0):
+        # imported here, not at module level, to keep them off the cold start path
+        import requests
+        from requests.adapters import HTTPAdapter
+        from sslcommerz_lib import SSLCOMMERZ
+
+        self.client = SSLCOMMERZ(credentials)
+        self.client.call_api = self._call_api
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.pool_maxsize = pool_maxsize
+
+        # retried; any other RequestException fails the call at once
+        self.transport_errors = (requests.ConnectionError, requests.Timeout)
+        self.request_errors = requests.RequestException
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+
+    def create_session(self, post_body):
+        return self.client.createSession(dict(post_body))
+
+    def validate_transaction(self, val_id):
+        return self.client.validationTransactionOrder(val_id)
+
+    def backoff(self, attempt):
+        """Seconds to sleep before retry number `attempt` (full jitter)."""
+        return random.uniform(0, self.backoff_factor * (2 ** attempt))
+
+    def _call_api(self, method, url, payload):
+        self.breaker.before_call()
+        succeeded = False
+        try:
+            data = self._send(method, url, payload)
+            succeeded = True
+            return data
+        except self.request_errors as e:
+            raise GatewayError(f"Gateway {method} failed: {e}") from e
+        finally:
+            # every way out, including errors not anticipated here, must settle a half-open trial call
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def _send(self, method, url, payload):
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff(attempt - 1))
+            try:
+                if method == "POST":
+                    response = self.session.post(url, data=payload, timeout=self.timeout)
+                else:
+                    response = self.session.get(url, params=payload, timeout=self.timeout)
+            except self.transport_errors as e:
+                last_error = e
+                logger.warning(f"Gateway {method} attempt {attempt + 1} failed: {e}")
+                continue
+
+            if response.status_code in self.RETRY_STATUSES:
+                last_error = GatewayError(f"Gateway returned HTTP {response.status_code}")
+                logger.warning(f"Gateway {method} attempt {attempt + 1} returned {response.status_code}")
+                continue
+
+            try:
+                return response.json()
+            except ValueError:
+                raise GatewayError("Gateway returned a non-JSON response")
+
+        raise GatewayError(f"Gateway unreachable after {self.max_retries + 1} attempts: {last_error}")
+
+
+class StubGateway(PaymentGateway):
+    """
+    In-process stand-in for SSLCommerz, used for tests and offline load tests.
+    Every session succeeds unless `failure_rate` says otherwise; `latency`
+    simulates the gateway round trip.
+    """
+    name = "stub"
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sessions = {}
+        self.settlements = {}
+        self._lock = threading.Lock()
+
+    def _simulate(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._accepted()
+
+    def _accepted(self):
+        return not (self.failure_rate and random.random() < self.failure_rate)
+
+    def create_session(self, post_body):
+        if not self._simulate():
+            return {"status": "FAILED", "failedreason": "Stub gateway rejected the session"}
+        return self._open_session(post_body)
+
+    async def acreate_session(self, post_body):
+        """`create_session` that waits on the event loop instead of a thread."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not self._accepted():
+            return {"status": "FAILED", "failedreason": "Stub gateway rejected the session"}
+        return self._open_session(post_body)
+
+    def _open_session(self, post_body):
+        tran_id = post_body["tran_id"]
+        sessionkey = hashlib.sha1(f"{tran_id}:{uuid.uuid4()}".encode()).hexdigest()
+        with self._lock:
+            self.sessions[tran_id] = dict(post_body, sessionkey=sessionkey)
+        return {
+            "status": "SUCCESS",
+            "sessionkey": sessionkey,
+            "GatewayPageURL": f"https://stub.gateway.local/checkout/{sessionkey}",
+        }
+
+    def settle(self, tran_id, status="VALID", amount=None):
+        """Mark a stub transaction as settled the way the real gateway would."""
+        with self._lock:
+            session = self.sessions.get(tran_id, {})
+            self.settlements[tran_id] = {
+                "tran_id": tran_id,
+                "status": status,
+                "amount": str(amount if amount is not None else session.get("total_amount", "0")),
+            }
+            return self.settlements[tran_id]
+
+    def validate_transaction(self, val_id):
+        self._simulate()
+        with self._lock:
+            settlement = self.settlements.get(val_id)
+        if settlement is None:
+            return {"status": "INVALID_TRANSACTION"}
+        return dict(settlement)
+
+
+class AsyncGateway:
+    """
+    Async facade for ASGI deployments.
+    Uses `httpx.AsyncClient` (in requirements.txt) when the gateway is
+    SSLCommerz. Without httpx it runs the pooled sync client in a worker
+    thread, so the event loop is never blocked either way. `transport`
+    replaces the network, e.g. with `httpx.MockTransport` in tests.
+    """
+
+    def __init__(self, gateway, transport=None):
+        self.gateway = gateway
+        self.client = None
+        if not isinstance(gateway, SSLCommerzGateway):
+            return
+        try:
+            import httpx
+        except ImportError:  # the async client falls back to a worker thread
+            return
+        self.transport_error = httpx.TransportError
+        self.http_error = httpx.HTTPError
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(gateway.timeout[1], connect=gateway.timeout[0]),
+            limits=httpx.Limits(max_connections=gateway.pool_maxsize),
+            transport=transport,
+        )
+
+    async def create_session(self, post_body):
+        if isinstance(self.gateway, StubGateway):
+            return await self.gateway.acreate_session(post_body)
+        if self.client is None:
+            return await sync_to_async(self.gateway.create_session, thread_sensitive=False)(post_body)
+        body = dict(post_body)
+        body["store_id"] = self.gateway.client.store_id
+        body["store_passwd"] = self.gateway.client.store_pass
+        return await self._post(self.gateway.client.createSessionUrl, body)
+
+    async def _post(self, url, payload):
+        gateway = self.gateway
+        gateway.breaker.before_call()
+        succeeded = False
+        try:
+            data = await self._send(url, payload)
+            succeeded = True
+            return data
+        except self.http_error as e:
+            raise GatewayError(f"Gateway POST failed: {e}") from e
+        finally:
+            # also runs on CancelledError when the client disconnects mid-call
+            if succeeded:
+                gateway.breaker.record_success()
+            else:
+                gateway.breaker.record_failure()
+
+    async def _send(self, url, payload):
+        gateway = self.gateway
+        last_error = None
+        for attempt in range(gateway.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(gateway.backoff(attempt - 1))
+            try:
+                response = await self.client.post(url, data=payload)
+            except self.transport_error as e:
+                last_error = e
+                continue
+            if response.status_code in gateway.RETRY_STATUSES:
+                last_error = GatewayError(f"Gateway returned HTTP {response.status_code}")
+                continue
+            try:
+                return response.json()
+            except ValueError:
+                raise GatewayError("Gateway returned a non-JSON response")
+        raise GatewayError(f"Gateway unreachable after {gateway.max_retries + 1} attempts: {last_error}")
+
+
+_gateway = None
+_async_gateway = None
+_gateway_lock = threading.RLock()
+
+
+def build_gateway():
+    options = dict(getattr(settings, "PAYMENT_GATEWAY_OPTIONS", {}))
+    if settings.PAYMENT_GATEWAY == "stub":
+        return StubGateway(latency=options.get("stub_latency", 0.0), failure_rate=options.get("stub_failure_rate", 0.0))
+    options.pop("stub_latency", None)
+    options.pop("stub_failure_rate", None)
+    return SSLCommerzGateway(settings.SSLCOMMERZ, **options)
+
+
+def get_gateway():
+    """Process-wide gateway so connections are reused between requests."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = build_gateway()
+    return _gateway
+
+
+def get_async_gateway():
+    global _async_gateway
+    if _async_gateway is None:
+        with _gateway_lock:
+            if _async_gateway is None:
+                _async_gateway = AsyncGateway(get_gateway())
+    return _async_gateway
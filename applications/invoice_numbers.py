@@ -0,0 +1,137 @@
+"""
+Sequential, human-readable invoice numbers (INV-2025-000123).
+
+Each worker process reserves a block of numbers with one short row lock on
+`InvoiceSequence` and then hands them out from memory, so issuing a number
+never touches the database. Numbers a worker reserved but did not issue
+(crash, rollback, expired block) are found by `audit_blocks` and recorded in
+`VoidedInvoiceNumber`, so every number in a sequence is either on an invoice
+or accounted for as void.
+
+Reservation must not run inside a caller's transaction, otherwise the
+sequence row stays locked until that transaction ends; callers allocate
+from `transaction.on_commit` hooks or outside any atomic block.
+"""
+import atexit
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Invoice, InvoiceNumberBlock, InvoiceSequence, VoidedInvoiceNumber
+
+# A worker stops issuing from a block after this long, which is what lets
+# the audit treat older unreleased blocks as abandoned.
+BLOCK_MAX_AGE = timedelta(minutes=getattr(settings, "INVOICE_NUMBER_BLOCK_MAX_AGE_MINUTES", 60))
+
+
+def format_number(prefix, year, value):
+    return f"{prefix}-{year}-{value:06d}"
+
+
+class InvoiceNumberAllocator:
+
+    def __init__(self, prefix=None, block_size=None, owner=None):
+        self.prefix = prefix or getattr(settings, "INVOICE_NUMBER_PREFIX", "INV")
+        self.block_size = block_size or getattr(settings, "INVOICE_NUMBER_BLOCK_SIZE", 20)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._blocks = {}
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def next_number(self, year=None):
+        year = year or timezone.now().year
+        with self._lock:
+            block = self._blocks.get(year)
+            if block is None or self._next[year] > block.end or timezone.now() - block.reserved_at > BLOCK_MAX_AGE:
+                block = self._reserve(year)
+            value = self._next[year]
+            self._next[year] = value + 1
+            block.last_issued = value
+        return format_number(self.prefix, year, value)
+
+    def _reserve(self, year):
+        previous = self._blocks.get(year)
+        if previous is not None:
+            self._release(previous)
+
+        with transaction.atomic():
+            InvoiceSequence.objects.get_or_create(prefix=self.prefix, year=year)
+            sequence = InvoiceSequence.objects.select_for_update().get(prefix=self.prefix, year=year)
+            start = sequence.next_value
+            sequence.next_value = start + self.block_size
+            sequence.save(update_fields=["next_value"])
+            block = InvoiceNumberBlock.objects.create(
+                sequence=sequence,
+                start=start,
+                end=start + self.block_size - 1,
+                owner=self.owner,
+            )
+        self._blocks[year] = block
+        self._next[year] = start
+        return block
+
+    def _release(self, block):
+        InvoiceNumberBlock.objects.filter(pk=block.pk).update(
+            last_issued=block.last_issued, released_at=timezone.now()
+        )
+
+    def release(self):
+        """Hand back every open block (called at process exit)."""
+        with self._lock:
+            for block in self._blocks.values():
+                self._release(block)
+            self._blocks.clear()
+            self._next.clear()
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = InvoiceNumberAllocator()
+                atexit.register(_release_at_exit, _allocator)
+    return _allocator
+
+
+def _release_at_exit(allocator):
+    try:
+        allocator.release()
+    except Exception:
+        # the audit voids whatever a dying process could not hand back
+        pass
+
+
+def audit_blocks(stale_after=None):
+    """
+    Void every reserved-but-unissued number in released or abandoned blocks.
+    Returns the number of newly voided numbers.
+    """
+    stale_before = timezone.now() - (stale_after or BLOCK_MAX_AGE * 2)
+    blocks = InvoiceNumberBlock.objects.filter(audited=False).select_related("sequence").order_by("id")
+    voided = 0
+    for block in blocks.iterator():
+        if block.released_at is None and block.reserved_at > stale_before:
+            continue
+        prefix, year = block.sequence.prefix, block.sequence.year
+        numbers = [format_number(prefix, year, value) for value in range(block.start, block.end + 1)]
+        issued = set(Invoice.objects.filter(invoice_number__in=numbers).values_list("invoice_number", flat=True))
+        reason = "released unused" if block.released_at else "abandoned block"
+        with transaction.atomic():
+            VoidedInvoiceNumber.objects.bulk_create(
+                [VoidedInvoiceNumber(invoice_number=n, block=block, reason=reason) for n in numbers if n not in issued],
+                ignore_conflicts=True,
+            )
+            InvoiceNumberBlock.objects.filter(pk=block.pk).update(audited=True)
+        voided += len(numbers) - len(issued)
+    return voided
@@ -0,0 +1,118 @@
+"""
+Invoice generation pipeline.
+
+Completing a payment creates its `Invoice` row, numbered by `invoice_numbers`,
+with an empty `pdf_url`; those rows are the render queue. `render_pending`
+renders PDFs in a process pool and stores them content-addressed (sha256 of
+the bytes) in the default storage under MEDIA_ROOT, so re-rendering an
+unchanged invoice writes nothing.
+"""
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from . import invoice_numbers
+from .models import Invoice, Payment
+from .pdf import render_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(payments):
+    """
+    Create the (unrendered) invoices for completed payments that have none.
+    Call outside a transaction (e.g. from `on_commit`): numbering may reserve a block.
+    """
+    existing = set(
+        Invoice.objects.filter(payment_id__in=[p.pk for p in payments]).values_list("payment_id", flat=True)
+    )
+    allocator = invoice_numbers.get_allocator()
+    Invoice.objects.bulk_create(
+        [Invoice(payment_id=p.pk, invoice_number=allocator.next_number()) for p in payments if p.pk not in existing],
+        ignore_conflicts=True,
+    )
+
+
+def invoice_context(invoice):
+    payment = invoice.payment
+    return {
+        "invoice_number": invoice.invoice_number,
+        "issued_date": invoice.issued_date.strftime("%Y-%m-%d"),
+        "transaction_id": payment.transaction_id,
+        "payment_date": payment.payment_date.strftime("%Y-%m-%d %H:%M UTC") if payment.payment_date else "-",
+        "student_name": payment.student.get_full_name() or payment.student.email,
+        "student_email": payment.student.email,
+        "tutor_name": payment.tutor.get_full_name() or payment.tutor.email,
+        "tutor_email": payment.tutor.email,
+        "tuition_title": payment.enrollment.tuition.title,
+        "amount": payment.amount,
+    }
+
+
+def store_pdf(data):
+    """Save PDF bytes under their content hash and return the storage name."""
+    digest = hashlib.sha256(data).hexdigest()
+    name = f"invoices/{digest[:2]}/{digest}.pdf"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def public_url(name):
+    url = default_storage.url(name)
+    if url.startswith("/"):
+        url = f"{settings.BACKEND_URL.rstrip('/')}{url}"
+    return url
+
+
+def pending_invoices():
+    return Invoice.objects.filter(pdf_url__isnull=True).select_related(
+        "payment__student", "payment__tutor", "payment__enrollment__tuition"
+    ).order_by("id")
+
+
+def render_batch(invoices, pool=None):
+    """Render and store a batch of invoices, then fill in their `pdf_url` in one query."""
+    contexts = [invoice_context(invoice) for invoice in invoices]
+    if pool is not None:
+        documents = list(pool.map(render_invoice_pdf, contexts))
+    else:
+        documents = [render_invoice_pdf(context) for context in contexts]
+    for invoice, data in zip(invoices, documents):
+        invoice.pdf_url = public_url(store_pdf(data))
+    Invoice.objects.bulk_update(invoices, ["pdf_url"])
+    return len(invoices)
+
+
+def render_pending(batch_size=200, workers=None, limit=None):
+    """Render every invoice still missing a PDF. Returns how many were rendered."""
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while limit is None or rendered < limit:
+            batch = list(pending_invoices()[:batch_size])
+            if not batch:
+                break
+            rendered += render_batch(batch, pool)
+            logger.info(f"Rendered {rendered} invoices")
+    return rendered
+
+
+def backfill(batch_size=1000):
+    """Create invoices for historical completed payments that never got one."""
+    created = 0
+    missing = Payment.objects.filter(
+        status=Payment.PAYMENT_STATUS_COMPLETED, invoice__isnull=True
+    ).order_by("id").only("id")
+    last_id = 0
+    while True:
+        batch = list(missing.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        enqueue(batch)
+        created += len(batch)
+        last_id = batch[-1].id
+    return created
@@ -0,0 +1,231 @@
+"""
+Append-only, double-entry ledger behind tutor wallets.
+
+Writes are plain inserts keyed by (entry_type, reference, account), so two
+callbacks crediting the same payment can never double count and never wait
+on each other. Balances are the latest `WalletSnapshot` plus the sum of the
+entries written after it, i.e. two queries no matter how long the history is.
+
+Reading a balance never writes, so it can be served from a read replica.
+Snapshots are taken after a write commits, once a tutor's delta has grown
+past WALLET_SNAPSHOT_EVERY entries, and by the periodic `snapshot_wallets`.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import dashboard_cache
+from .models import LedgerEntry, TutorWallet, WalletSnapshot
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+
+# Entries newer than this are left out of snapshots so a transaction that
+# committed a lower id late is still picked up by the delta query.
+SNAPSHOT_SETTLE_SECONDS = getattr(settings, "WALLET_SNAPSHOT_SETTLE_SECONDS", 60)
+# Take a new snapshot after a write once the delta grows past this many entries.
+SNAPSHOT_EVERY = getattr(settings, "WALLET_SNAPSHOT_EVERY", 200)
+
+EARNING_TYPES = [LedgerEntry.ENTRY_PAYMENT, LedgerEntry.ENTRY_REFUND]
+
+
+@dataclass
+class Balance:
+    total_earned: Decimal = ZERO
+    available_balance: Decimal = ZERO
+    pending_balance: Decimal = ZERO
+    total_withdrawn: Decimal = ZERO
+    last_entry_id: int = 0
+
+    def __add__(self, other):
+        return Balance(
+            total_earned=self.total_earned + other.total_earned,
+            available_balance=self.available_balance + other.available_balance,
+            pending_balance=self.pending_balance + other.pending_balance,
+            total_withdrawn=self.total_withdrawn + other.total_withdrawn,
+            last_entry_id=max(self.last_entry_id, other.last_entry_id),
+        )
+
+
+BALANCE_AGGREGATES = {
+    "total_earned": Sum("amount", filter=Q(account=LedgerEntry.ACCOUNT_AVAILABLE, entry_type__in=EARNING_TYPES)),
+    "available_balance": Sum("amount", filter=Q(account=LedgerEntry.ACCOUNT_AVAILABLE)),
+    "pending_balance": Sum("amount", filter=Q(account=LedgerEntry.ACCOUNT_PENDING)),
+    "total_withdrawn": Sum("amount", filter=Q(account=LedgerEntry.ACCOUNT_WITHDRAWN)),
+    "last_entry_id": Max("id"),
+}
+
+
+def _balance_from_row(row):
+    return Balance(**{field: row.get(field) or (0 if field == "last_entry_id" else ZERO) for field in BALANCE_AGGREGATES})
+
+
+def post(tutor_id, entry_type, reference, legs):
+    """
+    Insert one balanced posting. `legs` is a list of (account, amount) pairs.
+    Replaying the same posting is a no-op.
+    """
+    if sum((Decimal(amount) for _, amount in legs), ZERO) != ZERO:
+        raise ValueError(f"Unbalanced ledger posting {entry_type} {reference}")
+    entries = [
+        LedgerEntry(tutor_id=tutor_id, entry_type=entry_type, reference=reference, account=account, amount=amount)
+        for account, amount in legs
+    ]
+    LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    dashboard_cache.invalidate([tutor_id], "wallet")
+    snapshot_when_due([tutor_id])
+
+
+def record_payment(payment):
+    """Credit the tutor for a completed payment."""
+    record_payments([payment])
+    logger.info(f"Ledger credited {payment.amount} to tutor {payment.tutor_id} for payment {payment.pk}")
+
+
+def record_payments(payments):
+    """Credit tutors for many completed payments in one insert."""
+    TutorWallet.objects.bulk_create(
+        [TutorWallet(tutor_id=tutor_id) for tutor_id in {p.tutor_id for p in payments}],
+        ignore_conflicts=True,
+    )
+    entries = []
+    for payment in payments:
+        reference = f"payment:{payment.pk}"
+        entries += [
+            LedgerEntry(tutor_id=payment.tutor_id, entry_type=LedgerEntry.ENTRY_PAYMENT, reference=reference,
+                        account=LedgerEntry.ACCOUNT_EXTERNAL, amount=-payment.amount),
+            LedgerEntry(tutor_id=payment.tutor_id, entry_type=LedgerEntry.ENTRY_PAYMENT, reference=reference,
+                        account=LedgerEntry.ACCOUNT_AVAILABLE, amount=payment.amount),
+        ]
+    LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    dashboard_cache.invalidate({p.tutor_id for p in payments}, "wallet")
+    snapshot_when_due({p.tutor_id for p in payments})
+
+
+def record_refund(payment):
+    """Take a refunded payment back out of the tutor's available balance."""
+    record_refunds([payment])
+
+
+def record_refunds(payments):
+    entries = []
+    for payment in payments:
+        reference = f"payment:{payment.pk}"
+        entries += [
+            LedgerEntry(tutor_id=payment.tutor_id, entry_type=LedgerEntry.ENTRY_REFUND, reference=reference,
+                        account=LedgerEntry.ACCOUNT_AVAILABLE, amount=-payment.amount),
+            LedgerEntry(tutor_id=payment.tutor_id, entry_type=LedgerEntry.ENTRY_REFUND, reference=reference,
+                        account=LedgerEntry.ACCOUNT_EXTERNAL, amount=payment.amount),
+        ]
+    LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    dashboard_cache.invalidate({p.tutor_id for p in payments}, "wallet")
+    snapshot_when_due({p.tutor_id for p in payments})
+
+
+def record_withdrawal(tutor_id, withdrawal_id, amount):
+    """Move a requested withdrawal from available to pending."""
+    post(tutor_id, LedgerEntry.ENTRY_WITHDRAWAL, f"withdrawal:{withdrawal_id}", [
+        (LedgerEntry.ACCOUNT_AVAILABLE, -amount),
+        (LedgerEntry.ACCOUNT_PENDING, amount),
+    ])
+
+
+def latest_snapshot(tutor_id):
+    return WalletSnapshot.objects.filter(tutor_id=tutor_id).order_by("-last_entry_id").first()
+
+
+def _snapshot_balance(snapshot):
+    if snapshot is None:
+        return Balance()
+    return Balance(
+        total_earned=snapshot.total_earned,
+        available_balance=snapshot.available_balance,
+        pending_balance=snapshot.pending_balance,
+        total_withdrawn=snapshot.total_withdrawn,
+        last_entry_id=snapshot.last_entry_id,
+    )
+
+
+def get_balance(tutor_id):
+    """Current balance from the latest snapshot plus the delta after it. Read-only."""
+    base = _snapshot_balance(latest_snapshot(tutor_id))
+    row = LedgerEntry.objects.filter(tutor_id=tutor_id, id__gt=base.last_entry_id).aggregate(**BALANCE_AGGREGATES)
+    return base + _balance_from_row(row)
+
+
+def compute_balance(tutor_id, upto_id=None):
+    """Recompute a balance straight from the ledger, ignoring snapshots."""
+    entries = LedgerEntry.objects.filter(tutor_id=tutor_id)
+    if upto_id is not None:
+        entries = entries.filter(id__lte=upto_id)
+    return _balance_from_row(entries.aggregate(**BALANCE_AGGREGATES))
+
+
+def take_snapshot(tutor_id):
+    """
+    Store a snapshot of the settled part of the ledger and mirror the full
+    balance onto the `TutorWallet` row for admin and list views.
+    """
+    settled = timezone.now() - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+    upto_id = LedgerEntry.objects.filter(tutor_id=tutor_id, created_at__lt=settled).aggregate(m=Max("id"))["m"]
+    base = _snapshot_balance(latest_snapshot(tutor_id))
+    if upto_id and upto_id > base.last_entry_id:
+        delta = LedgerEntry.objects.filter(tutor_id=tutor_id, id__gt=base.last_entry_id, id__lte=upto_id)
+        settled_balance = base + _balance_from_row(delta.aggregate(**BALANCE_AGGREGATES))
+        WalletSnapshot.objects.create(
+            tutor_id=tutor_id,
+            last_entry_id=upto_id,
+            total_earned=settled_balance.total_earned,
+            available_balance=settled_balance.available_balance,
+            pending_balance=settled_balance.pending_balance,
+            total_withdrawn=settled_balance.total_withdrawn,
+        )
+    balance = get_balance(tutor_id)
+    TutorWallet.objects.filter(tutor_id=tutor_id).update(
+        total_earned=balance.total_earned,
+        available_balance=balance.available_balance,
+        pending_balance=balance.pending_balance,
+        total_withdrawn=balance.total_withdrawn,
+        updated_at=timezone.now(),
+    )
+    return balance
+
+
+def snapshot_when_due(tutor_ids):
+    """
+    After the current transaction commits, snapshot the wallets among
+    `tutor_ids` whose delta has grown past SNAPSHOT_EVERY entries. One
+    query for all of them; a failure is logged and left to `snapshot_wallets`.
+    """
+    tutor_ids = list(tutor_ids)
+
+    def snapshot():
+        since = WalletSnapshot.objects.filter(tutor_id=OuterRef("tutor_id")).order_by("-last_entry_id")
+        due = (
+            LedgerEntry.objects.filter(tutor_id__in=tutor_ids)
+            .filter(id__gt=Coalesce(Subquery(since.values("last_entry_id")[:1]), Value(0)))
+            .values("tutor_id").annotate(delta=Count("id")).filter(delta__gt=SNAPSHOT_EVERY)
+            .values_list("tutor_id", flat=True)
+        )
+        for tutor_id in due:
+            take_snapshot(tutor_id)
+
+    transaction.on_commit(snapshot, robust=True)
+
+
+def apply_balance(wallet):
+    """Fill a `TutorWallet` instance's balance fields from the ledger (no save)."""
+    balance = get_balance(wallet.tutor_id)
+    wallet.total_earned = balance.total_earned
+    wallet.available_balance = balance.available_balance
+    wallet.pending_balance = balance.pending_balance
+    wallet.total_withdrawn = balance.total_withdrawn
+    return wallet
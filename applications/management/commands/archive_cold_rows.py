@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from applications import archive
+
+
+class Command(BaseCommand):
+    help = "Move rejected applications and failed payments past their age limit into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--models", nargs="+", choices=sorted(archive.POLICIES), default=sorted(archive.POLICIES),
+                            help="What to archive")
+        parser.add_argument("--days", type=int, default=None,
+                            help="Archive rows older than this many days (default: ARCHIVE_*_AFTER_DAYS)")
+        parser.add_argument("--batch-size", type=int, default=archive.BATCH_SIZE, help="Rows moved per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would move")
+
+    def handle(self, *args, **options):
+        for name in options["models"]:
+            if options["dry_run"]:
+                count = archive.count_cold(name, days=options["days"])
+                self.stdout.write(f"{name}: {count} rows would be archived")
+                continue
+            moved = archive.archive(name, days=options["days"], batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{name}: archived {moved} rows"))
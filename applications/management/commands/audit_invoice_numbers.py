@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max
+
+from applications import invoice_numbers
+from applications.models import InvoiceSequence
+
+
+class Command(BaseCommand):
+    help = "Void reserved-but-unissued invoice numbers from released or abandoned blocks"
+
+    def handle(self, *args, **options):
+        voided = invoice_numbers.audit_blocks()
+        self.stdout.write(self.style.SUCCESS(f"Voided {voided} unused invoice numbers"))
+
+        sequences = InvoiceSequence.objects.annotate(
+            block_count=Count("blocks", distinct=True),
+            voided=Count("blocks__voided_numbers"),
+            last_reserved=Max("blocks__end"),
+        ).order_by("prefix", "year")
+        for sequence in sequences:
+            self.stdout.write(
+                f"{sequence.prefix}-{sequence.year}: reserved up to {sequence.last_reserved or 0} "
+                f"in {sequence.block_count} blocks, {sequence.voided} voided"
+            )
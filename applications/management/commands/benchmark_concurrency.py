@@ -0,0 +1,113 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from applications import gateway
+from applications.models import Enrollment
+from users.authentication import RoleTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) endpoints on a fixed pool of worker threads with the async (ASGI) "
+        "endpoints on one event loop, under a burst of concurrent requests against a slow gateway"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+        parser.add_argument("--wsgi-workers", type=int, default=4,
+                            help="Worker threads serving the sync path, like gunicorn --threads")
+        parser.add_argument("--gateway-latency", type=float, default=0.2,
+                            help="Seconds the stub gateway takes per session")
+        parser.add_argument("--endpoint", choices=["initiate", "tuitions", "payments"], default="initiate")
+        parser.add_argument("--email", help="Student to call as (defaults to the first student with an enrollment)")
+
+    def requests_for(self, endpoint, enrollment, async_path):
+        prefix = "/api/v1/async/" if async_path else "/api/v1/"
+        if endpoint == "initiate":
+            return "post", f"{prefix}payment/initiate/", {"amount": 100, "enrollment_id": enrollment.id}
+        return "get", f"{prefix}{endpoint}/", None
+
+    def run_wsgi(self, options, enrollment, headers):
+        method, path, data = self.requests_for(options["endpoint"], enrollment, async_path=False)
+
+        def call(_):
+            client = Client()
+            try:
+                if method == "post":
+                    response = client.post(path, data, content_type="application/json", headers=headers)
+                else:
+                    response = client.get(path, headers=headers)
+            finally:
+                connections.close_all()
+            return response.status_code, time.perf_counter()
+
+        # the worker pool is the server; requests beyond it queue for a free thread
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["wsgi_workers"]) as pool:
+            results = list(pool.map(call, range(options["requests"])))
+        return started, results
+
+    async def run_asgi(self, options, enrollment, headers):
+        method, path, data = self.requests_for(options["endpoint"], enrollment, async_path=True)
+        client = AsyncClient()
+        in_flight = asyncio.Semaphore(options["concurrency"])
+
+        async def call():
+            async with in_flight:
+                if method == "post":
+                    response = await client.post(path, data, content_type="application/json", headers=headers)
+                else:
+                    response = await client.get(path, headers=headers)
+                return response.status_code, time.perf_counter()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call() for _ in range(options["requests"])))
+        return started, results
+
+    def report(self, name, started, results):
+        # every request is issued at the start of the burst, so latency includes queueing for a worker
+        latencies = sorted(finished - started for _, finished in results)
+        elapsed = latencies[-1]
+        errors = sum(1 for status, _ in results if status >= 400)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f"{name:<5} {len(results)} requests in {elapsed:.2f}s = {len(results) / elapsed:,.1f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:,.0f}ms, p95 {p95 * 1000:,.0f}ms, {errors} errors"
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+        enrollments = Enrollment.objects.select_related("student").filter(student__is_active=True)
+        if options["email"]:
+            enrollments = enrollments.filter(student__email=options["email"])
+        enrollment = enrollments.order_by("id").first()
+        if enrollment is None:
+            raise CommandError("No active student with an enrollment to call as")
+        token = RoleTokenObtainPairSerializer.get_token(enrollment.student).access_token
+        headers = {"authorization": f"JWT {token}"}
+
+        with override_settings(
+            PAYMENT_GATEWAY="stub",
+            PAYMENT_GATEWAY_OPTIONS={"stub_latency": options["gateway_latency"]},
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        ):
+            gateway._gateway = gateway._async_gateway = None
+            try:
+                self.stdout.write(
+                    f"{options['endpoint']}: {options['requests']} requests, {options['wsgi_workers']} WSGI workers, "
+                    f"{options['concurrency']} concurrent ASGI requests, gateway latency {options['gateway_latency']}s"
+                )
+                self.report("WSGI", *self.run_wsgi(options, enrollment, headers))
+                self.report("ASGI", *asyncio.run(self.run_asgi(options, enrollment, headers)))
+            finally:
+                gateway._gateway = gateway._async_gateway = None
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from applications.invoice_numbers import InvoiceNumberAllocator
+from applications.models import InvoiceSequence, InvoiceNumberBlock, VoidedInvoiceNumber
+
+
+class Command(BaseCommand):
+    help = "Measure invoice number allocation throughput with many concurrent writers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=16)
+        parser.add_argument("--per-writer", type=int, default=200)
+        parser.add_argument("--block-sizes", default="1,20,100",
+                            help="Comma separated block sizes; 1 is the naive lock-per-number scheme")
+        parser.add_argument("--prefix", default="BENCH")
+
+    def run(self, writers, per_writer, block_size, prefix):
+        numbers = []
+        lock = threading.Lock()
+
+        def writer(index):
+            allocator = InvoiceNumberAllocator(prefix=prefix, block_size=block_size, owner=f"bench-{index}")
+            issued = [allocator.next_number() for _ in range(per_writer)]
+            allocator.release()
+            connections.close_all()
+            with lock:
+                numbers.extend(issued)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if len(set(numbers)) != len(numbers):
+            self.stdout.write(self.style.ERROR("Duplicate invoice numbers issued!"))
+        return len(numbers), elapsed
+
+    def cleanup(self, prefix):
+        VoidedInvoiceNumber.objects.filter(block__sequence__prefix=prefix).delete()
+        InvoiceNumberBlock.objects.filter(sequence__prefix=prefix).delete()
+        InvoiceSequence.objects.filter(prefix=prefix).delete()
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        self.cleanup(prefix)
+        try:
+            for block_size in [int(size) for size in options["block_sizes"].split(",")]:
+                count, elapsed = self.run(options["writers"], options["per_writer"], block_size, prefix)
+                self.stdout.write(
+                    f"block_size={block_size:<4} writers={options['writers']:<3} "
+                    f"{count} numbers in {elapsed:.2f}s = {count / elapsed:,.0f}/s"
+                )
+                self.cleanup(prefix)
+        finally:
+            self.cleanup(prefix)
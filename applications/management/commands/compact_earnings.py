@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from applications import analytics
+
+
+class Command(BaseCommand):
+    help = "Compact daily tutor earnings rollups older than N days into monthly rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=90)
+        parser.add_argument("--rebuild", action="store_true", help="Recompute all rollups from Payment first")
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            analytics.rebuild()
+            self.stdout.write("Rebuilt earnings rollups from payments")
+        before = timezone.localdate() - timedelta(days=options["older_than_days"])
+        compacted = analytics.compact(before)
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} daily rows before {before.replace(day=1)}"))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications import callbacks
+
+
+class Command(BaseCommand):
+    help = "Drain stored payment callbacks through the payment state machine"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when the queue is empty")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            handled = callbacks.process_pending(options["batch_size"])
+            total += handled
+            if handled:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} callbacks"))
+        self.stdout.write(str(callbacks.metrics.snapshot()))
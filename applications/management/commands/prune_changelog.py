@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from applications import changelog
+
+
+class Command(BaseCommand):
+    help = "Delete change log entries older than the retention window; clients with older cursors get 410 and reload"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=changelog.RETENTION_DAYS, help="Keep entries this many days")
+
+    def handle(self, *args, **options):
+        deleted = changelog.prune(days=options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} change log entries"))
@@ -0,0 +1,70 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from applications import reconciliation
+
+
+def parse_date(value):
+    try:
+        return timezone.make_aware(datetime.combine(datetime.strptime(value, "%Y-%m-%d").date(), time.min))
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Reconcile Payment rows against a gateway settlement report"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--report", required=True, help="Settlement report file (.csv or .json)")
+        parser.add_argument("--from", dest="start", required=True, help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="end", required=True, help="Last day (inclusive), YYYY-MM-DD")
+        parser.add_argument("--partition-days", type=int, default=7)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--output", help="Write mismatches to this CSV file")
+        parser.add_argument("--apply", action="store_true", help="Move mismatched payments to the settled status")
+
+    def handle(self, *args, **options):
+        start = parse_date(options["start"])
+        end = parse_date(options["end"]) + timedelta(days=1)
+        if end <= start:
+            raise CommandError("--to must not be before --from")
+
+        try:
+            report = reconciliation.load_report(options["report"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Loaded {len(report)} settled transactions")
+
+        scanned, mismatches = reconciliation.reconcile(
+            report, start, end,
+            partition_days=options["partition_days"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+        )
+
+        counts = {}
+        for mismatch in mismatches:
+            counts[mismatch.kind] = counts.get(mismatch.kind, 0) + 1
+            self.stdout.write(
+                f"{mismatch.kind}: {mismatch.transaction_id} local={mismatch.local_status}/{mismatch.local_amount} "
+                f"gateway={mismatch.gateway_status}/{mismatch.gateway_amount}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["kind", "transaction_id", "payment_id", "local_status", "gateway_status",
+                                 "local_amount", "gateway_amount"])
+                for m in mismatches:
+                    writer.writerow([m.kind, m.transaction_id, m.payment_id, m.local_status, m.gateway_status,
+                                     m.local_amount, m.gateway_amount])
+
+        self.stdout.write(f"Scanned {scanned} payments, {len(mismatches)} mismatches {counts}")
+
+        if options["apply"]:
+            applied = reconciliation.apply_corrections(mismatches)
+            self.stdout.write(self.style.SUCCESS(f"Corrected {applied}"))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications import invoices
+
+
+class Command(BaseCommand):
+    help = "Render queued invoice PDFs in a process pool (optionally backfilling historical payments first)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backfill", action="store_true", help="Create invoices for completed payments that have none")
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new invoices")
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        if options["backfill"]:
+            created = invoices.backfill()
+            self.stdout.write(f"Queued {created} historical invoices")
+
+        total = 0
+        while True:
+            total += invoices.render_pending(batch_size=options["batch_size"], workers=options["workers"])
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Rendered {total} invoices"))
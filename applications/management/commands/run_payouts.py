@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from applications import payouts
+
+
+class Command(BaseCommand):
+    help = "Pay out requested tutor withdrawals in chunks (resumes an unfinished batch)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--stub", action="store_true", help="Use the in-process stub provider instead of PAYOUT_PROVIDER")
+
+    def handle(self, *args, **options):
+        try:
+            provider = payouts.StubDisbursementProvider() if options["stub"] else payouts.get_provider()
+        except payouts.WithdrawalError as e:
+            raise CommandError(str(e))
+        batch = payouts.run_batch(provider, chunk_size=options["chunk_size"])
+        if batch is None:
+            self.stdout.write("Another run holds the running payout batch; nothing to do")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Batch {batch.pk}: {batch.paid_count} paid ({batch.paid_amount}), {batch.failed_count} failed"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from applications import ledger
+from applications.models import LedgerEntry
+
+
+class Command(BaseCommand):
+    help = "Snapshot every tutor wallet balance so reads only sum a short ledger delta"
+
+    def handle(self, *args, **options):
+        tutor_ids = LedgerEntry.objects.values_list("tutor_id", flat=True).distinct().order_by("tutor_id")
+        count = 0
+        for tutor_id in tutor_ids.iterator():
+            ledger.take_snapshot(tutor_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted {count} wallets"))
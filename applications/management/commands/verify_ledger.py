@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Sum
+
+from applications import ledger
+from applications.models import LedgerEntry
+
+
+def verify_chunk(tutor_ids):
+    """Recompute each tutor's balance from the ledger and compare with snapshot + delta."""
+    problems = []
+    try:
+        for tutor_id in tutor_ids:
+            actual = ledger.get_balance(tutor_id)
+            expected = ledger.compute_balance(tutor_id, upto_id=actual.last_entry_id)
+            for field in ("total_earned", "available_balance", "pending_balance", "total_withdrawn"):
+                if getattr(expected, field) != getattr(actual, field):
+                    problems.append(
+                        f"tutor {tutor_id}: {field} is {getattr(actual, field)}, ledger says {getattr(expected, field)}"
+                    )
+        unbalanced = (
+            LedgerEntry.objects.filter(tutor_id__in=tutor_ids)
+            .values("entry_type", "reference")
+            .annotate(total=Sum("amount"))
+            .exclude(total=0)
+        )
+        for row in unbalanced:
+            problems.append(f"posting {row['entry_type']} {row['reference']} does not balance ({row['total']})")
+    finally:
+        connections.close_all()
+    return problems
+
+
+class Command(BaseCommand):
+    help = "Recompute wallet balances from the ledger in parallel chunks and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        tutor_ids = list(LedgerEntry.objects.values_list("tutor_id", flat=True).distinct().order_by("tutor_id"))
+        chunks = [tutor_ids[i:i + chunk_size] for i in range(0, len(tutor_ids), chunk_size)]
+
+        problems = []
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for chunk_problems in pool.map(verify_chunk, chunks):
+                problems.extend(chunk_problems)
+
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(problem))
+        if problems:
+            self.stdout.write(self.style.ERROR(f"{len(problems)} problems across {len(tutor_ids)} wallets"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Verified {len(tutor_ids)} wallets, no drift"))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0007_alter_enrollment_payment_verified'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('PAYMENT', 'Payment'), ('REFUND', 'Refund'), ('WITHDRAWAL', 'Withdrawal')], max_length=20)),
+                ('reference', models.CharField(max_length=64)),
+                ('account', models.CharField(choices=[('AVAILABLE', 'Available'), ('PENDING', 'Pending'), ('WITHDRAWN', 'Withdrawn'), ('EXTERNAL', 'External')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tutor', 'id'], name='application_tutor_i_bcb582_idx')],
+                'constraints': [models.UniqueConstraint(fields=('entry_type', 'reference', 'account'), name='unique_ledger_leg')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('total_earned', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('available_balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('pending_balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('total_withdrawn', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wallet_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tutor', '-last_entry_id'], name='application_tutor_i_da8a6c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0008_ledgerentry_walletsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SUCCESS', 'Success'), ('FAIL', 'Fail'), ('CANCEL', 'Cancel')], max_length=10)),
+                ('tran_id', models.CharField(db_index=True, max_length=255)),
+                ('dedupe_key', models.CharField(max_length=300, unique=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('RECEIVED', 'Received'), ('PROCESSED', 'Processed'), ('IGNORED', 'Ignored'), ('ERROR', 'Error')], default='RECEIVED', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='application_status_dcb854_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0009_paymentcallback'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10)),
+                ('year', models.PositiveIntegerField()),
+                ('next_value', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'unique_together': {('prefix', 'year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceNumberBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.PositiveIntegerField()),
+                ('end', models.PositiveIntegerField()),
+                ('owner', models.CharField(max_length=100)),
+                ('last_issued', models.PositiveIntegerField(blank=True, null=True)),
+                ('reserved_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('audited', models.BooleanField(default=False)),
+                ('sequence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='applications.invoicesequence')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoidedInvoiceNumber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_number', models.CharField(max_length=50, unique=True)),
+                ('reason', models.CharField(max_length=255)),
+                ('voided_at', models.DateTimeField(auto_now_add=True)),
+                ('block', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='voided_numbers', to='applications.invoicenumberblock')),
+            ],
+        ),
+    ]
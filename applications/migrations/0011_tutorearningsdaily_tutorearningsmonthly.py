@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0010_invoicesequence_invoicenumberblock_and_more'),
+        ('tuition', '0002_tuition_is_paid_tuition_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TutorEarningsDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('payments_count', models.IntegerField(default=0)),
+                ('tuition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to='tuition.tuition')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tutor', 'day'], name='application_tutor_i_ff15bf_idx')],
+                'unique_together': {('tutor', 'tuition', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TutorEarningsMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('payments_count', models.IntegerField(default=0)),
+                ('tuition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_earnings', to='tuition.tuition')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_earnings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tutor', 'month'], name='application_tutor_i_b19e2b_idx')],
+                'unique_together': {('tutor', 'tuition', 'month')},
+            },
+        ),
+    ]
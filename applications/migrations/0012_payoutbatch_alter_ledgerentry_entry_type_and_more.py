@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0011_tutorearningsdaily_tutorearningsmonthly'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed')], default='RUNNING', max_length=10)),
+                ('last_request_id', models.BigIntegerField(default=0)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='entry_type',
+            field=models.CharField(choices=[('PAYMENT', 'Payment'), ('REFUND', 'Refund'), ('WITHDRAWAL', 'Withdrawal'), ('PAYOUT', 'Payout'), ('PAYOUT_REVERSAL', 'Payout reversal')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='WithdrawalRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('REQUESTED', 'Requested'), ('PROCESSING', 'Processing'), ('PAID', 'Paid'), ('FAILED', 'Failed')], default='REQUESTED', max_length=10)),
+                ('provider_reference', models.CharField(blank=True, max_length=255)),
+                ('failure_reason', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='applications.payoutbatch')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='withdrawal_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-requested_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='application_status_fa67b9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0014_archivedapplication_archivedpayment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payoutbatch',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='withdrawalrequest',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,60 @@
-from django.db import models
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.dispatch import Signal
 from tuition.models import Tuition
+
+# Sent with `entries` once the transaction that logged them commits; applications/signals.py
+# pushes them to the event stream and invalidates the dashboard cache.
+changes_committed = Signal()
 # Create your models here.
 
-class Application(models.Model):
+class ChangeLogged(models.Model):
+    """
+    Writes a ChangeLogEntry for every save that changes a field, in the same
+    transaction, for the users named by `changelog_audience` (lookups from
+    this model to user ids). Saving a loaded row unchanged writes no entry.
+    Deletes are logged by a pre_delete handler in applications/signals.py,
+    connected for each subclass in ApplicationsConfig.ready.
+    """
+    changelog_audience = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changes(self, update_fields=None):
+        """Whether saving would change a column of the row as it was loaded (deferred fields count when set)."""
+        loaded = getattr(self, "_loaded_values", None)
+        if self._state.adding or loaded is None:
+            return True
+        for field in self._meta.concrete_fields:
+            if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+                continue
+            if field.attname not in self.__dict__:
+                continue  # deferred and never touched
+            if field.attname not in loaded or self.__dict__[field.attname] != loaded[field.attname]:
+                return True
+        return False
+
+    def save(self, *args, **kwargs):
+        if not self.has_changes(kwargs.get("update_fields")):
+            super().save(*args, **kwargs)
+            return
+        op = ChangeLogEntry.OP_INSERT if self._state.adding else ChangeLogEntry.OP_UPDATE
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ChangeLogEntry.record(type(self), [self.pk], op)
+        self._loaded_values = {field.attname: self.__dict__[field.attname] for field in self._meta.concrete_fields
+                               if field.attname in self.__dict__}
+
+
+class Application(ChangeLogged):
     STATUS_PENDING = "PENDING"
     STATUS_ACCEPTED = "ACCEPTED"
     STATUS_REJECTED = "REJECTED"
@@ -27,6 +77,8 @@ class Application(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
     applied_at = models.DateTimeField(auto_now_add=True)
 
+    changelog_audience = ("applicant_id", "tuition__tutor_id")
+
     class Meta:
         unique_together = ("tuition", "applicant")  
 
@@ -34,7 +86,7 @@ class Application(models.Model):
         return f"{self.applicant.email} : {self.tuition.title} ({self.status})"
 
 
-class Enrollment(models.Model):
+class Enrollment(ChangeLogged):
     
     tuition = models.ForeignKey(
         Tuition, 
@@ -49,6 +101,8 @@ class Enrollment(models.Model):
     payment_verified = models.BooleanField(default=False)
     enrolled_at = models.DateTimeField(auto_now_add=True)
 
+    changelog_audience = ("student_id", "tuition__tutor_id")
+
     class Meta:
         unique_together = ("tuition", "student")
     
@@ -56,7 +110,7 @@ class Enrollment(models.Model):
         return f"{self.student.email} enrolled in {self.tuition.title}"
 
 
-class Topic(models.Model):
+class Topic(ChangeLogged):
     enrollment = models.ForeignKey(
         Enrollment, 
         on_delete=models.CASCADE, 
@@ -66,11 +120,13 @@ class Topic(models.Model):
     description = models.TextField(blank=True)
     completed = models.BooleanField(default=False)
 
+    changelog_audience = ("enrollment__student_id", "enrollment__tuition__tutor_id")
+
     def __str__(self):
         return f"{self.title} ({'Completed' if self.completed else 'Pending'})"
 
 
-class Assignment(models.Model):
+class Assignment(ChangeLogged):
     enrollment = models.ForeignKey(
         Enrollment, 
         on_delete=models.CASCADE,
@@ -80,6 +136,8 @@ class Assignment(models.Model):
     description = models.TextField(blank=True)
     due_date = models.DateField(null=True, blank=True)
 
+    changelog_audience = ("enrollment__student_id", "enrollment__tuition__tutor_id")
+
     def __str__(self):
         return self.title
     
@@ -95,7 +153,7 @@ class Review(models.Model):
         on_delete=models.CASCADE, 
         related_name="reviews"
     )
-    rating = models.IntegerField()
+    rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
@@ -105,7 +163,7 @@ class Review(models.Model):
         return f"{self.student.email}: {self.tuition.title} ({self.rating};{self.comment})"
 
 
-class Payment(models.Model):
+class Payment(ChangeLogged):
     PAYMENT_STATUS_PENDING = "PENDING"
     PAYMENT_STATUS_COMPLETED = "COMPLETED"
     PAYMENT_STATUS_FAILED = "FAILED"
@@ -144,6 +202,8 @@ class Payment(models.Model):
     payment_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    changelog_audience = ("student_id", "tutor_id")
     
     class Meta:
         ordering = ['-created_at']
@@ -180,4 +240,389 @@ class Invoice(models.Model):
     pdf_url = models.URLField(blank=True, null=True)
     
     def __str__(self):
-        return f"Invoice: {self.invoice_number}"
\ No newline at end of file
+        return f"Invoice: {self.invoice_number}"
+
+class LedgerEntry(models.Model):
+    """
+    One leg of a double-entry posting. Rows are only ever inserted; every
+    posting (entry_type + reference) has legs that sum to zero.
+    """
+    ACCOUNT_AVAILABLE = "AVAILABLE"
+    ACCOUNT_PENDING = "PENDING"
+    ACCOUNT_WITHDRAWN = "WITHDRAWN"
+    ACCOUNT_EXTERNAL = "EXTERNAL"
+    ACCOUNT_CHOICES = [
+        (ACCOUNT_AVAILABLE, "Available"),
+        (ACCOUNT_PENDING, "Pending"),
+        (ACCOUNT_WITHDRAWN, "Withdrawn"),
+        (ACCOUNT_EXTERNAL, "External"),
+    ]
+
+    ENTRY_PAYMENT = "PAYMENT"
+    ENTRY_REFUND = "REFUND"
+    ENTRY_WITHDRAWAL = "WITHDRAWAL"
+    ENTRY_PAYOUT = "PAYOUT"
+    ENTRY_PAYOUT_REVERSAL = "PAYOUT_REVERSAL"
+    ENTRY_TYPE_CHOICES = [
+        (ENTRY_PAYMENT, "Payment"),
+        (ENTRY_REFUND, "Refund"),
+        (ENTRY_WITHDRAWAL, "Withdrawal"),
+        (ENTRY_PAYOUT, "Payout"),
+        (ENTRY_PAYOUT_REVERSAL, "Payout reversal"),
+    ]
+
+    tutor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="ledger_entries"
+    )
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    reference = models.CharField(max_length=64)
+    account = models.CharField(max_length=20, choices=ACCOUNT_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["entry_type", "reference", "account"], name="unique_ledger_leg"),
+        ]
+        indexes = [
+            models.Index(fields=["tutor", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.reference} {self.account} {self.amount}"
+
+
+class WalletSnapshot(models.Model):
+    """Balances of a tutor's wallet covering every ledger entry up to `last_entry_id`."""
+    tutor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="wallet_snapshots"
+    )
+    last_entry_id = models.BigIntegerField()
+    total_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    available_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    pending_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_withdrawn = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tutor", "-last_entry_id"]),
+        ]
+
+    def __str__(self):
+        return f"Snapshot: {self.tutor_id} @ {self.last_entry_id}"
+
+
+class PaymentCallback(models.Model):
+    """A gateway redirect/IPN stored as soon as it arrives, processed by a worker."""
+    KIND_SUCCESS = "SUCCESS"
+    KIND_FAIL = "FAIL"
+    KIND_CANCEL = "CANCEL"
+    KIND_CHOICES = [
+        (KIND_SUCCESS, "Success"),
+        (KIND_FAIL, "Fail"),
+        (KIND_CANCEL, "Cancel"),
+    ]
+
+    STATUS_RECEIVED = "RECEIVED"
+    STATUS_PROCESSED = "PROCESSED"
+    STATUS_IGNORED = "IGNORED"
+    STATUS_ERROR = "ERROR"
+    STATUS_CHOICES = [
+        (STATUS_RECEIVED, "Received"),
+        (STATUS_PROCESSED, "Processed"),
+        (STATUS_IGNORED, "Ignored"),
+        (STATUS_ERROR, "Error"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    tran_id = models.CharField(max_length=255, db_index=True)
+    dedupe_key = models.CharField(max_length=300, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RECEIVED)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Callback: {self.kind} {self.tran_id} ({self.status})"
+
+
+class InvoiceSequence(models.Model):
+    """Next unreserved invoice number for a prefix and year."""
+    prefix = models.CharField(max_length=10)
+    year = models.PositiveIntegerField()
+    next_value = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ("prefix", "year")
+
+    def __str__(self):
+        return f"{self.prefix}-{self.year} (next {self.next_value})"
+
+
+class InvoiceNumberBlock(models.Model):
+    """A contiguous range of invoice numbers reserved by one worker process."""
+    sequence = models.ForeignKey(
+        InvoiceSequence,
+        on_delete=models.CASCADE,
+        related_name="blocks"
+    )
+    start = models.PositiveIntegerField()
+    end = models.PositiveIntegerField()
+    owner = models.CharField(max_length=100)
+    last_issued = models.PositiveIntegerField(null=True, blank=True)
+    reserved_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+    audited = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.sequence.prefix}-{self.sequence.year} [{self.start}-{self.end}] {self.owner}"
+
+
+class VoidedInvoiceNumber(models.Model):
+    """An invoice number that was reserved but never issued, kept for the audit trail."""
+    invoice_number = models.CharField(max_length=50, unique=True)
+    block = models.ForeignKey(
+        InvoiceNumberBlock,
+        on_delete=models.PROTECT,
+        related_name="voided_numbers"
+    )
+    reason = models.CharField(max_length=255)
+    voided_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Void: {self.invoice_number}"
+
+
+class TutorEarningsDaily(models.Model):
+    """Per-tutor, per-tuition earnings for one day, maintained as payments complete."""
+    tutor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="daily_earnings"
+    )
+    tuition = models.ForeignKey(
+        Tuition,
+        on_delete=models.CASCADE,
+        related_name="daily_earnings"
+    )
+    day = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    payments_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("tutor", "tuition", "day")
+        indexes = [
+            models.Index(fields=["tutor", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.tutor_id} {self.tuition_id} {self.day}: {self.amount}"
+
+
+class TutorEarningsMonthly(models.Model):
+    """Daily earnings rows compacted into one row per month (`month` is the first day)."""
+    tutor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="monthly_earnings"
+    )
+    tuition = models.ForeignKey(
+        Tuition,
+        on_delete=models.CASCADE,
+        related_name="monthly_earnings"
+    )
+    month = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    payments_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("tutor", "tuition", "month")
+        indexes = [
+            models.Index(fields=["tutor", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.tutor_id} {self.tuition_id} {self.month:%Y-%m}: {self.amount}"
+
+
+
+class PayoutBatch(models.Model):
+    """One run of the payout job; `last_request_id` is its resume cursor."""
+    STATUS_RUNNING = "RUNNING"
+    STATUS_COMPLETED = "COMPLETED"
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    last_request_id = models.BigIntegerField(default=0)
+    paid_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # held by the run working on the batch; see applications/payouts.py
+    lease_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Payout batch {self.pk} ({self.status})"
+
+
+class WithdrawalRequest(models.Model):
+    STATUS_REQUESTED = "REQUESTED"
+    STATUS_PROCESSING = "PROCESSING"
+    STATUS_PAID = "PAID"
+    STATUS_FAILED = "FAILED"
+    STATUS_CHOICES = [
+        (STATUS_REQUESTED, "Requested"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_PAID, "Paid"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    tutor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="withdrawal_requests"
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_REQUESTED)
+    batch = models.ForeignKey(
+        PayoutBatch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="requests"
+    )
+    provider_reference = models.CharField(max_length=255, blank=True)
+    failure_reason = models.TextField(blank=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-requested_at']
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Withdrawal: {self.tutor_id} {self.amount} ({self.status})"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Outbox row: object `object_id` of `model` changed in a way `user` can see.
+    The id is the cursor of the `/changes/` feed; see applications/changelog.py.
+    """
+    OP_INSERT = "I"
+    OP_UPDATE = "U"
+    OP_DELETE = "D"
+    OP_CHOICES = [
+        (OP_INSERT, "Insert"),
+        (OP_UPDATE, "Update"),
+        (OP_DELETE, "Delete"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="change_log"
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=1, choices=OP_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.op} {self.model} {self.object_id} for {self.user_id}"
+
+    @classmethod
+    def record(cls, model, pks, op, exclude_users=()):
+        """Log `op` on these rows of a ChangeLogged model for everyone in their audience but `exclude_users`."""
+        rows = model._base_manager.filter(pk__in=pks).values_list("pk", *model.changelog_audience)
+        entries = cls.objects.bulk_create([
+            cls(user_id=user_id, model=model._meta.model_name, object_id=pk, op=op)
+            for pk, *audience in rows
+            for user_id in set(audience) if user_id is not None and user_id not in exclude_users
+        ])
+        if entries:
+            transaction.on_commit(lambda: changes_committed.send(sender=cls, entries=entries))
+
+    def as_event(self):
+        return {"type": self.model, "op": self.get_op_display().lower(), "id": self.object_id, "cursor": self.id}
+
+
+class ArchivedApplication(models.Model):
+    """A cold Application moved out of the live table by `archive_cold_rows`; same id and columns."""
+    id = models.BigIntegerField(primary_key=True)
+    tuition = models.ForeignKey(
+        Tuition,
+        on_delete=models.CASCADE,
+        related_name="archived_applications"
+    )
+    applicant = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_applications"
+    )
+    status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    applied_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived application {self.pk} ({self.status})"
+
+
+class ArchivedPayment(models.Model):
+    """A cold Payment moved out of the live table by `archive_cold_rows`; same id and columns."""
+    id = models.BigIntegerField(primary_key=True)
+    enrollment = models.ForeignKey(
+        Enrollment,
+        on_delete=models.CASCADE,
+        related_name="archived_payments"
+    )
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_student_payments"
+    )
+    tutor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_tutor_payments"
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Payment.PAYMENT_STATUS_CHOICES)
+    # not unique: a retried enrollment reuses its transaction id
+    transaction_id = models.CharField(max_length=255, db_index=True)
+    payment_gateway = models.CharField(max_length=50, blank=True, null=True)
+    payment_date = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Archived payment {self.pk} ({self.status})"
@@ -0,0 +1,107 @@
+"""
+Explicit payment state machine.
+
+Every status change goes through `transition`, which locks the payment row,
+checks the move is allowed and runs the side effects of entering the new
+state in the same transaction. Moving to the state a payment is already in
+is a no-op, which is what makes duplicate gateway callbacks harmless.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics, invoices, ledger
+from .models import ChangeLogEntry, Enrollment, Payment
+
+logger = logging.getLogger(__name__)
+
+PENDING = Payment.PAYMENT_STATUS_PENDING
+COMPLETED = Payment.PAYMENT_STATUS_COMPLETED
+FAILED = Payment.PAYMENT_STATUS_FAILED
+REFUNDED = Payment.PAYMENT_STATUS_REFUNDED
+
+TRANSITIONS = {
+    PENDING: {COMPLETED, FAILED},
+    # a failed or cancelled attempt can still be paid when the student retries
+    FAILED: {COMPLETED},
+    COMPLETED: {REFUNDED},
+    REFUNDED: set(),
+}
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def transition(target, payment_id=None, transaction_id=None):
+    """
+    Move a payment to `target`. Returns (payment, changed).
+    Raises `Payment.DoesNotExist` or `InvalidTransition`.
+    """
+    lookup = {"pk": payment_id} if payment_id is not None else {"transaction_id": transaction_id}
+    with transaction.atomic():
+        payment = Payment.objects.select_for_update().get(**lookup)
+        if payment.status == target:
+            return payment, False
+        if target not in TRANSITIONS[payment.status]:
+            raise InvalidTransition(f"Payment {payment.pk} cannot go from {payment.status} to {target}")
+
+        previous = payment.status
+        payment.status = target
+        update_fields = ["status", "updated_at"]
+        if target == COMPLETED:
+            payment.payment_date = timezone.now()
+            update_fields.append("payment_date")
+        payment.save(update_fields=update_fields)
+
+        on_enter(target, [payment])
+        logger.info(f"Payment {payment.pk} moved {previous} -> {target}")
+    return payment, True
+
+
+def bulk_transition(payment_ids, target):
+    """
+    Move many payments to `target` with one locking read and one UPDATE.
+    Payments already in `target` or not allowed to move there are skipped.
+    Returns the list of payments that changed.
+    """
+    sources = [state for state, targets in TRANSITIONS.items() if target in targets]
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.select_for_update()
+            .filter(pk__in=payment_ids, status__in=sources)
+            .order_by("pk")
+        )
+        if not payments:
+            return []
+        now = timezone.now()
+        updates = {"status": target, "updated_at": now}
+        if target == COMPLETED:
+            updates["payment_date"] = now
+        Payment.objects.filter(pk__in=[p.pk for p in payments]).update(**updates)
+        ChangeLogEntry.record(Payment, [p.pk for p in payments], ChangeLogEntry.OP_UPDATE)
+        for payment in payments:
+            for field, value in updates.items():
+                setattr(payment, field, value)
+        on_enter(target, payments)
+    logger.info(f"{len(payments)} payments moved to {target}")
+    return payments
+
+
+def on_enter(target, payments):
+    """Side effects of payments entering `target`, run inside the transition's transaction."""
+    enrollment_ids = [p.enrollment_id for p in payments]
+    if target == COMPLETED:
+        ledger.record_payments(payments)
+        analytics.record(payments)
+        Enrollment.objects.filter(pk__in=enrollment_ids).update(payment_verified=True)
+        ChangeLogEntry.record(Enrollment, enrollment_ids, ChangeLogEntry.OP_UPDATE)
+        # numbering reserves blocks in its own transaction; a crash before this
+        # runs is picked up by `render_invoices --backfill`
+        transaction.on_commit(lambda: invoices.enqueue(payments), robust=True)
+    elif target == REFUNDED:
+        ledger.record_refunds(payments)
+        analytics.record(payments, refund=True)
+        Enrollment.objects.filter(pk__in=enrollment_ids).update(payment_verified=False)
+        ChangeLogEntry.record(Enrollment, enrollment_ids, ChangeLogEntry.OP_UPDATE)
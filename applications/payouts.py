@@ -0,0 +1,281 @@
+"""
+Tutor withdrawals and the batched payout job.
+
+Requesting a withdrawal moves the amount from available to pending in the
+ledger. `run_batch` then claims requested withdrawals in id order, chunk by
+chunk, sends each chunk to the disbursement provider and settles the ledger:
+paid amounts move pending -> withdrawn, failed ones go back to available.
+Memory is bounded by the chunk size.
+
+Runs may overlap (a cron tick while the last run is still going). The
+batch and each chunk are claimed with SKIP LOCKED and leased for
+PAYOUT_LEASE_SECONDS, like the email outbox: a run skips a batch whose
+lease is live, and renews the lease before every chunk. A crashed run
+leaves its batch RUNNING and its chunk in PROCESSING; once the leases run
+out the next run resumes the batch and re-sends the chunk with the same
+references, which providers must treat idempotently. Settling locks the
+chunk's rows and skips any already settled, so the batch counters are
+never incremented twice.
+"""
+import logging
+import random
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import dashboard_cache, ledger
+from .models import LedgerEntry, PayoutBatch, TutorWallet, WithdrawalRequest
+
+logger = logging.getLogger(__name__)
+
+# longer than the provider takes for one chunk, or another run re-sends it
+LEASE_SECONDS = getattr(settings, "PAYOUT_LEASE_SECONDS", 600)
+
+
+class WithdrawalError(Exception):
+    pass
+
+
+@dataclass
+class PayoutItem:
+    reference: str
+    tutor_id: int
+    amount: Decimal
+
+
+@dataclass
+class PayoutResult:
+    reference: str
+    success: bool
+    provider_reference: str = ""
+    error: str = ""
+
+
+class DisbursementProvider:
+    """Sends money to tutors. `disburse` must be idempotent per item reference."""
+
+    def disburse(self, items):
+        raise NotImplementedError
+
+
+class StubDisbursementProvider(DisbursementProvider):
+    """In-process provider for tests and local runs; remembers every reference it paid."""
+
+    def __init__(self, failure_rate=0.0):
+        self.failure_rate = failure_rate
+        self.sent = {}
+        self._lock = threading.Lock()
+
+    def disburse(self, items):
+        results = []
+        with self._lock:
+            for item in items:
+                if item.reference not in self.sent:
+                    if self.failure_rate and random.random() < self.failure_rate:
+                        results.append(PayoutResult(item.reference, False, error="Stub provider declined"))
+                        continue
+                    self.sent[item.reference] = PayoutResult(item.reference, True, f"stub-{uuid.uuid4().hex[:12]}")
+                results.append(self.sent[item.reference])
+        return results
+
+
+def get_provider():
+    path = getattr(settings, "PAYOUT_PROVIDER", "")
+    if not path:
+        raise WithdrawalError("PAYOUT_PROVIDER is not configured")
+    return import_string(path)()
+
+
+def request_withdrawal(tutor, amount):
+    """Reserve `amount` of the tutor's available balance for the next payout run."""
+    minimum = Decimal(str(getattr(settings, "PAYOUT_MIN_AMOUNT", "100.00")))
+    if amount < minimum:
+        raise WithdrawalError(f"Minimum withdrawal is {minimum}.")
+    with transaction.atomic():
+        try:
+            TutorWallet.objects.select_for_update().get(tutor=tutor)
+        except TutorWallet.DoesNotExist:
+            raise WithdrawalError("Wallet not found.")
+        available = ledger.get_balance(tutor.id).available_balance
+        if amount > available:
+            raise WithdrawalError(f"Amount exceeds available balance ({available}).")
+        withdrawal = WithdrawalRequest.objects.create(tutor=tutor, amount=amount)
+        ledger.record_withdrawal(tutor.id, withdrawal.id, amount)
+    logger.info(f"Withdrawal {withdrawal.id} of {amount} requested by tutor {tutor.id}")
+    return withdrawal
+
+
+def _lease():
+    return timezone.now() + timedelta(seconds=LEASE_SECONDS)
+
+
+def _expired():
+    return Q(lease_until__isnull=True) | Q(lease_until__lt=timezone.now())
+
+
+def _claim_batch():
+    """
+    Lease the oldest RUNNING batch no other run holds, or start a new one.
+    Returns None when every running batch is leased by another run.
+    """
+    with transaction.atomic():
+        batch = (
+            PayoutBatch.objects.select_for_update(skip_locked=True)
+            .filter(_expired(), status=PayoutBatch.STATUS_RUNNING)
+            .order_by("id").first()
+        )
+        if batch is not None:
+            logger.info(f"Resuming payout batch {batch.pk}")
+        elif PayoutBatch.objects.filter(status=PayoutBatch.STATUS_RUNNING).exists():
+            return None
+        else:
+            batch = PayoutBatch.objects.create()
+        batch.lease_until = _lease()
+        batch.save(update_fields=["lease_until"])
+    return batch
+
+
+def _claim(batch, rows, chunk_size, updates=None):
+    """Lease up to `chunk_size` of `rows` for this batch and renew the batch's lease; returns their ids."""
+    with transaction.atomic():
+        ids = list(
+            rows.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        lease = _lease()
+        if ids:
+            WithdrawalRequest.objects.filter(id__in=ids).update(lease_until=lease, **(updates or {}))
+        PayoutBatch.objects.filter(pk=batch.pk).update(lease_until=lease)
+    return ids
+
+
+def _claim_stuck(batch, chunk_size):
+    """Chunks of this batch claimed by a run that stopped before settling them."""
+    rows = WithdrawalRequest.objects.filter(_expired(), batch=batch, status=WithdrawalRequest.STATUS_PROCESSING)
+    return _claim(batch, rows, chunk_size)
+
+
+def _claim_chunk(batch, chunk_size):
+    rows = WithdrawalRequest.objects.filter(status=WithdrawalRequest.STATUS_REQUESTED)
+    ids = _claim(batch, rows, chunk_size, {"status": WithdrawalRequest.STATUS_PROCESSING, "batch": batch})
+    if ids:
+        PayoutBatch.objects.filter(pk=batch.pk).update(last_request_id=ids[-1])
+    return ids
+
+
+def _settle(batch, withdrawals, results):
+    by_reference = {result.reference: result for result in results}
+    now = timezone.now()
+
+    with transaction.atomic():
+        # a run whose lease ran out may have settled some of these already
+        pending = set(
+            WithdrawalRequest.objects.select_for_update()
+            .filter(id__in=[w.id for w in withdrawals], status=WithdrawalRequest.STATUS_PROCESSING)
+            .order_by("id").values_list("id", flat=True)
+        )
+        withdrawals = [w for w in withdrawals if w.id in pending]
+        if not withdrawals:
+            return
+
+        entries = []
+        paid = failed = 0
+        paid_amount = Decimal("0.00")
+        for withdrawal in withdrawals:
+            reference = f"withdrawal:{withdrawal.id}"
+            result = by_reference.get(reference) or PayoutResult(reference, False, error="No result from provider")
+            if result.success:
+                withdrawal.status = WithdrawalRequest.STATUS_PAID
+                withdrawal.provider_reference = result.provider_reference
+                entry_type, legs = LedgerEntry.ENTRY_PAYOUT, [
+                    (LedgerEntry.ACCOUNT_PENDING, -withdrawal.amount),
+                    (LedgerEntry.ACCOUNT_WITHDRAWN, withdrawal.amount),
+                ]
+                paid += 1
+                paid_amount += withdrawal.amount
+            else:
+                withdrawal.status = WithdrawalRequest.STATUS_FAILED
+                withdrawal.failure_reason = result.error
+                entry_type, legs = LedgerEntry.ENTRY_PAYOUT_REVERSAL, [
+                    (LedgerEntry.ACCOUNT_PENDING, -withdrawal.amount),
+                    (LedgerEntry.ACCOUNT_AVAILABLE, withdrawal.amount),
+                ]
+                failed += 1
+            withdrawal.processed_at = now
+            entries += [
+                LedgerEntry(tutor_id=withdrawal.tutor_id, entry_type=entry_type, reference=reference,
+                            account=account, amount=amount)
+                for account, amount in legs
+            ]
+
+        # lock wallets in tutor id order so concurrent runs and withdrawal
+        # requests always acquire them in the same order
+        tutor_ids = sorted({w.tutor_id for w in withdrawals})
+        list(TutorWallet.objects.select_for_update().filter(tutor_id__in=tutor_ids).order_by("tutor_id")
+             .values_list("id", flat=True))
+        LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        dashboard_cache.invalidate(tutor_ids, "wallet")
+        ledger.snapshot_when_due(tutor_ids)
+        WithdrawalRequest.objects.bulk_update(
+            withdrawals, ["status", "provider_reference", "failure_reason", "processed_at"]
+        )
+        PayoutBatch.objects.filter(pk=batch.pk).update(
+            paid_count=F("paid_count") + paid,
+            failed_count=F("failed_count") + failed,
+            paid_amount=F("paid_amount") + paid_amount,
+        )
+
+
+def _send(batch, ids, provider):
+    withdrawals = list(WithdrawalRequest.objects.filter(id__in=ids, status=WithdrawalRequest.STATUS_PROCESSING))
+    if not withdrawals:
+        return 0
+    items = [PayoutItem(f"withdrawal:{w.id}", w.tutor_id, w.amount) for w in withdrawals]
+    try:
+        results = provider.disburse(items)
+    except Exception as e:
+        # leave the chunk in PROCESSING; the next run re-sends it
+        logger.error(f"Payout batch {batch.pk}: provider failed for {len(items)} items: {e}")
+        raise
+    _settle(batch, withdrawals, results)
+    return len(withdrawals)
+
+
+def run_batch(provider=None, chunk_size=500):
+    """
+    Run (or resume) a payout batch. Returns the finished `PayoutBatch`, or
+    None when another run holds the running batch.
+    """
+    provider = provider or get_provider()
+    batch = _claim_batch()
+    if batch is None:
+        logger.info("Payout batch already being run elsewhere")
+        return None
+
+    while True:
+        ids = _claim_stuck(batch, chunk_size)
+        if not ids:
+            break
+        _send(batch, ids, provider)
+
+    while True:
+        ids = _claim_chunk(batch, chunk_size)
+        if not ids:
+            break
+        _send(batch, ids, provider)
+
+    PayoutBatch.objects.filter(pk=batch.pk).update(
+        status=PayoutBatch.STATUS_COMPLETED, completed_at=timezone.now(), lease_until=None
+    )
+    batch.refresh_from_db()
+    logger.info(f"Payout batch {batch.pk} done: {batch.paid_count} paid, {batch.failed_count} failed")
+    return batch
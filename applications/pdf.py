@@ -0,0 +1,58 @@
+"""
+Minimal single-page PDF writer for invoices.
+
+Kept free of Django imports so it can run in a process pool, and free of
+timestamps so the same invoice always renders to the same bytes.
+"""
+
+
+def _escape(text):
+    text = str(text).encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def render_invoice_pdf(context):
+    """Render an invoice context dict to PDF bytes."""
+    lines = [
+        (20, "Tuition Hub - Invoice"),
+        (11, ""),
+        (11, f"Invoice number: {context['invoice_number']}"),
+        (11, f"Issued: {context['issued_date']}"),
+        (11, f"Transaction: {context['transaction_id']}"),
+        (11, f"Paid on: {context['payment_date']}"),
+        (11, ""),
+        (11, f"Billed to: {context['student_name']} <{context['student_email']}>"),
+        (11, f"Tutor: {context['tutor_name']} <{context['tutor_email']}>"),
+        (11, ""),
+        (11, f"Tuition: {context['tuition_title']}"),
+        (14, f"Amount paid: {context['amount']} {context.get('currency', 'BDT')}"),
+    ]
+
+    content = ["BT", "/F1 11 Tf", "72 770 Td"]
+    for size, text in lines:
+        content.append(f"/F1 {size} Tf")
+        content.append(f"({_escape(text)}) Tj")
+        content.append(f"0 -{size + 8} Td")
+    content.append("ET")
+    stream = "\n".join(content).encode("latin-1")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
@@ -0,0 +1,150 @@
+"""
+Match local `Payment` rows against a gateway settlement report.
+
+The report is loaded once into a dict keyed by transaction id (the build
+side of a hash join); payments are streamed per date partition and probed
+against it, so memory is bounded by the report, not by the payments table.
+"""
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections
+
+from . import payment_state
+from .models import Payment
+
+GATEWAY_STATUSES = {
+    "VALID": Payment.PAYMENT_STATUS_COMPLETED,
+    "VALIDATED": Payment.PAYMENT_STATUS_COMPLETED,
+    "SUCCESS": Payment.PAYMENT_STATUS_COMPLETED,
+    "COMPLETED": Payment.PAYMENT_STATUS_COMPLETED,
+    "FAILED": Payment.PAYMENT_STATUS_FAILED,
+    "CANCELLED": Payment.PAYMENT_STATUS_FAILED,
+    "EXPIRED": Payment.PAYMENT_STATUS_FAILED,
+    "UNATTEMPTED": Payment.PAYMENT_STATUS_FAILED,
+    "REFUNDED": Payment.PAYMENT_STATUS_REFUNDED,
+}
+
+MISMATCH_STATUS = "status"
+MISMATCH_AMOUNT = "amount"
+MISMATCH_MISSING_IN_GATEWAY = "missing_in_gateway"
+MISMATCH_MISSING_LOCALLY = "missing_locally"
+
+
+@dataclass
+class Mismatch:
+    kind: str
+    transaction_id: str
+    payment_id: int = None
+    local_status: str = None
+    gateway_status: str = None
+    local_amount: Decimal = None
+    gateway_amount: Decimal = None
+
+
+@dataclass
+class PartitionResult:
+    start: object
+    end: object
+    scanned: int = 0
+    matched: set = field(default_factory=set)
+    mismatches: list = field(default_factory=list)
+
+
+def _normalize(row):
+    tran_id = row.get("tran_id") or row.get("transaction_id")
+    if not tran_id:
+        return None
+    raw_status = str(row.get("status", "")).upper()
+    try:
+        amount = Decimal(str(row.get("amount"))).quantize(Decimal("0.01"))
+    except (InvalidOperation, TypeError):
+        amount = None
+    return tran_id, {"status": GATEWAY_STATUSES.get(raw_status, raw_status), "amount": amount}
+
+
+def load_report(path):
+    """Read a CSV or JSON settlement report into {transaction_id: {status, amount}}."""
+    with open(path, newline="") as f:
+        if str(path).lower().endswith(".json"):
+            data = json.load(f)
+            rows = data.get("transactions", data.get("element", [])) if isinstance(data, dict) else data
+        else:
+            rows = csv.DictReader(f)
+        return dict(filter(None, (_normalize(row) for row in rows)))
+
+
+def partitions(start, end, days):
+    current = start
+    while current < end:
+        upper = min(current + timedelta(days=days), end)
+        yield current, upper
+        current = upper
+
+
+def reconcile_partition(report, start, end, chunk_size=2000):
+    result = PartitionResult(start, end)
+    rows = (
+        Payment.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by()
+        .values_list("id", "transaction_id", "status", "amount")
+        .iterator(chunk_size=chunk_size)
+    )
+    try:
+        for payment_id, tran_id, status, amount in rows:
+            result.scanned += 1
+            settled = report.get(tran_id)
+            if settled is None:
+                # a pending payment the gateway never saw is just an abandoned checkout
+                if status != Payment.PAYMENT_STATUS_PENDING:
+                    result.mismatches.append(Mismatch(MISMATCH_MISSING_IN_GATEWAY, tran_id, payment_id, status,
+                                                      local_amount=amount))
+                continue
+            result.matched.add(tran_id)
+            if settled["status"] != status:
+                result.mismatches.append(Mismatch(MISMATCH_STATUS, tran_id, payment_id, status, settled["status"],
+                                                  amount, settled["amount"]))
+            elif settled["amount"] is not None and settled["amount"] != amount:
+                result.mismatches.append(Mismatch(MISMATCH_AMOUNT, tran_id, payment_id, status, settled["status"],
+                                                  amount, settled["amount"]))
+    finally:
+        connections.close_all()
+    return result
+
+
+def reconcile(report, start, end, partition_days=7, workers=4, chunk_size=2000):
+    """Reconcile [start, end) in parallel date partitions. Returns (scanned, mismatches)."""
+    ranges = list(partitions(start, end, partition_days))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda r: reconcile_partition(report, r[0], r[1], chunk_size), ranges))
+
+    scanned = sum(r.scanned for r in results)
+    mismatches = [m for r in results for m in r.mismatches]
+    matched = set().union(*(r.matched for r in results)) if results else set()
+    # report rows with no local payment in range; they may belong to another range
+    unmatched = [tran_id for tran_id in report if tran_id not in matched]
+    known = set()
+    for i in range(0, len(unmatched), 1000):
+        chunk = unmatched[i:i + 1000]
+        known.update(Payment.objects.filter(transaction_id__in=chunk).values_list("transaction_id", flat=True))
+    for tran_id in unmatched:
+        if tran_id not in known:
+            mismatches.append(Mismatch(MISMATCH_MISSING_LOCALLY, tran_id, gateway_status=report[tran_id]["status"],
+                                       gateway_amount=report[tran_id]["amount"]))
+    return scanned, mismatches
+
+
+def apply_corrections(mismatches):
+    """Bulk-move payments to the status the gateway settled. Returns {status: count}."""
+    by_target = {}
+    for mismatch in mismatches:
+        if mismatch.kind == MISMATCH_STATUS and mismatch.gateway_status in payment_state.TRANSITIONS:
+            by_target.setdefault(mismatch.gateway_status, []).append(mismatch.payment_id)
+    return {
+        target: len(payment_state.bulk_transition(ids, target))
+        for target, ids in by_target.items()
+    }
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Application, Enrollment, Topic, Assignment, Review, Payment, TutorWallet, Invoice
+from .models import Application, Enrollment, Topic, Assignment, Review, Payment, TutorWallet, Invoice, WithdrawalRequest
 
 class ApplicationSerializer(serializers.ModelSerializer):
     applicant_email = serializers.ReadOnlyField(source="applicant.email")
@@ -77,3 +77,10 @@ class InvoiceSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = ["id", "payment", "student_email", "tutor_email", "tuition_title", "amount", "invoice_number", "issued_date", "pdf_url"]
         read_only_fields = ["id", "student_email", "tutor_email", "tuition_title", "amount", "issued_date"]
+
+
+class WithdrawalRequestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WithdrawalRequest
+        fields = ["id", "amount", "status", "provider_reference", "failure_reason", "requested_at", "processed_at"]
+        read_only_fields = ["id", "status", "provider_reference", "failure_reason", "requested_at", "processed_at"]
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api import events
+from applications import dashboard_cache
+from applications.models import ChangeLogEntry
+from tuition.models import Tuition
+
+
+def _deleted_users(origin):
+    """Ids of the users a delete started from, if it did; their change log is being deleted with them."""
+    User = get_user_model()
+    if isinstance(origin, User):
+        return {origin.pk}
+    if isinstance(origin, QuerySet) and issubclass(origin.model, User):
+        return set(origin.values_list("pk", flat=True))
+    return set()
+
+
+def log_delete(sender, instance, origin=None, **kwargs):
+    """
+    Log deletes of ChangeLogged rows; pre_delete runs inside the delete's transaction, while the row still exists.
+    Connected per ChangeLogged model in ApplicationsConfig.ready, so other models keep Django's fast delete.
+    """
+    # the collector has already gathered a deleted user's entries; a new one would violate its foreign key
+    ChangeLogEntry.record(sender, [instance.pk], ChangeLogEntry.OP_DELETE, exclude_users=_deleted_users(origin))
+
+
+@receiver([post_save, post_delete], sender=Tuition)
+def invalidate_tutor_tuitions(sender, instance, **kwargs):
+    dashboard_cache.invalidate([instance.tutor_id], "tuitions")
+
+
+def push_changes(sender, entries, **kwargs):
+    """Committed change-log entries: invalidate the affected dashboards and notify subscribers."""
+    for entry in entries:
+        dashboard_cache.invalidate_for_change(entry.user_id, entry.model)
+        events.publish(entry.user_id, entry.as_event())
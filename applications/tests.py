@@ -1,3 +1,279 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from applications import callbacks, ledger, payment_state, payouts
+from applications.gateway import AsyncGateway, CircuitBreaker, GatewayError, SSLCommerzGateway, StubGateway
+from applications.models import (Application, Assignment, ChangeLogEntry, Enrollment, LedgerEntry, Payment,
+                                  PaymentCallback, PayoutBatch, Topic, TutorWallet, WalletSnapshot, WithdrawalRequest)
+from tuition.models import Tuition
+from users.models import User
+
+
+class DeleteUserTests(TestCase):
+    """Deleting a user cascades through change-logged rows without logging entries for the deleted user."""
+
+    def setUp(self):
+        self.tutor = User.objects.create_user("tutor@example.com", "pw", role=User.ROLE_TUTOR)
+        self.student = User.objects.create_user("student@example.com", "pw", role=User.ROLE_USER)
+        tuition = Tuition.objects.create(tutor=self.tutor, title="Math", description="d", subject="m",
+                                         class_level="9", is_paid=True, price=100)
+        Application.objects.create(tuition=tuition, applicant=self.student)
+        enrollment = Enrollment.objects.create(tuition=tuition, student=self.student)
+        Topic.objects.create(enrollment=enrollment, title="Algebra")
+        Assignment.objects.create(enrollment=enrollment, title="Homework")
+        Payment.objects.create(enrollment=enrollment, student=self.student, tutor=self.tutor, amount=100,
+                               transaction_id=f"txn_{enrollment.pk}", payment_gateway="stub")
+
+    def test_delete_student(self):
+        self.student.delete()
+
+        self.assertFalse(User.objects.filter(pk=self.student.pk).exists())
+        self.assertFalse(Enrollment.objects.exists())
+        # the tutor still hears about the rows that went away
+        self.assertEqual(
+            set(ChangeLogEntry.objects.filter(user=self.tutor, op=ChangeLogEntry.OP_DELETE)
+                .values_list("model", flat=True)),
+            {"application", "enrollment", "topic", "assignment", "payment"},
+        )
+
+    def test_delete_tutor(self):
+        self.tutor.delete()
+
+        self.assertFalse(User.objects.filter(pk=self.tutor.pk).exists())
+        self.assertFalse(Application.objects.exists())
+        self.assertTrue(ChangeLogEntry.objects.filter(user=self.student, op=ChangeLogEntry.OP_DELETE).exists())
+
+    def test_bulk_delete_users(self):
+        User.objects.filter(pk__in=[self.tutor.pk, self.student.pk]).delete()
+
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(ChangeLogEntry.objects.exists())
+
+
+class PaymentCallbackTests(TestCase):
+    """Success callbacks complete a payment only when the gateway validates them."""
+
+    def setUp(self):
+        tutor = User.objects.create_user("tutor@example.com", "pw", role=User.ROLE_TUTOR)
+        student = User.objects.create_user("student@example.com", "pw", role=User.ROLE_USER)
+        tuition = Tuition.objects.create(tutor=tutor, title="Math", description="d", subject="m",
+                                         class_level="9", is_paid=True, price=100)
+        enrollment = Enrollment.objects.create(tuition=tuition, student=student)
+        self.payment = Payment.objects.create(enrollment=enrollment, student=student, tutor=tutor, amount=100,
+                                              transaction_id=f"txn_{enrollment.pk}", payment_gateway="stub")
+        self.tran_id = self.payment.transaction_id
+        self.gateway = StubGateway()
+        patcher = mock.patch.object(callbacks, "get_gateway", return_value=self.gateway)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def success(self, **data):
+        return callbacks.receive(PaymentCallback.KIND_SUCCESS, {"tran_id": self.tran_id, "val_id": self.tran_id, **data})
+
+    def status(self):
+        self.payment.refresh_from_db()
+        return self.payment.status
+
+    def test_validated_success_completes(self):
+        self.gateway.settle(self.tran_id, amount="100.00")
+
+        callback = self.success()
+
+        self.assertEqual(callback.status, PaymentCallback.STATUS_PROCESSED)
+        self.assertEqual(self.status(), Payment.PAYMENT_STATUS_COMPLETED)
+
+    def test_unvalidated_success_fails(self):
+        callback = self.success()
+
+        self.assertEqual(callback.status, PaymentCallback.STATUS_PROCESSED)
+        self.assertIn("INVALID_TRANSACTION", callback.error)
+        self.assertEqual(self.status(), Payment.PAYMENT_STATUS_FAILED)
+
+    def test_amount_mismatch_fails(self):
+        self.gateway.settle(self.tran_id, amount="1.00")
+
+        self.success()
+
+        self.assertEqual(self.status(), Payment.PAYMENT_STATUS_FAILED)
+
+    def test_other_transaction_fails(self):
+        self.gateway.settle("txn_other", amount="100.00")
+
+        self.success(val_id="txn_other")
+
+        self.assertEqual(self.status(), Payment.PAYMENT_STATUS_FAILED)
+
+    def test_redelivery_retries_unapplied_callback(self):
+        self.gateway.settle(self.tran_id, amount="100.00")
+        with mock.patch.object(self.gateway, "validate_transaction", side_effect=GatewayError("down")):
+            with self.assertRaises(callbacks.CallbackNotApplied):
+                self.success()
+        self.assertEqual(PaymentCallback.objects.get().status, PaymentCallback.STATUS_RECEIVED)
+
+        callback = self.success()
+
+        self.assertEqual(callback.status, PaymentCallback.STATUS_PROCESSED)
+        self.assertEqual(callback.attempts, 2)
+        self.assertEqual(self.status(), Payment.PAYMENT_STATUS_COMPLETED)
+        self.assertIsNone(self.success())
+
+    def test_process_pending(self):
+        self.gateway.settle(self.tran_id, amount="100.00")
+        with self.settings(PAYMENT_CALLBACKS_ASYNC=True):
+            self.success()
+
+        self.assertEqual(callbacks.process_pending(), 1)
+        self.assertEqual(callbacks.process_pending(), 0)
+        self.assertEqual(self.status(), Payment.PAYMENT_STATUS_COMPLETED)
+
+
+class AsyncGatewayTests(SimpleTestCase):
+    """The httpx path of AsyncGateway, against a mock transport instead of the network."""
+
+    def gateway(self, *responses):
+        """An AsyncGateway whose requests get `responses` in turn (an exception is raised instead)."""
+        self.requests = []
+        replies = iter(responses)
+
+        def handler(request):
+            self.requests.append(request)
+            reply = next(replies)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        sync = SSLCommerzGateway(settings.SSLCOMMERZ, max_retries=2, backoff_factor=0, failure_threshold=2)
+        return AsyncGateway(sync, transport=httpx.MockTransport(handler))
+
+    async def test_create_session(self):
+        gateway = self.gateway(httpx.Response(200, json={"status": "SUCCESS", "GatewayPageURL": "https://pay"}))
+
+        response = await gateway.create_session({"tran_id": "txn_1", "total_amount": "100.00"})
+
+        self.assertEqual(response["status"], "SUCCESS")
+        [request] = self.requests
+        self.assertEqual(str(request.url), gateway.gateway.client.createSessionUrl)
+        self.assertIn(b"tran_id=txn_1", request.content)
+        self.assertIn(b"store_id=", request.content)
+        self.assertEqual(gateway.gateway.breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_retries_transport_errors_and_retry_statuses(self):
+        gateway = self.gateway(
+            httpx.ConnectError("refused"),
+            httpx.Response(503),
+            httpx.Response(200, json={"status": "SUCCESS"}),
+        )
+
+        response = await gateway.create_session({"tran_id": "txn_1"})
+
+        self.assertEqual(response["status"], "SUCCESS")
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_gives_up_and_opens_the_breaker(self):
+        gateway = self.gateway(*[httpx.ReadTimeout("slow")] * 6)
+
+        for _ in range(2):
+            with self.assertRaisesMessage(GatewayError, "unreachable after 3 attempts"):
+                await gateway.create_session({"tran_id": "txn_1"})
+
+        self.assertEqual(gateway.gateway.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(GatewayError):
+            await gateway.create_session({"tran_id": "txn_1"})
+        self.assertEqual(len(self.requests), 6)
+
+    async def test_non_json_response(self):
+        gateway = self.gateway(httpx.Response(200, text="<html>"))
+
+        with self.assertRaisesMessage(GatewayError, "non-JSON"):
+            await gateway.create_session({"tran_id": "txn_1"})
+
+
+class PayoutTests(TestCase):
+    """Overlapping payout runs never send or count a withdrawal twice."""
+
+    def setUp(self):
+        self.tutor = User.objects.create_user("tutor@example.com", "pw", role=User.ROLE_TUTOR)
+        student = User.objects.create_user("student@example.com", "pw", role=User.ROLE_USER)
+        tuition = Tuition.objects.create(tutor=self.tutor, title="Math", description="d", subject="m",
+                                         class_level="9", is_paid=True, price=500)
+        enrollment = Enrollment.objects.create(tuition=tuition, student=student)
+        payment = Payment.objects.create(enrollment=enrollment, student=student, tutor=self.tutor, amount=500,
+                                         transaction_id=f"txn_{enrollment.pk}", payment_gateway="stub")
+        payment_state.transition(Payment.PAYMENT_STATUS_COMPLETED, payment_id=payment.pk)
+        self.withdrawal = payouts.request_withdrawal(self.tutor, Decimal("200.00"))
+        self.provider = payouts.StubDisbursementProvider()
+
+    def expire_leases(self):
+        past = timezone.now() - timedelta(seconds=1)
+        PayoutBatch.objects.update(lease_until=past)
+        WithdrawalRequest.objects.update(lease_until=past)
+
+    def test_run_pays_requested_withdrawals(self):
+        batch = payouts.run_batch(self.provider)
+
+        self.assertEqual((batch.status, batch.paid_count, batch.paid_amount), (PayoutBatch.STATUS_COMPLETED, 1, 200))
+        self.withdrawal.refresh_from_db()
+        self.assertEqual(self.withdrawal.status, WithdrawalRequest.STATUS_PAID)
+
+    def test_leased_batch_is_skipped(self):
+        batch = payouts._claim_batch()
+        payouts._claim_chunk(batch, 10)
+
+        self.assertIsNone(payouts.run_batch(self.provider))
+        self.assertEqual(payouts._claim_stuck(batch, 10), [])
+        self.assertEqual(self.provider.sent, {})
+
+    def test_expired_lease_is_resumed_and_counted_once(self):
+        batch = payouts._claim_batch()
+        ids = payouts._claim_chunk(batch, 10)
+        self.expire_leases()
+
+        resumed = payouts.run_batch(self.provider)
+
+        self.assertEqual(resumed.pk, batch.pk)
+        self.assertEqual(resumed.paid_count, 1)
+        # the run that lost its lease reports back late
+        late = [payouts.PayoutResult(f"withdrawal:{pk}", True, "late") for pk in ids]
+        payouts._settle(batch, list(WithdrawalRequest.objects.filter(pk__in=ids)), late)
+        resumed.refresh_from_db()
+        self.assertEqual((resumed.paid_count, resumed.paid_amount), (1, 200))
+
+
+class WalletSnapshotTests(TestCase):
+    """Balance reads never write; snapshots follow writes once the delta is long."""
+
+    def setUp(self):
+        self.tutor = User.objects.create_user("tutor@example.com", "pw", role=User.ROLE_TUTOR)
+        TutorWallet.objects.create(tutor=self.tutor)
+
+    def credit(self, count):
+        for _ in range(count):
+            ledger.post(self.tutor.id, LedgerEntry.ENTRY_PAYMENT, f"payment:{LedgerEntry.objects.count()}", [
+                (LedgerEntry.ACCOUNT_EXTERNAL, -1), (LedgerEntry.ACCOUNT_AVAILABLE, 1),
+            ])
+        LedgerEntry.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+    def test_reading_a_long_delta_does_not_snapshot(self):
+        self.credit(ledger.SNAPSHOT_EVERY + 1)
+
+        with self.assertNumQueries(2):
+            balance = ledger.get_balance(self.tutor.id)
+
+        self.assertEqual(balance.available_balance, ledger.SNAPSHOT_EVERY + 1)
+        self.assertFalse(WalletSnapshot.objects.exists())
+
+    def test_write_snapshots_once_the_delta_is_due(self):
+        self.credit(ledger.SNAPSHOT_EVERY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.credit(1)
+
+        snapshot = WalletSnapshot.objects.get()
+        self.assertEqual(snapshot.available_balance, ledger.SNAPSHOT_EVERY + 1)
+        self.assertEqual(ledger.get_balance(self.tutor.id).available_balance, ledger.SNAPSHOT_EVERY + 1)
@@ -1,15 +1,21 @@
+from datetime import timedelta
+from decimal import Decimal
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied, ValidationError
-from .models import Application, Enrollment, Topic, Assignment, Review, Payment, TutorWallet, Invoice
-from .serializers import ApplicationSerializer, EnrollmentSerializer, TopicSerializer, AssignmentSerializer, ReviewSerializer, PaymentSerializer, TutorWalletSerializer, InvoiceSerializer
+from .models import Application, Enrollment, Topic, Assignment, Review, Payment, TutorWallet, Invoice, WithdrawalRequest, ArchivedApplication, ArchivedPayment
+from .serializers import ApplicationSerializer, EnrollmentSerializer, TopicSerializer, AssignmentSerializer, ReviewSerializer, PaymentSerializer, TutorWalletSerializer, InvoiceSerializer, WithdrawalRequestSerializer
 from tuition.models import Tuition
 from tuition.views import IsTutor
 from tuition.paginations import DefaultPagination
 from applications.permissions import IsTutorOrReadOnly
-from rest_framework.decorators import action
-from drf_yasg.utils import swagger_auto_schema
+from applications import analytics, ledger, payouts
+from api.throttling import WriteThrottle
+from rest_framework.decorators import action, api_view
+from applications import archive, changelog, dashboard
 # Create your views here.
 
 class IsUser(permissions.BasePermission):
@@ -17,10 +23,34 @@ class IsUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == "User"
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+
+class IncludeArchivedMixin:
+    """
+    `?include_archived=true` on the list: live rows and their archived
+    history in one newest-first page, each item marked `archived`.
+    Subclasses build both querysets with `visible(model)`.
+    """
+    archived_model = None
+
+    def get_queryset(self):
+        return self.visible(self.queryset.model)
+
+    def list(self, request, *args, **kwargs):
+        if not archive.wants_archived(request):
+            return super().list(request, *args, **kwargs)
+        live, archived = self.get_queryset(), self.visible(self.archived_model)
+        page = self.paginate_queryset(archive.merged(live, archived))
+        data = [{**self.get_serializer(obj).data, "archived": is_archived}
+                for obj, is_archived in archive.load(page, live, archived)]
+        return self.get_paginated_response(data)
+
+
+class ApplicationViewSet(IncludeArchivedMixin, viewsets.ModelViewSet):
     serializer_class = ApplicationSerializer
     queryset = Application.objects.all() 
+    archived_model = ArchivedApplication
     pagination_class = DefaultPagination    
+    throttle_classes = [WriteThrottle]
     def get_permissions(self):
         if self.action == "create":
             return [IsUser()]
@@ -30,15 +60,21 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         tuition_id = self.request.data.get("tuition")
         tuition = Tuition.objects.get(id=tuition_id)
+        # an archived rejection still counts as the applicant's one application
+        for model in (Application, ArchivedApplication):
+            if model.objects.filter(tuition=tuition, applicant=self.request.user).exists():
+                raise ValidationError({"detail": "You have already applied to this tuition."})
         serializer.save(applicant=self.request.user, tuition=tuition)
 
-    def get_queryset(self):
+    def visible(self, model):
+        if getattr(self, "swagger_fake_view", False):  # schema generation has no user
+            return model.objects.none()
         user = self.request.user
         if user.role == "Tutor":
-            return Application.objects.filter(tuition__tutor=user)
+            return model.objects.filter(tuition__tutor=user)
         elif user.role == "User":
-            return Application.objects.filter(applicant=user)
-        return Application.objects.none()
+            return model.objects.filter(applicant=user)
+        return model.objects.none()
     
     @action(detail=True, methods=["post"], permission_classes=[IsTutor])
     
@@ -80,6 +116,8 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Enrollment.objects.none()
         user = self.request.user
         if user.role == "User":
             return Enrollment.objects.filter(student=user)
@@ -138,6 +176,8 @@ class TopicViewSet(viewsets.ModelViewSet):
     permission_classes = [IsTutorOrReadOnly]
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Topic.objects.none()
         user = self.request.user
         if user.role == "Tutor":
             return Topic.objects.filter(enrollment__tuition__tutor=user)
@@ -158,6 +198,8 @@ class AssignmentViewSet(viewsets.ModelViewSet):
     permission_classes = [IsTutorOrReadOnly]
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Assignment.objects.none()
         user = self.request.user
         if user.role == "Tutor":
             return Assignment.objects.filter(enrollment__tuition__tutor=user)
@@ -197,19 +239,22 @@ class ReviewViewSet(viewsets.ModelViewSet):
         serializer.save(student=self.request.user, tuition=tuition)
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(IncludeArchivedMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     queryset = Payment.objects.all()
+    archived_model = ArchivedPayment
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = DefaultPagination
 
-    def get_queryset(self):
+    def visible(self, model):
+        if getattr(self, "swagger_fake_view", False):
+            return model.objects.none()
         user = self.request.user
         if user.role == "User":
-            return Payment.objects.filter(student=user)
+            return model.objects.filter(student=user)
         elif user.role == "Tutor":
-            return Payment.objects.filter(tutor=user)
-        return Payment.objects.none()
+            return model.objects.filter(tutor=user)
+        return model.objects.none()
 
     @action(detail=False, methods=["get"])
     def my_payments(self, request):
@@ -229,6 +274,8 @@ class TutorWalletViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return TutorWallet.objects.none()
         user = self.request.user
         if user.role == "Tutor":
             return TutorWallet.objects.filter(tutor=user)
@@ -238,7 +285,7 @@ class TutorWalletViewSet(viewsets.ReadOnlyModelViewSet):
     def my_wallet(self, request):
         """Get current tutor's wallet balance"""
         try:
-            wallet = TutorWallet.objects.get(tutor=request.user)
+            wallet = ledger.apply_balance(TutorWallet.objects.get(tutor=request.user))
             serializer = self.get_serializer(wallet)
             return Response(serializer.data)
         except TutorWallet.DoesNotExist:
@@ -252,11 +299,14 @@ class TutorWalletViewSet(viewsets.ReadOnlyModelViewSet):
         """Get tutor's earnings from completed payments"""
         try:
             wallet = TutorWallet.objects.get(tutor=request.user)
-            payments = Payment.objects.filter(tutor=request.user, status=Payment.PAYMENT_STATUS_COMPLETED)
+            balance = ledger.get_balance(wallet.tutor_id)
+            payments = Payment.objects.filter(
+                tutor=request.user, status=Payment.PAYMENT_STATUS_COMPLETED
+            ).select_related("student", "tutor", "enrollment__tuition")
             return Response({
-                "total_earned": wallet.total_earned,
-                "available_balance": wallet.available_balance,
-                "pending_balance": wallet.pending_balance,
+                "total_earned": balance.total_earned,
+                "available_balance": balance.available_balance,
+                "pending_balance": balance.pending_balance,
                 "payments_count": payments.count(),
                 "recent_payments": PaymentSerializer(payments[:10], many=True).data
             })
@@ -267,6 +317,60 @@ class TutorWalletViewSet(viewsets.ReadOnlyModelViewSet):
             )
 
 
+    @action(detail=False, methods=["get"])
+    def analytics(self, request):
+        """
+        Tutor earnings over time from the rollup tables.
+        Query params: bucket=day|week|month, start/end=YYYY-MM-DD, tuition=<id>
+        """
+        if request.user.role != "Tutor":
+            return Response({"detail": "Only tutors have earnings."}, status=status.HTTP_403_FORBIDDEN)
+
+        bucket = request.query_params.get("bucket", analytics.BUCKET_DAY)
+        if bucket not in analytics.BUCKETS:
+            raise ValidationError({"bucket": f"Must be one of {', '.join(analytics.BUCKETS)}."})
+        # parse_date returns None for a malformed value and raises ValueError for an impossible date
+        try:
+            end = parse_date(request.query_params["end"]) if "end" in request.query_params else timezone.localdate()
+            start = None
+            if end is not None:
+                start = parse_date(request.query_params["start"]) if "start" in request.query_params else end - timedelta(days=30)
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start > end:
+            raise ValidationError({"detail": "start and end must be valid YYYY-MM-DD dates with start <= end."})
+        tuition_id = request.query_params.get("tuition")
+        if tuition_id is not None and not tuition_id.isdigit():
+            raise ValidationError({"tuition": "Must be a tuition id."})
+
+        series = analytics.earnings_series(request.user.id, start, end, bucket, tuition_id)
+        return Response({
+            "bucket": bucket,
+            "start": start,
+            "end": end,
+            "total": sum((item["amount"] for item in series), Decimal("0.00")),
+            "series": series,
+        })
+
+    @action(detail=False, methods=["get", "post"], permission_classes=[IsTutor])
+    def withdrawals(self, request):
+        """List the tutor's withdrawal requests, or request a new withdrawal."""
+        if request.method == "POST":
+            serializer = WithdrawalRequestSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                withdrawal = payouts.request_withdrawal(request.user, serializer.validated_data["amount"])
+            except payouts.WithdrawalError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(WithdrawalRequestSerializer(withdrawal).data, status=status.HTTP_201_CREATED)
+
+        withdrawals = WithdrawalRequest.objects.filter(tutor=request.user)
+        page = self.paginate_queryset(withdrawals)
+        if page is not None:
+            return self.get_paginated_response(WithdrawalRequestSerializer(page, many=True).data)
+        return Response(WithdrawalRequestSerializer(withdrawals, many=True).data)
+
+
 class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvoiceSerializer
     queryset = Invoice.objects.all()
@@ -274,6 +378,8 @@ class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = DefaultPagination
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Invoice.objects.none()
         user = self.request.user
         if user.role == "User":
             return Invoice.objects.filter(payment__student=user)
@@ -290,4 +396,46 @@ class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(invoices, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+@api_view(["GET"])
+def changes(request):
+    """
+    Delta sync: `?since=<cursor>` returns what changed in the caller's
+    applications, enrollments, payments, topics and assignments since then.
+    Without `since` it returns only the current cursor, to take before a full load.
+    """
+    since = request.query_params.get("since")
+    if since is None:
+        return Response({"cursor": changelog.latest_cursor(), "more": False, "changes": []})
+    try:
+        since = int(since)
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return Response({"detail": "since must be a cursor returned by this endpoint."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        data, cursor, more = changelog.changes_since(request.user, since, context={"request": request})
+    except changelog.CursorExpired:
+        return Response(
+            {"detail": "Cursor expired; reload the lists and start from the current cursor.",
+             "cursor": changelog.latest_cursor()},
+            status=status.HTTP_410_GONE,
+        )
+    return Response({"cursor": cursor, "more": more, "changes": data})
+
+
+@api_view(["GET"])
+def tutor_dashboard(request):
+    """Everything on the tutor dashboard in one response; each section is cached separately."""
+    if request.user.role != "Tutor":
+        return Response({"detail": "Only tutors have a tutor dashboard."}, status=status.HTTP_403_FORBIDDEN)
+    return Response(dashboard.tutor(request.user))
+
+
+@api_view(["GET"])
+def student_dashboard(request):
+    """Everything on the student dashboard in one response; each section is cached separately."""
+    if request.user.role != "User":
+        return Response({"detail": "Only students have a student dashboard."}, status=status.HTTP_403_FORBIDDEN)
+    return Response(dashboard.student(request.user))
@@ -0,0 +1,5 @@
+from django.contrib import admin
+from mailer.models import OutboxEmail
+# Register your models here.
+
+admin.site.register(OutboxEmail)
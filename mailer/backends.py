@@ -0,0 +1,47 @@
+import base64
+
+from django.core.mail.backends.base import BaseEmailBackend
+
+from mailer.models import OutboxEmail
+
+
+def _attachment(attachment):
+    if isinstance(attachment, tuple) or hasattr(attachment, "_fields"):
+        filename, content, mimetype = attachment
+    else:
+        # a MIMEBase part
+        filename = attachment.get_filename()
+        content = attachment.get_payload(decode=True)
+        mimetype = attachment.get_content_type()
+    if isinstance(content, str):
+        content = content.encode()
+    return [filename, base64.b64encode(content).decode(), mimetype]
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Stores outgoing messages in `OutboxEmail` instead of sending them.
+    The rows are part of the caller's transaction, so an email is only
+    delivered if the work that produced it commits.
+    """
+
+    def send_messages(self, email_messages):
+        rows = [
+            OutboxEmail(
+                subject=message.subject,
+                body=message.body,
+                content_subtype=message.content_subtype,
+                from_email=message.from_email,
+                to=list(message.to),
+                cc=list(message.cc),
+                bcc=list(message.bcc),
+                reply_to=list(message.reply_to),
+                headers=dict(message.extra_headers),
+                alternatives=[list(alternative) for alternative in getattr(message, "alternatives", [])],
+                attachments=[_attachment(attachment) for attachment in message.attachments],
+            )
+            for message in email_messages
+            if message.recipients()
+        ]
+        OutboxEmail.objects.bulk_create(rows)
+        return len(rows)
@@ -0,0 +1,76 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from mailer import outbox
+from mailer.models import OutboxEmail
+from mailer.smtp_standin import SMTPStandIn
+from users.models import User
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+OUTBOX_BACKEND = "mailer.backends.OutboxEmailBackend"
+
+
+class Command(BaseCommand):
+    help = "Compare /auth/users/ signup latency with synchronous SMTP and with the outbox, against a local SMTP stand-in"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--signups", type=int, default=20)
+        parser.add_argument("--connect-delay", type=float, default=0.3,
+                            help="Simulated SMTP connection + handshake cost in seconds")
+
+    def signup(self, count, prefix):
+        client = APIClient(SERVER_NAME="127.0.0.1")
+        latencies = []
+        for i in range(count):
+            started = time.perf_counter()
+            response = client.post("/api/v1/auth/users/", {
+                "email": f"{prefix}-{i}@example.com",
+                "password": "Benchmark-Password-1",
+                "first_name": "Bench",
+                "last_name": "Mark",
+            }, format="json")
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 201:
+                self.stdout.write(self.style.ERROR(f"Signup failed: {response.status_code} {response.data}"))
+        return latencies
+
+    def report(self, name, latencies):
+        self.stdout.write(
+            f"{name:<8} signup p50 {statistics.median(latencies) * 1000:,.0f}ms "
+            f"max {max(latencies) * 1000:,.0f}ms over {len(latencies)} signups"
+        )
+
+    def cleanup(self):
+        User.objects.filter(email__startswith="bench-signup-").delete()
+        OutboxEmail.objects.filter(to__icontains="bench-signup-").delete()
+
+    def handle(self, *args, **options):
+        server = SMTPStandIn(connect_delay=options["connect_delay"]).start()
+        smtp = dict(EMAIL_HOST="127.0.0.1", EMAIL_PORT=server.port, EMAIL_USE_TLS=False,
+                    EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="", OUTBOX_DELIVERY_BACKEND=SMTP_BACKEND)
+        self.cleanup()
+        try:
+            with override_settings(EMAIL_BACKEND=SMTP_BACKEND, **smtp):
+                self.report("smtp", self.signup(options["signups"], "bench-signup-smtp"))
+
+            with override_settings(EMAIL_BACKEND=OUTBOX_BACKEND, **smtp):
+                self.report("outbox", self.signup(options["signups"], "bench-signup-outbox"))
+                connections_before = server.connections
+                started = time.perf_counter()
+                sent = 0
+                while True:
+                    batch_sent, batch_failed = outbox.deliver_pending(batch_size=100)
+                    sent += batch_sent
+                    if not batch_sent and not batch_failed:
+                        break
+                self.stdout.write(
+                    f"worker   delivered {sent} emails in {time.perf_counter() - started:.2f}s "
+                    f"over {server.connections - connections_before} SMTP connections"
+                )
+        finally:
+            server.stop()
+            self.cleanup()
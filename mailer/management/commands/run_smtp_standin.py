@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from mailer.smtp_standin import SMTPStandIn
+
+
+class Command(BaseCommand):
+    help = "Run a local SMTP stand-in that accepts and discards mail (development only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=1025)
+        parser.add_argument("--connect-delay", type=float, default=0.0,
+                            help="Seconds to wait before greeting each new connection")
+
+    def handle(self, *args, **options):
+        server = SMTPStandIn(options["host"], options["port"], options["connect_delay"])
+        self.stdout.write(f"SMTP stand-in listening on {options['host']}:{server.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Received {len(server.messages)} messages over {server.connections} connections")
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mailer import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails in batches over a single SMTP connection per batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when the outbox is empty")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the outbox is empty")
+        parser.add_argument("--requeue-dead", action="store_true", help="Retry dead-lettered emails before delivering")
+
+    def handle(self, *args, **options):
+        if options["requeue_dead"]:
+            self.stdout.write(f"Requeued {outbox.requeue_dead()} dead emails")
+        total_sent = total_failed = 0
+        while True:
+            try:
+                sent, failed = outbox.deliver_pending(options["batch_size"])
+            except Exception as e:
+                # typically the SMTP server is unreachable; nothing was marked, so just retry later
+                if not options["loop"]:
+                    raise
+                self.stderr.write(f"Delivery failed: {e}")
+                sent = failed = 0
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed"))
+        self.stdout.write(str(outbox.stats()))
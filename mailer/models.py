@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+# Create your models here.
+
+
+class OutboxEmail(models.Model):
+    """An email waiting for (or done with) delivery by the `send_queued_mail` worker."""
+    STATUS_QUEUED = 'QUEUED'
+    STATUS_SENT = 'SENT'
+    STATUS_DEAD = 'DEAD'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    subject = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    content_subtype = models.CharField(max_length=20, default="plain")
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list)
+    bcc = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list)
+    headers = models.JSONField(default=dict)
+    alternatives = models.JSONField(default=list, help_text="[content, mimetype] pairs, e.g. the HTML part")
+    attachments = models.JSONField(default=list, help_text="[filename, base64 content, mimetype] triples")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
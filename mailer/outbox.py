@@ -0,0 +1,160 @@
+"""
+Delivery side of the email outbox.
+
+`deliver_pending` claims a batch of due messages (SKIP LOCKED, so several
+workers can run) by leasing them for OUTBOX_LEASE_SECONDS, sends them
+over one connection of OUTBOX_DELIVERY_BACKEND outside any transaction,
+and records the outcome in a second one. A failed message is retried with
+exponential backoff; after OUTBOX_MAX_ATTEMPTS it is dead-lettered (status
+DEAD) and left for an operator. Delivery is at-least-once: the batch of a
+worker that dies mid-send becomes due again when its lease runs out.
+"""
+import base64
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from mailer.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 5)
+RETRY_BASE_SECONDS = getattr(settings, "OUTBOX_RETRY_BASE_SECONDS", 30)
+# longer than a batch can take to send, or another worker picks it up again
+LEASE_SECONDS = getattr(settings, "OUTBOX_LEASE_SECONDS", 300)
+
+
+def to_message(email, connection=None):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+        headers=email.headers,
+        connection=connection,
+    )
+    message.content_subtype = email.content_subtype
+    for content, mimetype in email.alternatives:
+        message.attach_alternative(content, mimetype)
+    for filename, content, mimetype in email.attachments:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def get_delivery_connection():
+    return get_connection(getattr(settings, "OUTBOX_DELIVERY_BACKEND", "django.core.mail.backends.smtp.EmailBackend"))
+
+
+def _claim(batch_size):
+    """Lease a batch of due messages and count the attempt; locks are held only for this transaction."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.STATUS_QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if batch:
+            lease = now + timedelta(seconds=LEASE_SECONDS)
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=lease, attempts=F("attempts") + 1
+            )
+            for email in batch:
+                email.next_attempt_at = lease
+                email.attempts += 1
+    return batch
+
+
+def _release(batch):
+    """Hand back a claimed batch untouched, e.g. when the SMTP server cannot be reached."""
+    OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+        next_attempt_at=timezone.now(), attempts=F("attempts") - 1
+    )
+
+
+def deliver_pending(batch_size=100, connection=None):
+    """Send one batch of due messages. Returns (sent, failed)."""
+    sent = failed = 0
+    batch = _claim(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_delivery_connection()
+    connection.fail_silently = False
+    try:
+        opened = connection.open()
+    except Exception:
+        _release(batch)
+        raise
+    try:
+        for email in batch:
+            try:
+                to_message(email, connection).send()
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # the server dropped us mid-batch; reconnect once and retry this message
+                logger.warning(f"Outbox connection lost, reconnecting: {e}")
+                connection.close()
+                connection.open()
+                try:
+                    to_message(email, connection).send()
+                except Exception as retry_error:
+                    _record_failure(email, retry_error)
+                    failed += 1
+                    continue
+            except Exception as e:
+                _record_failure(email, e)
+                failed += 1
+                continue
+            email.status = OutboxEmail.STATUS_SENT
+            email.sent_at = timezone.now()
+            email.last_error = ""
+            sent += 1
+    finally:
+        if opened:
+            connection.close()
+        # also when the reconnect failed: what was sent is recorded, the rest is retried after the lease
+        with transaction.atomic():
+            OutboxEmail.objects.bulk_update(batch, ["status", "last_error", "next_attempt_at", "sent_at"])
+    logger.info(f"Outbox batch: {sent} sent, {failed} failed")
+    return sent, failed
+
+
+def _record_failure(email, error):
+    email.last_error = str(error)[:2000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboxEmail.STATUS_DEAD
+        logger.error(f"Outbox email {email.pk} dead-lettered after {email.attempts} attempts: {error}")
+    else:
+        email.next_attempt_at = timezone.now() + _retry_delay(email.attempts)
+        logger.warning(f"Outbox email {email.pk} failed (attempt {email.attempts}): {error}")
+
+
+def requeue_dead(ids=None):
+    """Give dead-lettered messages a fresh set of attempts."""
+    dead = OutboxEmail.objects.filter(status=OutboxEmail.STATUS_DEAD)
+    if ids:
+        dead = dead.filter(id__in=ids)
+    return dead.update(status=OutboxEmail.STATUS_QUEUED, attempts=0, next_attempt_at=timezone.now())
+
+
+def stats():
+    queued = OutboxEmail.objects.filter(status=OutboxEmail.STATUS_QUEUED)
+    oldest = queued.order_by("created_at").values_list("created_at", flat=True).first()
+    return {
+        "queued": queued.count(),
+        "dead": OutboxEmail.objects.filter(status=OutboxEmail.STATUS_DEAD).count(),
+        "oldest_queued_age": (timezone.now() - oldest).total_seconds() if oldest else 0,
+    }
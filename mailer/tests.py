@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.test import TestCase
+from django.utils import timezone
+
+from mailer import outbox
+from mailer.models import OutboxEmail
+from mailer.smtp_standin import SMTPStandIn
+
+
+class OutboxDeliveryTests(TestCase):
+    """Messages go through the outbox table and out over SMTP to a local stand-in server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = SMTPStandIn(reject={"bounce@example.com"}).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.messages.clear()
+
+    def smtp(self):
+        return get_connection("django.core.mail.backends.smtp.EmailBackend", host="127.0.0.1", port=self.server.port,
+                              username="", password="", use_tls=False, use_ssl=False)
+
+    def enqueue(self, to="student@example.com"):
+        EmailMessage("Welcome", "Hello", "noreply@example.com", [to],
+                     connection=get_connection("mailer.backends.OutboxEmailBackend")).send()
+        return OutboxEmail.objects.latest("id")
+
+    def test_enqueue_and_deliver(self):
+        email = self.enqueue()
+        self.assertEqual(email.status, OutboxEmail.STATUS_QUEUED)
+        self.assertEqual(self.server.messages, [])
+
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (1, 0))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.STATUS_SENT)
+        self.assertEqual(email.attempts, 1)
+        self.assertIsNotNone(email.sent_at)
+        [(sender, recipients, data)] = self.server.messages
+        self.assertEqual(recipients, ["student@example.com"])
+        self.assertIn(b"Subject: Welcome", data)
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (0, 0))
+
+    def test_failure_is_retried_with_backoff(self):
+        email = self.enqueue(to="bounce@example.com")
+        before = timezone.now()
+
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.STATUS_QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("bounce@example.com", email.last_error)
+        self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=outbox.RETRY_BASE_SECONDS))
+        # not due yet
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (0, 0))
+
+        OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        outbox.deliver_pending(connection=self.smtp())
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertGreaterEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=outbox.RETRY_BASE_SECONDS))
+
+    def test_dead_letter_after_max_attempts(self):
+        email = self.enqueue(to="bounce@example.com")
+        OutboxEmail.objects.filter(pk=email.pk).update(attempts=outbox.MAX_ATTEMPTS - 1)
+
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.STATUS_DEAD)
+        self.assertEqual(email.attempts, outbox.MAX_ATTEMPTS)
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (0, 0))
+        self.assertEqual(outbox.requeue_dead(), 1)
+
+    def test_leased_batch_is_not_sent_twice(self):
+        email = self.enqueue()
+        # another worker claimed the row and has not finished sending it
+        [claimed] = outbox._claim(10)
+        self.assertEqual(claimed.pk, email.pk)
+
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (0, 0))
+        self.assertEqual(self.server.messages, [])
+
+        # that worker died: once its lease runs out the row is reclaimed and sent once
+        OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (1, 0))
+        self.assertEqual(outbox.deliver_pending(connection=self.smtp()), (0, 0))
+        self.assertEqual(len(self.server.messages), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
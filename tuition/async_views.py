@@ -0,0 +1,90 @@
+"""Async (ASGI) versions of the tuition catalog and payment initiation endpoints."""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from api.async_support import api_view, json_response, paginate
+from api.throttling import PaymentThrottle, SearchThrottle
+from applications.gateway import GatewayError, get_async_gateway
+from applications.models import Enrollment, Payment
+from tuition.models import Tuition
+from tuition.serializers import TuitionSerializer
+from tuition.views import TuitionViewSet, payment_session_body
+
+logger = logging.getLogger(__name__)
+
+
+def _filtered_tuitions(request):
+    # same filter/search/ordering backends as TuitionViewSet; the tutor
+    # filter validates its id with a query, so this runs in a thread
+    drf_request = Request(request)
+    view = TuitionViewSet(request=drf_request, format_kwarg=None)
+    queryset = Tuition.objects.select_related("tutor").order_by("id")
+    for backend in TuitionViewSet.filter_backends:
+        queryset = backend().filter_queryset(drf_request, queryset, view)
+    return queryset
+
+
+@require_GET
+@api_view(require_auth=False, throttle_classes=[SearchThrottle])
+async def tuition_list(request):
+    queryset = await sync_to_async(_filtered_tuitions)(request)
+    data = await paginate(request, queryset, lambda items: TuitionSerializer(items, many=True).data)
+    return json_response(data)
+
+
+@require_GET
+@api_view(require_auth=False)
+async def tuition_detail(request, pk):
+    try:
+        tuition = await Tuition.objects.select_related("tutor").aget(pk=pk)
+    except Tuition.DoesNotExist:
+        raise exceptions.NotFound("No Tuition matches the given query.")
+    return json_response(TuitionSerializer(tuition).data)
+
+
+@require_POST
+@api_view(throttle_classes=[PaymentThrottle])
+async def initiate_payment(request):
+    """Async `initiate_payment`: the gateway call does not hold a worker while it waits."""
+    user = request.user
+    try:
+        data = json.loads(request.body or b"{}") if request.content_type == "application/json" else request.POST
+    except ValueError:
+        raise exceptions.ParseError()
+    amount = data.get("amount")
+    enrollment_id = data.get("enrollment_id")
+
+    try:
+        enrollment = await Enrollment.objects.select_related("tuition").aget(id=enrollment_id, student=user)
+    except (Enrollment.DoesNotExist, ValueError, TypeError):
+        return json_response({"error": "Enrollment not found"}, status=404)
+
+    tran_id = f"txn_{enrollment_id}"
+    payment, _ = await Payment.objects.aget_or_create(
+        enrollment=enrollment,
+        defaults={
+            'student': user,
+            'tutor_id': enrollment.tuition.tutor_id,
+            'amount': amount,
+            'status': Payment.PAYMENT_STATUS_PENDING,
+            'transaction_id': tran_id,
+            'payment_gateway': 'sslcommerz',
+        }
+    )
+
+    try:
+        response = await get_async_gateway().create_session(payment_session_body(user, payment.amount, tran_id))
+    except GatewayError as e:
+        logger.error(f"Payment gateway unavailable for {tran_id}: {e}")
+        return json_response({"error": "Payment gateway unavailable, please retry shortly"}, status=503)
+
+    if response.get("status") == "SUCCESS":
+        logger.info(f"Payment initiated: {tran_id}")
+        return json_response({"payment_url": response.get("GatewayPageURL"), "transaction_id": tran_id})
+    logger.error(f"Payment initiation failed: {tran_id}")
+    return json_response({"error": "Payment initiation failed"}, status=400)
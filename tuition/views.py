@@ -5,18 +5,21 @@ from applications.models import Enrollment
 from applications.models import Payment
 from rest_framework.viewsets import ModelViewSet
 from rest_framework import permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from tuition.filters import TuitionFilter
 from tuition.paginations import DefaultPagination
-from sslcommerz_lib import SSLCOMMERZ
+from applications.gateway import get_gateway, GatewayError
+from applications import callbacks
+from applications.models import PaymentCallback
 from rest_framework.response import Response
 from django.conf import settings as django_settings
 from django.shortcuts import redirect
 from django.http import HttpResponseRedirect
-from django.utils import timezone
+from tuition_media.db_router import use_primary
+from api.throttling import PaymentThrottle, SearchThrottle, WriteThrottle
 import logging
 
 logger = logging.getLogger(__name__)
@@ -38,6 +41,7 @@ class TuitionViewSet(ModelViewSet):
     serializer_class = TuitionSerializer
     queryset = Tuition.objects.all()
     permission_classes = [IsTutor]
+    throttle_classes = [SearchThrottle, WriteThrottle]
     
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = TuitionFilter
@@ -50,7 +54,33 @@ class TuitionViewSet(ModelViewSet):
         
         
         
+def payment_session_body(user, amount, tran_id):
+    """Gateway session request for an enrollment payment (shared with the async view)."""
+    post_body = {}
+    post_body['total_amount'] = amount      
+    post_body['currency'] = "BDT"
+    post_body['tran_id'] = tran_id
+    post_body['success_url'] = f"{django_settings.BACKEND_URL}/api/v1/payment/success/"
+    post_body['fail_url'] = f"{django_settings.BACKEND_URL}/api/v1/payment/fail/"
+    post_body['cancel_url'] = f"{django_settings.BACKEND_URL}/api/v1/payment/cancel/"
+    post_body['emi_option'] = 0
+    post_body['cus_name'] = f"{user.first_name} {user.last_name}"
+    post_body['cus_email'] = user.email
+    post_body['cus_phone'] = user.phone_number
+    post_body['cus_add1'] = user.address
+    post_body['cus_city'] = "Dhaka"
+    post_body['cus_country'] = "Bangladesh"
+    post_body['shipping_method'] = "NO"
+    post_body['multi_card_name'] = ""
+    post_body['num_of_item'] = 1
+    post_body['product_name'] = "Educational Services"
+    post_body['product_category'] = "Education"
+    post_body['product_profile'] = "general"
+    return post_body
+
+
 @api_view(['POST'])
+@throttle_classes([PaymentThrottle])
 def initiate_payment(request):
     user = request.user
     amount = request.data.get("amount")
@@ -77,30 +107,15 @@ def initiate_payment(request):
         }
     )
     
-    settings = { 'store_id': 'tuiti699b02e4e33f5', 'store_pass': 'tuiti699b02e4e33f5@ssl', 'issandbox': True }
-    sslcz = SSLCOMMERZ(settings)
-    post_body = {}
-    post_body['total_amount'] = amount      
-    post_body['currency'] = "BDT"
-    post_body['tran_id'] = tran_id
-    post_body['success_url'] = f"{django_settings.BACKEND_URL}/api/v1/payment/success/"
-    post_body['fail_url'] = f"{django_settings.BACKEND_URL}/api/v1/payment/fail/"
-    post_body['cancel_url'] = f"{django_settings.BACKEND_URL}/api/v1/payment/cancel/"
-    post_body['emi_option'] = 0
-    post_body['cus_name'] = f"{user.first_name} {user.last_name}"
-    post_body['cus_email'] = user.email
-    post_body['cus_phone'] = user.phone_number
-    post_body['cus_add1'] = user.address
-    post_body['cus_city'] = "Dhaka"
-    post_body['cus_country'] = "Bangladesh"
-    post_body['shipping_method'] = "NO"
-    post_body['multi_card_name'] = ""
-    post_body['num_of_item'] = 1
-    post_body['product_name'] = "Educational Services"
-    post_body['product_category'] = "Education"
-    post_body['product_profile'] = "general"
+    # the stored amount, which is what the success callback is validated against
+    post_body = payment_session_body(user, payment.amount, tran_id)
+
+    try:
+        response = get_gateway().create_session(post_body)
+    except GatewayError as e:
+        logger.error(f"Payment gateway unavailable for {tran_id}: {e}")
+        return Response({"error": "Payment gateway unavailable, please retry shortly"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-    response = sslcz.createSession(post_body) # API response
     if response.get("status") == "SUCCESS":
         logger.info(f"Payment initiated: {tran_id}")
         return Response({
@@ -112,68 +127,27 @@ def initiate_payment(request):
         return Response({"error": "Payment initiation failed"}, status=status.HTTP_400_BAD_REQUEST)
     
 
+@use_primary
 @api_view(['POST', 'GET'])
 @permission_classes([permissions.AllowAny])  # Allow unauthenticated access (SSLCommerz redirects here)
 def payment_success(request):
     """
     SSLCommerz redirects here after successful payment.
-    This endpoint is called by SSLCommerz (server-to-server), not by frontend.
+    The callback is stored and acknowledged right away; the payment state
+    machine applies it (inline, or in the callback worker when
+    PAYMENT_CALLBACKS_ASYNC is set) once the gateway validates `val_id`.
+    Duplicates of an applied callback are no-ops; when it could not be
+    applied inline this answers 500 so the gateway redelivers it.
     """
-    from applications.models import TutorWallet
-    
+    tran_id = request.POST.get("tran_id")
+    if not tran_id:
+        return Response(
+            {"error": "Transaction ID missing"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     try:
-        tran_id = request.POST.get("tran_id")
-        
-        if not tran_id:
-            return Response(
-                {"error": "Transaction ID missing"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            enrollment_id = tran_id.split("_")[1]
-        except IndexError:
-            return Response(
-                {"error": "Invalid transaction ID format"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Get enrollment
-        try:
-            enrollment = Enrollment.objects.get(id=enrollment_id)
-        except Enrollment.DoesNotExist:
-            logger.error(f"Enrollment {enrollment_id} not found")
-            return Response(
-                {"error": "Enrollment not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        try:
-            payment = Payment.objects.get(transaction_id=tran_id)
-            payment.status = Payment.PAYMENT_STATUS_COMPLETED
-            payment.payment_date = timezone.now()
-            payment.save()
-            
-            # Credit tutor wallet
-            # wallet, _ = TutorWallet.objects.get_or_create(tutor=enrollment.tuition.tutor)
-            # wallet.total_earned += payment.amount
-            # wallet.available_balance += payment.amount
-            # wallet.save()
-            # logger.info(f"Wallet credited: {payment.amount} for tutor {enrollment.tuition.tutor.email}")
-            
-        except Payment.DoesNotExist:
-            logger.warning(f"Payment record not found for {tran_id}")
-        
-       
-        enrollment.payment_verified = True
-        enrollment.save()
-        
-        logger.info(f"Payment successful for enrollment {enrollment_id}")
-        
-   
-        success_url = f"{django_settings.FRONTEND_URL}/dashboard/my-enrollments/{enrollment_id}"
-        return redirect(success_url)
-        
+        callbacks.receive(PaymentCallback.KIND_SUCCESS, request.POST)
     except Exception as e:
         logger.error(f"Payment success error: {str(e)}")
         return Response(
@@ -181,7 +155,16 @@ def payment_success(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    enrollment_id = Payment.objects.filter(transaction_id=tran_id).values_list("enrollment_id", flat=True).first()
+    if enrollment_id is None:
+        logger.warning(f"Payment record not found for {tran_id}")
+        return redirect(f"{django_settings.FRONTEND_URL}/dashboard/my-enrollments/")
+
+    logger.info(f"Payment success callback stored for {tran_id}")
+    return redirect(f"{django_settings.FRONTEND_URL}/dashboard/my-enrollments/{enrollment_id}")
 
+
+@use_primary
 @api_view(['POST', 'GET'])
 @permission_classes([permissions.AllowAny])
 def payment_fail(request):
@@ -192,9 +175,7 @@ def payment_fail(request):
         tran_id = request.POST.get("tran_id")
         
         if tran_id:
-            Payment.objects.filter(transaction_id=tran_id).update(
-                status=Payment.PAYMENT_STATUS_FAILED
-            )
+            callbacks.receive(PaymentCallback.KIND_FAIL, request.POST)
             logger.warning(f"Payment failed: {tran_id}")
         
         return redirect(f"{django_settings.FRONTEND_URL}/dashboard/payment/fail/")
@@ -204,6 +185,7 @@ def payment_fail(request):
         return HttpResponseRedirect(f"{django_settings.FRONTEND_URL}/dashboard/payment/fail/")
     
 
+@use_primary
 @api_view(['POST', 'GET'])
 @permission_classes([permissions.AllowAny])
 def payment_cancel(request):
@@ -214,13 +196,21 @@ def payment_cancel(request):
         tran_id = request.POST.get("tran_id")
         
         if tran_id:
-            Payment.objects.filter(transaction_id=tran_id).update(
-                status=Payment.PAYMENT_STATUS_FAILED
-            )
+            callbacks.receive(PaymentCallback.KIND_CANCEL, request.POST)
             logger.warning(f"Payment cancelled: {tran_id}")
         
         return redirect(f"{django_settings.FRONTEND_URL}/dashboard/my-enrollments/")
         
     except Exception as e:
         logger.error(f"Payment cancel error: {str(e)}")
-        return HttpResponseRedirect(f"{django_settings.FRONTEND_URL}/dashboard/my-enrollments/")
\ No newline at end of file
+        return HttpResponseRedirect(f"{django_settings.FRONTEND_URL}/dashboard/my-enrollments/")
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def payment_callback_metrics(request):
+    """Callback queue backlog, throughput and latency (staff only)."""
+    return Response({
+        "queue": callbacks.queue_stats(),
+        "process": callbacks.metrics.snapshot(),
+    })
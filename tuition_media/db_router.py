@@ -0,0 +1,135 @@
+"""
+Read-replica routing.
+
+Reads go to a replica only while serving a safe-method (GET/HEAD/OPTIONS)
+request to a view in one of READ_REPLICA_APPS, and only when the client is
+not "sticky". A client becomes sticky for DB_STICKY_SECONDS after any
+request that wrote: the primary is then used for its reads so it sees its
+own writes despite replica lag. The sticky-until time is sent back in a
+cookie and in the X-DB-Primary-Until response header, for token clients
+that drop cookies to echo on their next requests; both work on any
+instance. As a fallback for clients that do neither, it is also kept in
+the cache under the Authorization header, which only reaches other
+instances with a shared cache backend.
+
+Everything else reads from `default`: management commands and workers,
+writes, anything inside a transaction on `default`, the rest of a request
+after it wrote, and views marked with `@use_primary`.
+
+The request is tracked in a context variable set by
+`api.middleware.ReplicaRoutingMiddleware`, so sync_to_async queries from
+async views are routed too.
+"""
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = "db_primary_until"
+STICKY_HEADER = "X-DB-Primary-Until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_state = ContextVar("db_routing_state", default=None)
+
+
+def use_primary(view):
+    """Always read from the primary in this view (apply above @api_view)."""
+    view.use_primary = True
+    return view
+
+
+def _sticky_key(request):
+    header = request.META.get("HTTP_AUTHORIZATION")
+    if header:
+        return "db-sticky:" + hashlib.sha256(header.encode()).hexdigest()
+    return None
+
+
+class RoutingState:
+    """Per-request routing decision; `wrote` pins the rest of the request to the primary."""
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self._replica = False  # not decided yet
+
+    def replica(self):
+        if self._replica is False:
+            self._replica = self._choose()
+        return self._replica
+
+    def _choose(self):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        request = self.request
+        if not replicas or request.method not in SAFE_METHODS:
+            return None
+        match = getattr(request, "resolver_match", None)
+        if match is None or getattr(match.func, "use_primary", False):
+            return None
+        view = getattr(match.func, "cls", match.func)
+        if view.__module__.split(".")[0] not in getattr(settings, "READ_REPLICA_APPS", ()):
+            return None
+        if self.is_sticky():
+            return None
+        return random.choice(replicas)
+
+    def is_sticky(self):
+        now = time.time()
+        # capped, so a client cannot pin itself to the primary for longer than one sticky window
+        latest = now + getattr(settings, "DB_STICKY_SECONDS", 5) + 1
+        for value in (self.request.COOKIES.get(STICKY_COOKIE), self.request.META.get("HTTP_X_DB_PRIMARY_UNTIL")):
+            try:
+                if value and now < float(value) <= latest:
+                    return True
+            except ValueError:
+                pass
+        key = _sticky_key(self.request)
+        return bool(key and cache.get(key))
+
+
+def current_state():
+    return _state.get()
+
+
+def begin_request(request):
+    return _state.set(RoutingState(request))
+
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def mark_sticky(request, response):
+    """Send this client's reads to the primary for DB_STICKY_SECONDS."""
+    seconds = getattr(settings, "DB_STICKY_SECONDS", 5)
+    until = str(int(time.time() + seconds))
+    response.set_cookie(STICKY_COOKIE, until, max_age=seconds, httponly=True, samesite="Lax")
+    response[STICKY_HEADER] = until
+    key = _sticky_key(request)
+    if key:
+        cache.set(key, True, seconds)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
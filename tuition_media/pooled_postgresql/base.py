@@ -0,0 +1,31 @@
+"""
+PostgreSQL backend that keeps psycopg2 connections in a per-process pool.
+
+Django's own pool (`OPTIONS["pool"]`) needs psycopg 3, and CONN_MAX_AGE
+keeps one connection per thread with no cap and no check after a freeze.
+This backend opens connections through the stock backend and hands them to
+`ConnectionPool` on close instead of closing them. Configure it with a
+`POOL` dict next to `OPTIONS` (which still goes to psycopg2.connect):
+max_size, timeout, health_check_after and max_lifetime.
+"""
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def connection_pool(self):
+        return get_pool(self.alias, self.settings_dict.get("POOL", {}))
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict["OPTIONS"]
+        # what the stock backend sets when it opens a connection; a reused one already has it applied
+        self.isolation_level = base.IsolationLevel(options.get("isolation_level", base.IsolationLevel.READ_COMMITTED))
+        return self.connection_pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.connection_pool.putconn(self.connection)
@@ -0,0 +1,243 @@
+"""
+A small thread-safe pool of psycopg2 connections, one per database alias
+per process.
+
+Connections are handed back when Django closes them at the end of a
+request. On checkout, a connection that has been idle longer than
+`health_check_after` is pinged first. That catches sockets the server or a
+NAT dropped while a serverless instance was frozen. Connections older than
+`max_lifetime` are replaced. When every connection is in use, callers wait
+up to `timeout` seconds and then get an OperationalError.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+from api.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("connection", "created_at", "returned_at")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.returned_at = time.monotonic()
+
+
+class _Waiter:
+    """A caller queued for a connection; `entry` is None when it is handed a free slot instead."""
+    __slots__ = ("event", "served", "entry")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.served = False
+        self.entry = None
+
+
+class ConnectionPool:
+    """
+    Waiters are served first come, first served: a returned connection goes
+    straight to the oldest waiter, so a thread that keeps checking out
+    cannot starve the others.
+    """
+
+    def __init__(self, alias, max_size=4, timeout=5.0, health_check_after=10.0, max_lifetime=1800.0):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        self.idle = deque()
+        self.in_use = {}
+        self.reserved = 0  # slots being validated or connected outside the lock
+        self.waiters = deque()
+        self.counters = {
+            "checkouts": 0, "waits": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "timeouts": 0,
+            "opened": 0, "closed": 0, "health_check_failures": 0,
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.idle) + len(self.in_use) + self.reserved
+
+    def getconn(self, connect):
+        """Check out a connection; `connect()` opens a new one when the pool has room."""
+        started = time.monotonic()
+        waiter = None
+        with self._lock:
+            self.counters["checkouts"] += 1
+            if not self.waiters and (self.idle or self.size < self.max_size):
+                entry = self.idle.pop() if self.idle else None
+                self.reserved += 1
+            else:
+                waiter = _Waiter()
+                self.waiters.append(waiter)
+
+        if waiter is not None:
+            waiter.event.wait(self.timeout)
+            with self._lock:
+                if not waiter.served:
+                    self.waiters.remove(waiter)
+                    self.counters["timeouts"] += 1
+                    raise psycopg2.OperationalError(
+                        f"Connection pool for '{self.alias}' exhausted ({self.max_size} in use, waited {self.timeout}s)"
+                    )
+                entry = waiter.entry
+                waited_for = time.monotonic() - started
+                self.counters["waits"] += 1
+                self.counters["wait_seconds"] += waited_for
+                self.counters["max_wait_seconds"] = max(self.counters["max_wait_seconds"], waited_for)
+
+        try:
+            if entry is not None:
+                entry = self._validate(entry)
+            if entry is None:
+                entry = _Entry(connect())
+                self._count("opened")
+        except Exception:
+            with self._lock:
+                self.reserved -= 1
+                self._release(None)
+            raise
+        with self._lock:
+            self.reserved -= 1
+            self.in_use[id(entry.connection)] = entry
+        return entry.connection
+
+    def _validate(self, entry):
+        """The entry if its connection is still good, else None (and it is closed)."""
+        now = time.monotonic()
+        connection = entry.connection
+        if connection.closed or now - entry.created_at > self.max_lifetime:
+            self._discard(connection)
+            return None
+        if now - entry.returned_at > self.health_check_after:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                if not connection.autocommit:
+                    connection.rollback()
+            except psycopg2.Error as e:
+                self._count("health_check_failures")
+                logger.warning(f"Dropping pooled connection to '{self.alias}' that failed its health check: {e}")
+                self._discard(connection)
+                return None
+        return entry
+
+    def putconn(self, connection):
+        with self._lock:
+            entry = self.in_use.pop(id(connection), None)
+        if entry is None:
+            # not ours (e.g. opened before a fork); just close it
+            self._discard(connection)
+            return
+        if connection.closed:
+            entry = None
+        else:
+            status = connection.info.transaction_status
+            try:
+                if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+                    connection.rollback()
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    raise psycopg2.InterfaceError(f"connection returned mid-command (status {status})")
+            except psycopg2.Error:
+                self._discard(connection)
+                entry = None
+        with self._lock:
+            self._release(entry)
+
+    def _release(self, entry):
+        """Hand a connection (or, for None, its free slot) to the oldest waiter, else keep it idle."""
+        if entry is not None:
+            entry.returned_at = time.monotonic()
+        if self.waiters:
+            waiter = self.waiters.popleft()
+            waiter.entry, waiter.served = entry, True
+            self.reserved += 1
+            waiter.event.set()
+        elif entry is not None:
+            self.idle.append(entry)
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _discard(self, connection):
+        self._count("closed")
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def close(self):
+        with self._lock:
+            idle, self.idle = list(self.idle), deque()
+        for entry in idle:
+            self._discard(entry.connection)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "alias": self.alias,
+                "max_size": self.max_size,
+                "size": self.size,
+                "in_use": len(self.in_use),
+                "idle": len(self.idle),
+                "waiting": len(self.waiters),
+                **self.counters,
+            }
+
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    global _pools, _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # forked: the parent's sockets are not ours to use
+            _pools, _pools_pid = {}, os.getpid()
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(alias, **options)
+        return _pools[alias]
+
+
+def all_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def prometheus_lines():
+    stats = all_stats()
+    lines = []
+    for name, kind, key in (
+        ("db_pool_connections", "gauge", "size"),
+        ("db_pool_connections_in_use", "gauge", "in_use"),
+        ("db_pool_max_connections", "gauge", "max_size"),
+        ("db_pool_waiting", "gauge", "waiting"),
+        ("db_pool_checkouts_total", "counter", "checkouts"),
+        ("db_pool_waits_total", "counter", "waits"),
+        ("db_pool_wait_seconds_total", "counter", "wait_seconds"),
+        ("db_pool_timeouts_total", "counter", "timeouts"),
+        ("db_pool_opened_total", "counter", "opened"),
+        ("db_pool_health_check_failures_total", "counter", "health_check_failures"),
+    ):
+        if not stats:
+            break
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f'{name}{{alias="{pool["alias"]}"}} {pool[key]}' for pool in stats)
+    return lines
+
+
+metrics.add_collector(prometheus_lines)
@@ -1,6 +1,7 @@
+import sys
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -13,7 +14,14 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-o4(z+yezw8z_tycb*q17gtg_d-wodex1af&3+=qa%l)qix1)ee'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = False
+DEBUG = config('DEBUG', default=False, cast=bool)
+
+# Swagger/ReDoc; drf_yasg itself is only imported when a docs page is first requested
+API_DOCS = config('API_DOCS', default=True, cast=bool)
+# Written by `manage.py generate_openapi`; served at /openapi.json
+API_SCHEMA_FILE = BASE_DIR / 'openapi.json'
+SWAGGER_SETTINGS = {'SPEC_URL': 'openapi-document'}
+REDOC_SETTINGS = {'SPEC_URL': 'openapi-document'}
 
 ALLOWED_HOSTS = [".vercel.app", '.now.sh', '127.0.0.1', 'localhost']
 AUTH_USER_MODEL = 'users.User'
@@ -36,8 +44,6 @@ INSTALLED_APPS = [
     "django_filters",
     "whitenoise.runserver_nostatic",
     'django.contrib.staticfiles',
-    'drf_yasg',
-    "debug_toolbar",
     'corsheaders',
     'rest_framework',
     'djoser',
@@ -45,21 +51,30 @@ INSTALLED_APPS = [
     'tuition',
     'applications',
     'users',
+    'mailer',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "api.middleware.AsyncWhiteNoiseMiddleware",
+    "api.middleware.RequestMetricsMiddleware",
+    "api.middleware.ReplicaRoutingMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+# Keep development-only apps out of the production boot; every cold start pays for them
+if API_DOCS:
+    INSTALLED_APPS.append('drf_yasg')
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
@@ -87,6 +102,12 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-db-primary-until',
+]
+
+# Response headers the frontend may read; see tuition_media/db_router.py
+CORS_EXPOSE_HEADERS = [
+    'x-db-primary-until',
 ]
 
 # Methods allowed
@@ -138,10 +159,73 @@ DATABASES = {
         'USER': config('user'),
         'PASSWORD': config('password'),
         'HOST': config('host'),
-        'PORT': config('port')
+        'PORT': config('port'),
+        # reuse the connection across requests on a warm instance instead of reconnecting every time
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Per-process connection pool (tuition_media/pooled_postgresql); DB_POOL_MAX_SIZE=0 turns it off.
+# Django returns the connection to the pool at the end of every request, so CONN_MAX_AGE is 0.
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=4, cast=int)
+if DB_POOL_MAX_SIZE:
+    DATABASES['default'].update({
+        'ENGINE': 'tuition_media.pooled_postgresql',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': config('DB_POOL_TIMEOUT', default=5.0, cast=float),
+            'health_check_after': config('DB_POOL_HEALTH_CHECK_AFTER', default=10.0, cast=float),
+            'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800.0, cast=float),
+        },
+    })
+
+# Read replicas (same credentials as default). Safe-method reads in
+# READ_REPLICA_APPS go to a replica unless the client wrote in the last
+# DB_STICKY_SECONDS; see tuition_media/db_router.py
+DATABASE_REPLICAS = []
+for replica_number, replica_host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{replica_number}'] = {**DATABASES['default'], 'HOST': replica_host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{replica_number}')
+# `manage.py test` gets one more alias mirroring the test database, for the router tests in api/tests.py
+if sys.argv[1:2] == ['test']:
+    DATABASES['replica_test'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['tuition_media.db_router.ReplicaRouter']
+READ_REPLICA_APPS = ('tuition', 'applications')
+DB_STICKY_SECONDS = config('DB_STICKY_SECONDS', default=5, cast=int)
+
+# /changes/ delta-sync feed; see applications/changelog.py
+CHANGELOG_LOOKBACK_SECONDS = config('CHANGELOG_LOOKBACK_SECONDS', default=300, cast=int)
+CHANGELOG_RETENTION_DAYS = config('CHANGELOG_RETENTION_DAYS', default=7, cast=int)
+
+# Cache shared by every process (throttles, dashboards, read-your-writes fallback).
+# Without REDIS_URL each process has its own memory cache. RedisCache needs `pip install redis`.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# /dashboard/ sections, cached only with a shared cache; see applications/dashboard_cache.py
+DASHBOARD_CACHE_SECONDS = config('DASHBOARD_CACHE_SECONDS', default=300, cast=int)
+
+# archive_cold_rows age limits; see applications/archive.py
+ARCHIVE_APPLICATIONS_AFTER_DAYS = config('ARCHIVE_APPLICATIONS_AFTER_DAYS', default=180, cast=int)
+ARCHIVE_PAYMENTS_AFTER_DAYS = config('ARCHIVE_PAYMENTS_AFTER_DAYS', default=90, cast=int)
+
+# /batch/ multi-request endpoint; see api/batch.py
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+BATCH_WORKERS = config('BATCH_WORKERS', default=4, cast=int)
+
+# /events/ server-sent events stream; see api/events.py and applications/async_views.py
+EVENT_BROKER = config('EVENT_BROKER', default='api.events.LocalBroker')
+EVENTS_HEARTBEAT_SECONDS = config('EVENTS_HEARTBEAT_SECONDS', default=15, cast=int)
+EVENTS_STREAM_SECONDS = config('EVENTS_STREAM_SECONDS', default=300, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -191,7 +275,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -201,14 +285,51 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ),
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": config('LOGIN_RATE_PER_IP', default='20/min'),
+        "login_account": config('LOGIN_RATE_PER_ACCOUNT', default='10/min'),
+        # token buckets in api/throttling.py: "N/period" or "N/period:burst"
+        "search_anon": config('THROTTLE_SEARCH_ANON', default='30/min:10'),
+        "search_user": config('THROTTLE_SEARCH_USER', default='120/min:30'),
+        "write": config('THROTTLE_WRITE', default='30/min:10'),
+        "payment": config('THROTTLE_PAYMENT', default='6/min:3'),
+    },
 }
 
 
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),
+    "TOKEN_OBTAIN_SERIALIZER": "users.authentication.RoleTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.authentication.RevocationCheckedTokenRefreshSerializer",
 }
 
+# Token revocation filter (see users/revocation.py)
+REVOCATION_SYNC_INTERVAL = config('REVOCATION_SYNC_INTERVAL', default=5, cast=float)
+REVOCATION_FILTER_CAPACITY = config('REVOCATION_FILTER_CAPACITY', default=100000, cast=int)
+
+# Per-process cache of authenticated users (see users/authentication.py)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=10000, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+
+# Logins hash passwords in a bounded pool (see users/login.py)
+AUTHENTICATION_BACKENDS = ['users.login.PooledModelBackend']
+LOGIN_HASH_WORKERS = config('LOGIN_HASH_WORKERS', default=4, cast=int)
+LOGIN_HASH_QUEUE_SIZE = config('LOGIN_HASH_QUEUE_SIZE', default=64, cast=int)
+LOGIN_HASH_QUEUE_TIMEOUT = config('LOGIN_HASH_QUEUE_TIMEOUT', default=2.0, cast=float)
+
+# The first hasher hashes new passwords; older hashes are upgraded on the next login
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='django.contrib.auth.hashers.ScryptPasswordHasher')
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [
+    hasher for hasher in (
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ) if hasher != PASSWORD_HASHER
+]
+
 DJOSER={
     'EMAIL_FRONTEND_PROTOCOL': config('FRONTEND_PROTOCOL'),
     'EMAIL_FRONTEND_DOMAIN': config('FRONTEND_DOMMAIN'),
@@ -224,7 +345,11 @@ DJOSER={
 }
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Emails go straight to SMTP. Set mailer.backends.OutboxEmailBackend to queue them
+# in the outbox instead, where a `manage.py send_queued_mail` worker must deliver them.
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+OUTBOX_DELIVERY_BACKEND = config('OUTBOX_DELIVERY_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
 EMAIL_PORT = config('EMAIL_PORT')
@@ -233,3 +358,38 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 
 BACKEND_URL = config('BACKEND_URL')
 FRONTEND_URL = config('FRONTEND_URL')
+
+# Payment gateway: "sslcommerz" or "stub" (in-process, for offline load tests)
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='sslcommerz')
+SSLCOMMERZ = {
+    'store_id': config('SSLCOMMERZ_STORE_ID', default='tuiti699b02e4e33f5'),
+    'store_pass': config('SSLCOMMERZ_STORE_PASS', default='tuiti699b02e4e33f5@ssl'),
+    'issandbox': config('SSLCOMMERZ_IS_SANDBOX', default=True, cast=bool),
+}
+PAYMENT_GATEWAY_OPTIONS = {
+    'connect_timeout': config('PAYMENT_GATEWAY_CONNECT_TIMEOUT', default=3.05, cast=float),
+    'read_timeout': config('PAYMENT_GATEWAY_READ_TIMEOUT', default=10.0, cast=float),
+    'max_retries': config('PAYMENT_GATEWAY_MAX_RETRIES', default=2, cast=int),
+    'backoff_factor': 0.5,
+    'pool_maxsize': 10,
+    'failure_threshold': 5,
+    'reset_timeout': 30.0,
+    'stub_latency': config('PAYMENT_STUB_LATENCY', default=0.0, cast=float),
+    'stub_failure_rate': config('PAYMENT_STUB_FAILURE_RATE', default=0.0, cast=float),
+}
+# Leave gateway callbacks for the process_payment_callbacks worker instead of
+# applying them inside the redirect request.
+PAYMENT_CALLBACKS_ASYNC = config('PAYMENT_CALLBACKS_ASYNC', default=False, cast=bool)
+
+# Tutor payouts: dotted path to a DisbursementProvider used by run_payouts
+PAYOUT_PROVIDER = config('PAYOUT_PROVIDER', default='')
+PAYOUT_MIN_AMOUNT = config('PAYOUT_MIN_AMOUNT', default='100.00')
+# seconds a run holds its batch and chunk; longer than the provider takes for one chunk
+PAYOUT_LEASE_SECONDS = config('PAYOUT_LEASE_SECONDS', default=600, cast=int)
+
+# Request metrics (api.metrics): Prometheus text at /metrics for staff or
+# "Authorization: Bearer <METRICS_TOKEN>"; slow requests are sampled with their SQL
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_SLOW_REQUEST_MS = config('METRICS_SLOW_REQUEST_MS', default=500, cast=int)
+METRICS_TRACE_SAMPLE_RATE = config('METRICS_TRACE_SAMPLE_RATE', default=0.1, cast=float)
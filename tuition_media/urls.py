@@ -1,24 +1,32 @@
+from functools import lru_cache
+
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path,include
-from debug_toolbar.toolbar import debug_toolbar_urls
 from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from api.openapi import api_info
+from api.views import metrics_view, openapi_document, slow_traces_view
 from .views import api_root_views
 
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Snippets API",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@snippets.local"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+@lru_cache(maxsize=None)
+def get_docs_view(renderer):
+   # drf_yasg is heavy; load it on the first docs request, not at boot. The UI
+   # pages fetch the precomputed document from /openapi.json (api.openapi).
+   from drf_yasg.views import get_schema_view
+
+   schema_view = get_schema_view(
+      api_info(),
+      public=True,
+      permission_classes=(permissions.AllowAny,),
+   )
+   return schema_view.with_ui(renderer, cache_timeout=0)
+
+
+def docs_view(renderer):
+   def view(request, *args, **kwargs):
+      return get_docs_view(renderer)(request, *args, **kwargs)
+   return view
 
 
 urlpatterns = [
@@ -26,6 +34,18 @@ urlpatterns = [
     path('',api_root_views),
     path('api-auth/', include('rest_framework.urls')),
     path("api/v1/", include("api.urls"), name = 'api-root'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-] + debug_toolbar_urls()
+    path('metrics', metrics_view, name='metrics'),
+    path('metrics/traces/', slow_traces_view, name='metrics-slow-traces'),
+]
+
+if settings.API_DOCS:
+    urlpatterns += [
+        path('openapi.json', openapi_document, name='openapi-document'),
+        path('swagger/', docs_view('swagger'), name='schema-swagger-ui'),
+        path('redoc/', docs_view('redoc'), name='schema-redoc'),
+    ]
+
+if settings.DEBUG:
+    from debug_toolbar.toolbar import debug_toolbar_urls
+
+    urlpatterns += debug_toolbar_urls()
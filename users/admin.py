@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from users.models import User
+from users.models import User, TokenRevocation, UserImportJob
 
 # Register your models here.
 
@@ -28,4 +28,6 @@ class CustomUserAdmin(UserAdmin):
     ordering = ('email',)
 
 
-admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(User, CustomUserAdmin)
+admin.site.register(TokenRevocation)
+admin.site.register(UserImportJob)
@@ -0,0 +1,122 @@
+"""
+JWT authentication with a per-process user cache.
+
+Access tokens carry the user's `role` and `is_staff` claims, and the user
+behind a token is served from a bounded TTL/LRU cache instead of a `User`
+query per request. Saving or deleting a user drops it from this process's
+cache; other processes pick up the change when their entry expires
+(AUTH_USER_CACHE_TTL). A token whose claims no longer match the user, e.g.
+after a role change, is rejected so the client logs in again. Revoked
+tokens are rejected using the in-memory filter in `users.revocation`.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from users.revocation import revocations
+
+CLAIMS = ("role", "is_staff")
+
+
+class UserCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds. Keys are str(user id)."""
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, user):
+        user_id = str(user_id)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, "AUTH_USER_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "AUTH_USER_CACHE_TTL", 60),
+)
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issues tokens (and, through the refresh token, access tokens) with role claims."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class RevocationCheckedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses to mint access tokens from a revoked refresh token."""
+
+    def validate(self, attrs):
+        if revocations.is_revoked(self.token_class(attrs["refresh"])):
+            raise InvalidToken("Token has been revoked.")
+        return super().validate(attrs)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocations.is_revoked(validated_token):
+            raise InvalidToken("Token has been revoked.")
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+
+        # tokens issued before the claims existed are still accepted
+        for claim in CLAIMS:
+            if claim in validated_token and validated_token[claim] != getattr(user, claim):
+                raise AuthenticationFailed("Token claims are out of date, log in again.", code="stale_claims")
+
+        # each request gets its own instance; views may modify request.user
+        return copy.copy(user)
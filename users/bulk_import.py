@@ -0,0 +1,245 @@
+"""
+Bulk user import from CSV.
+
+Rows are processed in chunks: validated in memory, checked against existing
+emails with one query per chunk, passwords hashed in a process pool across
+cores, and inserted with `bulk_create`. Imported users are inactive until
+they follow the activation email, sent per chunk through EMAIL_BACKEND
+(queued in the outbox when that backend is configured). Rows without a
+password get an unusable one; those users set a password through the
+password reset flow after activating.
+
+CSV columns: email (required), first_name, last_name, role (User/Tutor),
+password, address, phone_number.
+"""
+import csv
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.mail import get_connection
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from djoser.conf import settings as djoser_settings
+
+from users.models import User, UserImportJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ERRORS_KEPT = 1000
+
+
+@dataclass
+class ImportResult:
+    processed: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    max_errors: int = MAX_ERRORS_KEPT
+
+    def error(self, row_number, email, message):
+        self.failed += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "email": email, "error": message})
+
+
+def _init_worker():
+    # spawned (non-fork) workers start without Django configured
+    django.setup()
+
+
+def _hash(password):
+    return make_password(password or None)
+
+
+def count_rows(text_file):
+    rows = sum(1 for _ in csv.reader(text_file)) - 1
+    text_file.seek(0)
+    return max(rows, 0)
+
+
+def _clean(row_number, row, seen, result):
+    email = User.objects.normalize_email((row.get("email") or "").strip())
+    try:
+        validate_email(email)
+    except ValidationError:
+        result.error(row_number, email, "Invalid email address.")
+        return None
+    key = email.lower()
+    if key in seen:
+        result.error(row_number, email, "Duplicate email in file.")
+        return None
+    role = (row.get("role") or User.ROLE_USER).strip().capitalize()
+    if role not in (User.ROLE_USER, User.ROLE_TUTOR):
+        result.error(row_number, email, f"Unknown role '{role}'.")
+        return None
+    phone_number = (row.get("phone_number") or "").strip()
+    if len(phone_number) > 15:
+        result.error(row_number, email, "Phone number is longer than 15 characters.")
+        return None
+    seen.add(key)
+    return {
+        "row": row_number,
+        "email": email,
+        "first_name": (row.get("first_name") or "").strip()[:150],
+        "last_name": (row.get("last_name") or "").strip()[:150],
+        "role": role,
+        "password": row.get("password") or "",
+        "address": (row.get("address") or "").strip() or None,
+        "phone_number": phone_number or None,
+    }
+
+
+def _import_chunk(rows, pool, result, send_activation):
+    # case-insensitive like the in-file check: Alice@x.com in the database blocks alice@x.com in the file
+    existing = set(
+        User.objects.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=[row["email"].lower() for row in rows])
+        .values_list("email_lower", flat=True)
+    )
+    new_rows = []
+    for row in rows:
+        if row["email"].lower() in existing:
+            result.error(row["row"], row["email"], "A user with this email already exists.")
+        else:
+            new_rows.append(row)
+    if not new_rows:
+        return
+
+    passwords = [row["password"] for row in new_rows]
+    hashes = list(pool.map(_hash, passwords, chunksize=max(1, len(passwords) // 32))) if pool else [
+        _hash(password) for password in passwords
+    ]
+    users = [
+        User(
+            email=row["email"],
+            first_name=row["first_name"],
+            last_name=row["last_name"],
+            role=row["role"],
+            address=row["address"],
+            phone_number=row["phone_number"],
+            password=password_hash,
+            is_active=False,
+        )
+        for row, password_hash in zip(new_rows, hashes)
+    ]
+    # a concurrent signup may have taken an email since the check above
+    User.objects.bulk_create(users, ignore_conflicts=True)
+    created = {
+        user.email: user
+        for user in User.objects.filter(email__in=[user.email for user in users], password__in=hashes)
+    }
+    for row in new_rows:
+        if row["email"] not in created:
+            result.error(row["row"], row["email"], "A user with this email already exists.")
+    result.created += len(created)
+
+    if send_activation and created:
+        send_activation_emails(created.values())
+
+
+def send_activation_emails(users):
+    """
+    Send djoser activation emails through EMAIL_BACKEND in one call: one
+    insert with the outbox backend, one SMTP connection otherwise.
+    """
+    messages = []
+    for user in users:
+        message = djoser_settings.EMAIL.activation(None, {"user": user})
+        message.render()
+        message.to = [user.email]
+        message.from_email = settings.DEFAULT_FROM_EMAIL
+        messages.append(message)
+    try:
+        get_connection().send_messages(messages)
+    except Exception:
+        # the users exist either way; they can ask for the email again (djoser resend_activation)
+        logger.exception(f"Could not send activation emails to {len(messages)} imported users")
+
+
+def import_users(text_file, chunk_size=1000, workers=None, send_activation=True, progress=None,
+                 max_errors=MAX_ERRORS_KEPT):
+    """
+    Import users from an open CSV text file. `progress(result)` is called
+    after every chunk. At most `max_errors` row errors are kept (None keeps
+    all). Returns an `ImportResult`.
+    """
+    result = ImportResult(max_errors=max_errors)
+    reader = csv.DictReader(text_file)
+    missing = {"email"} - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(sorted(missing))}")
+
+    seen = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        chunk = []
+        for row_number, row in enumerate(reader, start=2):
+            result.processed += 1
+            cleaned = _clean(row_number, row, seen, result)
+            if cleaned:
+                chunk.append(cleaned)
+            if len(chunk) >= chunk_size:
+                _import_chunk(chunk, pool, result, send_activation)
+                chunk = []
+                if progress:
+                    progress(result)
+        if chunk:
+            _import_chunk(chunk, pool, result, send_activation)
+    result.errors.sort(key=lambda error: error["row"])
+    if progress:
+        progress(result)
+    logger.info(f"User import: {result.created} created, {result.failed} failed of {result.processed} rows")
+    return result
+
+
+def open_text(binary_file):
+    """Wrap an uploaded/stored binary file for `csv`, accepting a UTF-8 BOM."""
+    return io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+
+
+def run_job(job, chunk_size=1000, workers=None):
+    """Run an uploaded `UserImportJob`, saving progress after every chunk."""
+    UserImportJob.objects.filter(pk=job.pk).update(status=UserImportJob.STATUS_RUNNING, started_at=timezone.now())
+
+    def save_progress(result):
+        UserImportJob.objects.filter(pk=job.pk).update(
+            processed_rows=result.processed,
+            created_count=result.created,
+            error_count=result.failed,
+            errors=result.errors,
+        )
+
+    try:
+        with job.file.open("rb") as binary_file:
+            text_file = open_text(binary_file)
+            UserImportJob.objects.filter(pk=job.pk).update(total_rows=count_rows(text_file))
+            import_users(text_file, chunk_size, workers, job.send_activation, progress=save_progress)
+    except Exception as e:
+        logger.exception(f"User import {job.pk} failed")
+        UserImportJob.objects.filter(pk=job.pk).update(
+            status=UserImportJob.STATUS_FAILED, failure_reason=str(e), finished_at=timezone.now()
+        )
+    else:
+        UserImportJob.objects.filter(pk=job.pk).update(status=UserImportJob.STATUS_COMPLETED, finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def claim_pending_job():
+    with transaction.atomic():
+        job = (
+            UserImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=UserImportJob.STATUS_PENDING)
+            .order_by("id")
+            .first()
+        )
+        if job is not None:
+            UserImportJob.objects.filter(pk=job.pk).update(status=UserImportJob.STATUS_RUNNING)
+    return job
@@ -0,0 +1,141 @@
+"""
+Login pipeline: password hashing off the request path, with back-pressure.
+
+Password verification runs in a small, bounded thread pool (the hashers
+release the GIL), so at most LOGIN_HASH_WORKERS hashes run at once per
+process however many logins arrive. Waiting logins queue up to
+LOGIN_HASH_QUEUE_SIZE; beyond that, or after LOGIN_HASH_QUEUE_TIMEOUT
+seconds, the login is refused with 503 and Retry-After instead of stealing
+CPU from the rest of the API.
+
+`PooledModelBackend` also upgrades a stored hash to the preferred hasher
+(the first entry of PASSWORD_HASHERS) after a successful login.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+logger = logging.getLogger(__name__)
+
+
+class LoginBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins in progress, try again shortly."
+    default_code = "login_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+class HashPool:
+    """Bounded executor for password hashing with a bounded wait queue."""
+
+    def __init__(self, workers=4, queue_size=64, queue_timeout=2.0):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="login-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self.counters = {"completed": 0, "rejected": 0, "in_flight": 0}
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.counters["rejected"] += 1
+            logger.warning("Login hash pool saturated, rejecting login")
+            raise LoginBusy(wait=max(1, round(self.queue_timeout)))
+        with self._lock:
+            self.counters["in_flight"] += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.counters["in_flight"] -= 1
+                self.counters["completed"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+hash_pool = HashPool(
+    workers=getattr(settings, "LOGIN_HASH_WORKERS", 4),
+    queue_size=getattr(settings, "LOGIN_HASH_QUEUE_SIZE", 64),
+    queue_timeout=getattr(settings, "LOGIN_HASH_QUEUE_TIMEOUT", 2.0),
+)
+
+
+def verify(password, encoded):
+    """Return (matches, needs_upgrade). Pure CPU, no database access, so it can run in the pool."""
+    if not check_password(password, encoded):
+        return False, False
+    preferred = get_hasher("default")
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return True, True
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class PooledModelBackend(ModelBackend):
+    """`ModelBackend` that hashes in `hash_pool` and rehashes outdated passwords on login."""
+
+    def __init__(self, pool=None):
+        self.pool = pool or hash_pool
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # hash anyway so unknown accounts take as long as wrong passwords
+            self.pool.run(make_password, password)
+            return None
+
+        matches, needs_upgrade = self.pool.run(verify, password, user.password)
+        if not matches or not self.user_can_authenticate(user):
+            return None
+        if needs_upgrade:
+            user.password = self.pool.run(make_password, password)
+            user.save(update_fields=["password"])
+            logger.info(f"Upgraded password hash for user {user.pk}")
+        return user
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Login attempts per client IP."""
+    scope = "login_ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class LoginAccountThrottle(SimpleRateThrottle):
+    """Login attempts per account, whatever IPs they come from."""
+    scope = "login_account"
+
+    def get_cache_key(self, request, view):
+        username = request.data.get(get_user_model().USERNAME_FIELD)
+        if not username:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": str(username).strip().lower()}
+
+
+class LoginView(TokenObtainPairView):
+    """`/auth/jwt/create/`: throttled before any hashing happens."""
+    throttle_classes = [LoginIPThrottle, LoginAccountThrottle]
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from users.authentication import CachedJWTAuthentication, RoleTokenObtainPairSerializer, user_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Compare per-request cost of plain JWT authentication and the cached user authentication"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", help="User to authenticate as (defaults to the first active user)")
+        parser.add_argument("--requests", type=int, default=5000)
+
+    def run(self, authenticator, header, count):
+        factory = RequestFactory()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                authenticator.authenticate(Request(factory.get("/", HTTP_AUTHORIZATION=header)))
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        user = users.filter(email=options["email"]).first() if options["email"] else users.first()
+        if user is None:
+            raise CommandError("No active user to authenticate as")
+
+        header = f"JWT {RoleTokenObtainPairSerializer.get_token(user).access_token}"
+        count = options["requests"]
+        user_cache.clear()
+        for name, authenticator in (("JWTAuthentication", JWTAuthentication()),
+                                    ("CachedJWTAuthentication", CachedJWTAuthentication())):
+            elapsed, queries = self.run(authenticator, header, count)
+            self.stdout.write(
+                f"{name:<24} {count} requests in {elapsed:.2f}s = {elapsed / count * 1e6:,.0f}us/request, "
+                f"{queries} queries"
+            )
+        self.stdout.write(str(user_cache.stats()))
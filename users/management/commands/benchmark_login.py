@@ -0,0 +1,80 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers_by_algorithm, make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from users.login import HashPool, LoginBusy, PooledModelBackend
+from users.models import User
+
+PASSWORD = "benchmark-Password-1"
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput, latency and back-pressure through the pooled login backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hashers", default="pbkdf2_sha256,scrypt",
+                            help="Comma separated hasher algorithms to compare")
+        parser.add_argument("--clients", type=int, default=32, help="Concurrent clients")
+        parser.add_argument("--logins", type=int, default=5, help="Logins per client")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--queue-size", type=int, default=16)
+        parser.add_argument("--queue-timeout", type=float, default=2.0)
+
+    def run(self, algorithm, options):
+        users = [
+            User(email=f"bench-login-{i}@example.com", password=make_password(PASSWORD, hasher=algorithm))
+            for i in range(options["clients"])
+        ]
+        User.objects.bulk_create(users)
+        backend = PooledModelBackend(HashPool(options["workers"], options["queue_size"], options["queue_timeout"]))
+        latencies, rejected = [], []
+        lock = threading.Lock()
+
+        def client(email):
+            for _ in range(options["logins"]):
+                started = time.perf_counter()
+                try:
+                    user = backend.authenticate(None, username=email, password=PASSWORD)
+                except LoginBusy:
+                    with lock:
+                        rejected.append(email)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                if user is None:
+                    self.stdout.write(self.style.ERROR(f"Login failed for {email}"))
+            connections.close_all()
+
+        threads = [threading.Thread(target=client, args=(user.email,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, latencies, len(rejected)
+
+    def handle(self, *args, **options):
+        hashers = get_hashers_by_algorithm()
+        for algorithm in options["hashers"].split(","):
+            hasher = hashers[algorithm]
+            path = f"{type(hasher).__module__}.{type(hasher).__name__}"
+            User.objects.filter(email__startswith="bench-login-").delete()
+            # make the measured hasher the preferred one so no login triggers an upgrade
+            with override_settings(PASSWORD_HASHERS=[path] + [h for h in settings.PASSWORD_HASHERS if h != path]):
+                try:
+                    elapsed, latencies, rejected = self.run(algorithm, options)
+                finally:
+                    User.objects.filter(email__startswith="bench-login-").delete()
+            ok = len(latencies)
+            p50 = statistics.median(latencies) if ok else 0
+            p95 = statistics.quantiles(latencies, n=20)[-1] if ok > 1 else p50
+            self.stdout.write(
+                f"{algorithm:<14} {ok} logins in {elapsed:.2f}s = {ok / elapsed:,.1f}/s, "
+                f"p50 {p50 * 1000:,.0f}ms p95 {p95 * 1000:,.0f}ms, {rejected} rejected (503)"
+            )
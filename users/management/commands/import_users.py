@@ -0,0 +1,53 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import bulk_import
+
+
+class Command(BaseCommand):
+    help = "Import users from a CSV file (email, first_name, last_name, role, password, address, phone_number)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=None, help="Hashing processes (default: one per core)")
+        parser.add_argument("--no-activation", action="store_true", help="Do not queue activation emails")
+        parser.add_argument("--errors", help="Write every rejected row to this CSV file")
+
+    def handle(self, *args, **options):
+        try:
+            binary_file = open(options["path"], "rb")
+        except OSError as e:
+            raise CommandError(str(e))
+        started = time.perf_counter()
+        with binary_file:
+            text_file = bulk_import.open_text(binary_file)
+            total = bulk_import.count_rows(text_file)
+
+            def progress(result):
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{result.processed}/{total} rows, {result.created} created, {result.failed} failed "
+                    f"({result.processed / elapsed if elapsed else 0:,.0f} rows/s)"
+                )
+
+            try:
+                result = bulk_import.import_users(
+                    text_file, options["chunk_size"], options["workers"], not options["no_activation"], progress,
+                    max_errors=None if options["errors"] else bulk_import.MAX_ERRORS_KEPT,
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        if options["errors"] and result.errors:
+            with open(options["errors"], "w", newline="") as out:
+                writer = csv.DictWriter(out, fieldnames=["row", "email", "error"])
+                writer.writeheader()
+                writer.writerows(result.errors)
+        for error in result.errors[:20]:
+            self.stderr.write(f"row {error['row']} {error['email']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} users, {result.failed} rows rejected, in {time.perf_counter() - started:.1f}s"
+        ))
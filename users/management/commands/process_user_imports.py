@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import bulk_import
+
+
+class Command(BaseCommand):
+    help = "Run user import jobs uploaded through the staff API"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when no job is pending")
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            job = bulk_import.claim_pending_job()
+            if job is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+            job = bulk_import.run_job(job, options["chunk_size"], options["workers"])
+            self.stdout.write(
+                f"Import {job.pk}: {job.status}, {job.created_count} created, {job.error_count} rejected "
+                f"of {job.processed_rows} rows"
+            )
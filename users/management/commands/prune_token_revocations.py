@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users import revocation
+
+
+class Command(BaseCommand):
+    help = "Delete token revocations whose tokens have already expired"
+
+    def handle(self, *args, **options):
+        deleted = revocation.prune()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} token revocations"))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models.functions import Lower
 from .managers import CustomUserManager
 # Create your models here.
 
@@ -21,7 +22,65 @@ class User(AbstractUser):
     REQUIRED_FIELDS = []
     
     objects = CustomUserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # case-insensitive email lookups, e.g. the bulk import's duplicate check
+            models.Index(Lower("email"), name="users_user_email_lower"),
+        ]
     
     def __str__(self):
         return f"{self.email} ({self.role})"
     
+
+
+class TokenRevocation(models.Model):
+    """
+    Append-only revocation log. A row either revokes one token (`jti`) or
+    every token of `user` issued before `revoked_before`. The id is the sync
+    cursor for the in-process filters in `users.revocation`.
+    """
+    jti = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="token_revocations")
+    revoked_before = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(help_text="After this the revoked tokens have expired anyway and the row can be pruned")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        if self.jti:
+            return f"Token {self.jti} of {self.user}"
+        return f"Tokens of {self.user} issued before {self.revoked_before}"
+
+
+class UserImportJob(models.Model):
+    """A CSV of users uploaded by staff, imported by the `process_user_imports` worker."""
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    file = models.FileField(upload_to="user_imports/")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="user_imports")
+    send_activation = models.BooleanField(default=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, help_text="First row errors: {row, email, error}")
+    failure_reason = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"User import {self.id} ({self.status})"
@@ -0,0 +1,167 @@
+"""
+JWT revocation without a query per request.
+
+Revocations are rows in `TokenRevocation`. Each process mirrors them in
+memory: revoked JTIs go into a Bloom filter and per-user "issued before"
+cutoffs into a dict. The mirror is brought up to date from the table at most
+every REVOCATION_SYNC_INTERVAL seconds by reading only the rows added since
+the last sync (plus a short overlap, since ids can commit out of order). A
+token is looked up in the database only when the Bloom filter says its JTI
+may be revoked, i.e. for revoked tokens and the rare false positive.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+# rows committed this long after a later id was synced are still picked up
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationFilter:
+    """Per-process mirror of `TokenRevocation`."""
+
+    def __init__(self, capacity=None, sync_interval=None):
+        self.capacity = capacity or getattr(settings, "REVOCATION_FILTER_CAPACITY", 100000)
+        self.sync_interval = sync_interval if sync_interval is not None else getattr(
+            settings, "REVOCATION_SYNC_INTERVAL", 5
+        )
+        self.counters = {"checks": 0, "filter_hits": 0, "db_checks": 0, "revoked": 0, "syncs": 0}
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._bloom = BloomFilter(self.capacity)
+        self._cutoffs = {}
+        self._cursor = 0
+        self._synced_at = 0.0
+        self._synced_wall = None
+
+    def _add(self, jti, user_id, revoked_before, seen=False):
+        if jti and not seen:
+            self._bloom.add(jti)
+        if revoked_before is not None:
+            # `iat` is whole seconds: a token issued in the revoke's own second (a re-login right
+            # after "log out everywhere") must survive, at the cost of one second of older tokens
+            cutoff = int(revoked_before.timestamp())
+            key = str(user_id)
+            if cutoff > self._cutoffs.get(key, 0):
+                self._cutoffs[key] = cutoff
+
+    def sync(self, force=False):
+        """Load revocations added since the last sync."""
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._synced_at < self.sync_interval:
+                return
+            if self._bloom.count >= self.capacity:
+                # rebuild from the live rows; pruned rows fall out of the filter
+                self._reset()
+            now = timezone.now()
+            new = Q(id__gt=self._cursor)
+            if self._synced_wall is not None:
+                new |= Q(created_at__gte=self._synced_wall - SYNC_OVERLAP)
+            rows = TokenRevocation.objects.filter(new, expires_at__gt=now).order_by("id")
+            for pk, jti, user_id, revoked_before in rows.values_list("id", "jti", "user_id", "revoked_before").iterator():
+                self._add(jti, user_id, revoked_before, seen=pk <= self._cursor)
+                self._cursor = max(self._cursor, pk)
+            self._synced_at = time.monotonic()
+            self._synced_wall = now
+            self.counters["syncs"] += 1
+
+    def is_revoked(self, token):
+        self.sync()
+        self.counters["checks"] += 1
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        cutoff = self._cutoffs.get(str(user_id))
+        if cutoff is not None and token.get("iat", 0) < cutoff:
+            self.counters["revoked"] += 1
+            return True
+
+        jti = token.get(api_settings.JTI_CLAIM)
+        if not jti or jti not in self._bloom:
+            return False
+        self.counters["filter_hits"] += 1
+        self.counters["db_checks"] += 1
+        revoked = TokenRevocation.objects.filter(jti=jti).exists()
+        if revoked:
+            self.counters["revoked"] += 1
+        return revoked
+
+    def record(self, revocation):
+        """Apply a revocation made in this process immediately, without waiting for the next sync."""
+        with self._lock:
+            self._add(revocation.jti, revocation.user_id, revocation.revoked_before)
+
+    def stats(self):
+        return {**self.counters, "jtis": self._bloom.count, "cutoffs": len(self._cutoffs), "cursor": self._cursor}
+
+
+revocations = RevocationFilter()
+
+
+def _expiry(token):
+    return datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+
+
+def revoke_token(token):
+    """Revoke a single validated token (access or refresh) by its JTI."""
+    revocation = TokenRevocation.objects.create(
+        jti=token[api_settings.JTI_CLAIM],
+        user_id=token[api_settings.USER_ID_CLAIM],
+        expires_at=_expiry(token),
+    )
+    revocations.record(revocation)
+    logger.info(f"Revoked token {revocation.jti} of user {revocation.user_id}")
+    return revocation
+
+
+def revoke_user_tokens(user):
+    """Revoke every token the user holds now ("log out everywhere")."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    now = timezone.now()
+    revocation = TokenRevocation.objects.create(user=user, revoked_before=now, expires_at=now + lifetime)
+    revocations.record(revocation)
+    logger.info(f"Revoked all tokens of user {user.pk}")
+    return revocation
+
+
+def prune():
+    """Delete revocations whose tokens have expired anyway. Returns the number deleted."""
+    return TokenRevocation.objects.filter(expires_at__lte=timezone.now()).delete()[0]
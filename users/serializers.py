@@ -1,6 +1,7 @@
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer, UserSerializer as BaseUserSerializer
 from rest_framework import serializers
-from users.models import User
+from rest_framework.fields import empty
+from users.models import User, UserImportJob
 
 class UserCreateSerializer(BaseUserCreateSerializer):
     class Meta(BaseUserCreateSerializer.Meta):
@@ -13,5 +14,25 @@ class UserSerializer(BaseUserSerializer):
     class Meta(BaseUserSerializer.Meta):
         model = User
         fields = ['id','first_name','last_name', 'email', 'role', 'address' ,'phone_number']
-            
-        
\ No newline at end of file
+
+
+class OptionalBooleanField(serializers.BooleanField):
+    """Boolean whose default also applies when a multipart form leaves it out."""
+    default_empty_html = empty
+
+
+class UserImportJobSerializer(serializers.ModelSerializer):
+    send_activation = OptionalBooleanField(default=True)
+
+    class Meta:
+        model = UserImportJob
+        fields = ['id', 'file', 'send_activation', 'status', 'total_rows', 'processed_rows', 'created_count',
+                  'error_count', 'errors', 'failure_reason', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['status', 'total_rows', 'processed_rows', 'created_count', 'error_count', 'errors',
+                            'failure_reason', 'created_at', 'started_at', 'finished_at']
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith('.csv'):
+            raise serializers.ValidationError("Upload a .csv file.")
+        return value
+
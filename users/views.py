@@ -1,3 +1,54 @@
-from django.shortcuts import render
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your views here.
+from tuition.paginations import DefaultPagination
+from users import revocation
+from users.models import UserImportJob
+from users.serializers import UserImportJobSerializer
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def revoke_token(request):
+    """Log out: revoke the access token of this request and, if given, the `refresh` token."""
+    revocation.revoke_token(request.auth)
+    raw_refresh = request.data.get("refresh")
+    if raw_refresh:
+        try:
+            refresh = RefreshToken(raw_refresh)
+        except TokenError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(request.user.pk):
+            return Response({"detail": "Refresh token belongs to another user."}, status=status.HTTP_400_BAD_REQUEST)
+        revocation.revoke_token(refresh)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def revoke_all_tokens(request):
+    """Log out everywhere: revoke every token issued to this user so far."""
+    revocation.revoke_user_tokens(request.user)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UserImportViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                        viewsets.GenericViewSet):
+    """
+    Staff bulk user import. Upload a CSV (`file`); the `process_user_imports`
+    worker imports it and the job reports progress and per-row errors.
+    """
+    serializer_class = UserImportJobSerializer
+    queryset = UserImportJob.objects.all()
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+    pagination_class = DefaultPagination
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)